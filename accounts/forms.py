@@ -1,5 +1,3 @@
-import re
-import uuid
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
@@ -88,30 +86,6 @@ class CustomSignupForm(SignupForm):
             raise forms.ValidationError("A user with this email already exists.")
         return email
     
-    def generate_username(self, email, first_name, last_name):
-        """Generate a unique username"""
-        if email:
-            # Extract base from email (part before @)
-            base_username = re.sub(r'[^a-zA-Z0-9]', '', email.split('@')[0])
-        elif first_name and last_name:
-            # Use first and last name
-            base_username = re.sub(r'[^a-zA-Z0-9]', '', f"{first_name}{last_name}")
-        else:
-            # Fallback to user + uuid
-            base_username = f"user{str(uuid.uuid4())[:8]}"
-        
-        # Ensure it's not too long
-        base_username = base_username[:20].lower()
-        
-        # Make it unique
-        username = base_username
-        counter = 1
-        while User.objects.filter(username=username).exists():
-            username = f"{base_username}{counter}"
-            counter += 1
-        
-        return username
-    
     def save(self, request):
         """Save the user with the additional fields"""
         user = super().save(request)
@@ -121,12 +95,8 @@ class CustomSignupForm(SignupForm):
         user.last_name = self.cleaned_data['last_name']
         user.user_type = self.cleaned_data['user_type']
         
-        # Auto-generate username
-        user.username = self.generate_username(
-            self.cleaned_data['email'],
-            self.cleaned_data['first_name'],
-            self.cleaned_data['last_name']
-        )
+        # Auto-generate a unique username on save
+        user.username = ''
         
         if self.cleaned_data.get('phone'):
             user.phone = self.cleaned_data['phone']
@@ -202,30 +172,6 @@ class CustomUserCreationForm(UserCreationForm):
             raise ValidationError("A user with this email already exists.")
         return email
     
-    def generate_username(self, email, first_name, last_name):
-        """Generate a unique username"""
-        if email:
-            # Extract base from email (part before @)
-            base_username = re.sub(r'[^a-zA-Z0-9]', '', email.split('@')[0])
-        elif first_name and last_name:
-            # Use first and last name
-            base_username = re.sub(r'[^a-zA-Z0-9]', '', f"{first_name}{last_name}")
-        else:
-            # Fallback to user + uuid
-            base_username = f"user{str(uuid.uuid4())[:8]}"
-        
-        # Ensure it's not too long
-        base_username = base_username[:20].lower()
-        
-        # Make it unique
-        username = base_username
-        counter = 1
-        while User.objects.filter(username=username).exists():
-            username = f"{base_username}{counter}"
-            counter += 1
-        
-        return username
-    
     def save(self, commit=True):
         user = super().save(commit=False)
         user.email = self.cleaned_data['email']
@@ -233,12 +179,8 @@ class CustomUserCreationForm(UserCreationForm):
         user.last_name = self.cleaned_data['last_name']
         user.user_type = self.cleaned_data['user_type']
         
-        # Auto-generate username
-        user.username = self.generate_username(
-            self.cleaned_data['email'],
-            self.cleaned_data['first_name'],
-            self.cleaned_data['last_name']
-        )
+        # Auto-generate a unique username on save
+        user.username = ''
         
         if self.cleaned_data['phone']:
             user.phone = self.cleaned_data['phone']
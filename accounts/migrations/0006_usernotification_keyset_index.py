@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='accounts_us_user_id_0cbc3b_idx'),
+        ),
+    ]
@@ -7,23 +7,17 @@ from PIL import Image
 import uuid
 import re
 
+from core.slugs import save_unique
+
 class UserManager(BaseUserManager):
     def create_user(self, email, first_name, last_name, password=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
         email = self.normalize_email(email)
         
-        # Generate username from email
-        username = email.split('@')[0]
-        counter = 1
-        original_username = username
-        while self.model.objects.filter(username=username).exists():
-            username = f"{original_username}{counter}"
-            counter += 1
-        
+        # A unique username is generated from the email by User.save
         user = self.model(
             email=email,
-            username=username,
             first_name=first_name,
             last_name=last_name,
             **extra_fields
@@ -106,8 +100,8 @@ class User(AbstractUser):
     def get_absolute_url(self):
         return reverse('dashboard:profile', kwargs={'pk': self.pk})
     
-    def generate_username(self):
-        """Generate a unique username based on email or names"""
+    def username_base(self):
+        """Username stem based on email or names"""
         if self.email:
             # Extract base from email (part before @)
             base_username = re.sub(r'[^a-zA-Z0-9]', '', self.email.split('@')[0])
@@ -119,24 +113,15 @@ class User(AbstractUser):
             base_username = f"user{str(uuid.uuid4())[:8]}"
         
         # Ensure it's not too long
-        base_username = base_username[:20].lower()
-        
-        # Make it unique
-        username = base_username
-        counter = 1
-        while User.objects.filter(username=username).exclude(pk=self.pk).exists():
-            username = f"{base_username}{counter}"
-            counter += 1
-        
-        return username
+        return base_username[:20].lower() or f"user{str(uuid.uuid4())[:8]}"
     
     def save(self, *args, **kwargs):
         # Auto-generate username if not provided or empty
         if not self.username:
-            self.username = self.generate_username()
-        
-        # Call the original save method
-        super().save(*args, **kwargs)
+            save_unique(self, 'username', self.username_base(),
+                        lambda: super(User, self).save(*args, **kwargs), separator='')
+        else:
+            super().save(*args, **kwargs)
         
         # Resize profile picture
         if self.profile_picture:
@@ -236,6 +221,10 @@ class UserNotification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a user's notification feed
+            models.Index(fields=['user', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.title}"
\ No newline at end of file
@@ -1,13 +1,14 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
+from django.db.models import F
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
 from .models import UserNotification, UserAchievement, UserSkill
 from dashboard.models import UserProgress, DeveloperProfile
+from core.mail import queue_mail
 
 User = get_user_model()
 
@@ -158,16 +159,15 @@ def send_welcome_email(user):
         
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        queue_mail(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[user.email],
             html_message=html_message,
-            fail_silently=True,
         )
     except Exception as e:
-        print(f"Failed to send welcome email to {user.email}: {e}")
+        print(f"Failed to queue welcome email to {user.email}: {e}")
 
 def send_verification_email(user):
     """Send verification success email"""
@@ -182,31 +182,30 @@ def send_verification_email(user):
         
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        queue_mail(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[user.email],
             html_message=html_message,
-            fail_silently=True,
         )
     except Exception as e:
-        print(f"Failed to send verification email to {user.email}: {e}")
+        print(f"Failed to queue verification email to {user.email}: {e}")
 
 # Achievement triggers for various milestones
+POINTS_MILESTONES = [
+    (100, 'First Century', 'Earned your first 100 points'),
+    (500, 'Point Collector', 'Accumulated 500 points'),
+    (1000, 'Thousand Club', 'Reached 1000 points'),
+    (2500, 'Point Master', 'Achieved 2500 points'),
+    (5000, 'Point Legend', 'Accumulated 5000 points'),
+]
+
 def check_points_milestones(user):
     """Check and award points milestone achievements"""
     points = user.points
     
-    milestones = [
-        (100, 'First Century', 'Earned your first 100 points'),
-        (500, 'Point Collector', 'Accumulated 500 points'),
-        (1000, 'Thousand Club', 'Reached 1000 points'),
-        (2500, 'Point Master', 'Achieved 2500 points'),
-        (5000, 'Point Legend', 'Accumulated 5000 points'),
-    ]
-    
-    for threshold, title, description in milestones:
+    for threshold, title, description in POINTS_MILESTONES:
         if points >= threshold:
             # Check if achievement already exists
             if not UserAchievement.objects.filter(
@@ -222,6 +221,19 @@ def check_points_milestones(user):
                     badge_icon='fas fa-trophy'
                 )
 
+def increment_points(user, points):
+    """
+    Add points with one atomic UPDATE instead of User.save(), checking the
+    milestones only when this increment crosses one
+    """
+    if not points:
+        return
+    User.objects.filter(pk=user.pk).update(points=F('points') + points)
+    previous = user.points
+    user.points = previous + points
+    if any(previous < threshold <= user.points for threshold, _, _ in POINTS_MILESTONES):
+        check_points_milestones(user)
+
 # Connect points milestone checker
 @receiver(post_save, sender=User)
 def check_user_milestones(sender, instance, **kwargs):
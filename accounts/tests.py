@@ -1,3 +1,25 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .models import User
+
+
+class UsernameTests(TestCase):
+    """Usernames come from the email and collide into numeric suffixes"""
+
+    def test_colliding_usernames_are_suffixed(self):
+        usernames = [
+            User.objects.create_user(email, 'Jane', 'Doe', 'password123').username
+            for email in ('jane.doe@example.com', 'jane_doe@example.org', 'janedoe@example.net')
+        ]
+        self.assertEqual(usernames, ['janedoe', 'janedoe1', 'janedoe2'])
+
+    def test_given_username_is_kept(self):
+        user = User.objects.create_user('jane@example.com', 'Jane', 'Doe', 'password123', username='jane')
+        self.assertEqual(user.username, 'jane')
+
+    def test_saving_again_keeps_the_username(self):
+        user = User.objects.create_user('jane@example.com', 'Jane', 'Doe', 'password123')
+        user.first_name = 'Janet'
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.username, 'jane')
@@ -5,7 +5,6 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import DetailView, UpdateView, CreateView, ListView
 from django.http import JsonResponse, HttpResponseForbidden
-from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.urls import reverse_lazy
 from django.utils import timezone
@@ -19,6 +18,7 @@ from .forms import (
     UserSearchForm, ContactAdminForm
 )
 from dashboard.models import UserActivity
+from core.pagination import KeysetPaginator, get_page
 
 User = get_user_model()
 
@@ -312,16 +312,14 @@ class UserAchievementsView(LoginRequiredMixin, ListView):
 @login_required
 def user_notifications(request):
     """Display user notifications"""
-    notifications = UserNotification.objects.filter(user=request.user).order_by('-created_at')
+    notifications = UserNotification.objects.filter(user=request.user)
     
     # Mark notifications as read when viewed
     unread_notifications = notifications.filter(is_read=False)
     unread_notifications.update(is_read=True)
     
     # Pagination
-    paginator = Paginator(notifications, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page(request, notifications, ('-created_at', '-id'), 20)
     
     context = {
         'notifications': page_obj,
@@ -530,7 +528,9 @@ def api_user_stats(request):
 @require_http_methods(["GET"])
 def api_user_activity(request):
     """API endpoint for user activity feed"""
-    activities = UserActivity.objects.filter(user=request.user).order_by('-timestamp')[:20]
+    activities = KeysetPaginator(
+        UserActivity.objects.filter(user=request.user), ('-timestamp', '-id'), 20
+    ).get_page(request.GET.get('cursor'))
     
     activity_data = [
         {
@@ -543,7 +543,7 @@ def api_user_activity(request):
         for activity in activities
     ]
     
-    return JsonResponse({'activities': activity_data})
+    return JsonResponse({'activities': activity_data, 'next_cursor': activities.next_cursor})
 
 def user_public_profile(request, username):
     """Public user profile view"""
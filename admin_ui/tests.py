@@ -1,3 +1,74 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from blog.models import BlogCategory, BlogPost, NewsletterCampaign
+
+
+class BlogImportViewTests(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user('staff@example.com', 'Staff', 'User', 'password123', is_staff=True)
+        self.category = BlogCategory.objects.create(name='General')
+        self.client.force_login(self.staff)
+
+    def test_import_form_creates_posts(self):
+        export = SimpleUploadedFile(
+            'posts.json', json.dumps([{'title': 'First'}, {'title': 'Second'}]).encode(), 'application/json'
+        )
+        response = self.client.post(reverse('admin_ui:blog_import'), {
+            'import_source': 'json', 'import_file': export,
+            'default_category': self.category.pk, 'default_status': 'draft', 'preserve_dates': 'on',
+        })
+
+        self.assertRedirects(response, reverse('admin_ui:blog'), fetch_redirect_response=False)
+        self.assertEqual(
+            list(BlogPost.objects.order_by('id').values_list('title', 'author', 'status')),
+            [('First', self.staff.pk, 'draft'), ('Second', self.staff.pk, 'draft')]
+        )
+
+    def test_unreadable_file_shows_an_error(self):
+        export = SimpleUploadedFile('posts.xml', b'<rss><channel><item>', 'text/xml')
+        response = self.client.post(reverse('admin_ui:blog_import'), {
+            'import_source': 'wordpress', 'import_file': export,
+            'default_category': self.category.pk, 'default_status': 'draft',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Invalid WordPress export')
+        self.assertFalse(BlogPost.objects.exists())
+
+
+@override_settings(NEWSLETTER_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class NewsletterViewTests(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user('staff@example.com', 'Staff', 'User', 'password123', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_send_newsletter_queues_a_targeted_campaign(self):
+        response = self.client.post(reverse('admin_ui:newsletter'), {
+            'subject': 'News', 'content': '<p>Hi {{ subscriber.email }}</p>',
+            'subscriber_categories': ['design', 'business'], 'send_newsletter': '',
+        })
+
+        self.assertRedirects(response, reverse('admin_ui:newsletter'))
+        campaign = NewsletterCampaign.objects.get()
+        self.assertEqual(
+            (campaign.status, campaign.subscriber_categories, campaign.created_by),
+            ('queued', ['design', 'business'], self.staff)
+        )
+
+    def test_send_test_keeps_a_draft(self):
+        response = self.client.post(reverse('admin_ui:newsletter'), {
+            'subject': 'News', 'content': '<p>Hi</p>', 'send_to_all': 'on',
+            'test_email': 'editor@example.com', 'send_test': '',
+        })
+
+        self.assertRedirects(response, reverse('admin_ui:newsletter'))
+        self.assertEqual(NewsletterCampaign.objects.get().status, 'draft')
+        self.assertEqual([message.to for message in mail.outbox], [['editor@example.com']])
@@ -9,6 +9,8 @@ urlpatterns = [
     path('users/', views.admin_users, name='users'),
     path('services/', views.admin_services, name='services'),
     path('blog/', views.admin_blog, name='blog'),
+    path('blog/import/', views.admin_blog_import, name='blog_import'),
+    path('newsletter/', views.admin_newsletter, name='newsletter'),
     path('contacts/', views.admin_contacts, name='contacts'),
     path('settings/', views.admin_settings, name='settings'),
 ]
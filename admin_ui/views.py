@@ -1,7 +1,10 @@
-from django.shortcuts import render
+from django.shortcuts import redirect, render
+from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
-from blog.models import BlogPost, ContactMessage
+from django.db import transaction
+from blog.forms import BlogImportForm, EmailNewsletterForm
+from blog.models import BlogPost, ContactMessage, NewsletterCampaign
 from services.models import Service
 
 User = get_user_model()
@@ -45,6 +48,44 @@ def admin_blog(request):
     return render(request, 'admin_ui/blog.html', {'posts': posts})
 
 
+@staff_member_required
+def admin_blog_import(request):
+    """Import blog posts from an export file"""
+    form = BlogImportForm(request.POST or None, request.FILES or None)
+    if request.method == 'POST' and form.is_valid():
+        result = form.import_posts(request.user)
+        if result is not None:
+            messages.success(
+                request,
+                f'Imported {result.imported} posts ({result.skipped} skipped, {result.tags_created} new tags).'
+            )
+            return redirect('admin_ui:blog')
+    return render(request, 'admin_ui/blog_import.html', {'form': form})
+
+
+@staff_member_required
+def admin_newsletter(request):
+    """Write a newsletter and queue it for the send_newsletter command"""
+    form = EmailNewsletterForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        # "Send Test Email" keeps the campaign as a draft
+        queue = 'send_test' not in request.POST
+        try:
+            # A failed test email leaves no campaign behind
+            with transaction.atomic():
+                campaign = form.create_campaign(created_by=request.user, queue=queue)
+        except Exception as e:
+            messages.error(request, f'Failed to send the test email: {e}')
+        else:
+            if queue:
+                messages.success(request, f'Newsletter "{campaign.subject}" queued for sending.')
+            else:
+                messages.success(request, f'Test email sent; "{campaign.subject}" saved as a draft.')
+            return redirect('admin_ui:newsletter')
+    campaigns = NewsletterCampaign.objects.order_by('-created_at')[:10]
+    return render(request, 'admin_ui/newsletter.html', {'form': form, 'campaigns': campaigns})
+
+
 @staff_member_required
 def admin_contacts(request):
     """Contact messages management"""
@@ -8,8 +8,9 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import (
     BlogCategory, BlogPost, BlogComment, BlogTag, 
-    Newsletter, ContactMessage, FAQ, Testimonial
+    Newsletter, ContactMessage, FAQ, Testimonial, NewsletterCampaign, NewsletterFailure, NewsletterInterest
 )
+from .moderation import moderate_comments
 
 @admin.register(BlogCategory)
 class BlogCategoryAdmin(admin.ModelAdmin):
@@ -52,7 +53,7 @@ class BlogPostAdmin(admin.ModelAdmin):
     ]
     search_fields = ['title', 'content', 'excerpt', 'meta_description']
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ['views_count', 'reading_time', 'created_at', 'updated_at']
+    readonly_fields = ['views_count', 'trending_score', 'reading_time', 'created_at', 'updated_at']
     date_hierarchy = 'created_at'
     
     fieldsets = (
@@ -70,7 +71,7 @@ class BlogPostAdmin(admin.ModelAdmin):
             'fields': ('status', 'is_featured', 'allow_comments')
         }),
         ('Statistics', {
-            'fields': ('views_count', 'reading_time'),
+            'fields': ('views_count', 'trending_score', 'reading_time'),
             'classes': ('collapse',)
         }),
         ('Dates', {
@@ -95,18 +96,19 @@ class BlogPostAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} posts published successfully.')
     publish_posts.short_description = "Publish selected posts"
     
+    # Bulk updates skip auto_now; updated_at drives the conditional GET validators
     def unpublish_posts(self, request, queryset):
-        updated = queryset.update(status='draft')
+        updated = queryset.update(status='draft', updated_at=timezone.now())
         self.message_user(request, f'{updated} posts unpublished successfully.')
     unpublish_posts.short_description = "Unpublish selected posts"
     
     def feature_posts(self, request, queryset):
-        updated = queryset.update(is_featured=True)
+        updated = queryset.update(is_featured=True, updated_at=timezone.now())
         self.message_user(request, f'{updated} posts featured successfully.')
     feature_posts.short_description = "Feature selected posts"
     
     def unfeature_posts(self, request, queryset):
-        updated = queryset.update(is_featured=False)
+        updated = queryset.update(is_featured=False, updated_at=timezone.now())
         self.message_user(request, f'{updated} posts unfeatured successfully.')
     unfeature_posts.short_description = "Unfeature selected posts"
     
@@ -141,12 +143,13 @@ class BlogCommentAdmin(admin.ModelAdmin):
     is_reply.short_description = 'Reply'
     
     def approve_comments(self, request, queryset):
-        updated = queryset.update(is_approved=True)
+        # Notifies the commenters like approving one comment at a time does
+        updated = moderate_comments(queryset.values_list('pk', flat=True), approve=True)
         self.message_user(request, f'{updated} comments approved successfully.')
     approve_comments.short_description = "Approve selected comments"
     
     def disapprove_comments(self, request, queryset):
-        updated = queryset.update(is_approved=False)
+        updated = moderate_comments(queryset.values_list('pk', flat=True), approve=False)
         self.message_user(request, f'{updated} comments disapproved successfully.')
     disapprove_comments.short_description = "Disapprove selected comments"
 
@@ -162,13 +165,18 @@ class BlogTagAdmin(admin.ModelAdmin):
         return count
     post_count.short_description = 'Published Posts'
 
+class NewsletterInterestInline(admin.TabularInline):
+    model = NewsletterInterest
+    extra = 0
+
 @admin.register(Newsletter)
 class NewsletterAdmin(admin.ModelAdmin):
     list_display = ['email', 'name', 'is_active', 'subscribed_date']
-    list_filter = ['is_active', 'subscribed_date']
+    list_filter = ['is_active', 'interests__topic', 'subscribed_date']
     search_fields = ['email', 'name']
     readonly_fields = ['subscribed_date']
     date_hierarchy = 'subscribed_date'
+    inlines = [NewsletterInterestInline]
     
     actions = ['activate_subscriptions', 'deactivate_subscriptions']
     
@@ -182,6 +190,36 @@ class NewsletterAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} subscriptions deactivated successfully.')
     deactivate_subscriptions.short_description = "Deactivate selected subscriptions"
 
+class NewsletterFailureInline(admin.TabularInline):
+    model = NewsletterFailure
+    extra = 0
+    can_delete = False
+    fields = ['email', 'error', 'created_at']
+    readonly_fields = ['email', 'error', 'created_at']
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(NewsletterCampaign)
+class NewsletterCampaignAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'sent_count', 'failed_count', 'created_by', 'created_at', 'completed_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject']
+    readonly_fields = [
+        'last_subscriber_id', 'sent_count', 'failed_count', 'last_error',
+        'started_at', 'heartbeat_at', 'completed_at', 'created_at'
+    ]
+    inlines = [NewsletterFailureInline]
+    
+    actions = ['queue_campaigns']
+    
+    def queue_campaigns(self, request, queryset):
+        # Sent by the send_newsletter management command, outside the request;
+        # campaigns being sent stay with their worker
+        updated = queryset.exclude(status__in=['sent', 'sending']).update(status='queued')
+        self.message_user(request, f'{updated} campaigns queued for sending.')
+    queue_campaigns.short_description = "Queue selected campaigns for sending"
+
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
     list_display = [
@@ -4,17 +4,26 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from .models import BlogCategory, BlogPost, BlogComment, BlogTag, Newsletter, ContactMessage
 from .serializers import (
     BlogCategorySerializer, BlogPostListSerializer, BlogPostDetailSerializer,
     BlogPostCreateUpdateSerializer, BlogCommentSerializer, BlogTagSerializer,
-    NewsletterSerializer, ContactMessageSerializer
+    NewsletterSerializer, ContactMessageSerializer, CommentModerationSerializer,
+    annotate_published_posts_count, blog_post_api_queryset
 )
-
-
-class BlogCategoryViewSet(viewsets.ModelViewSet):
-    queryset = BlogCategory.objects.filter(is_active=True)
+from .view_counter import record_view
+from .search import BlogPostSearchFilter
+from .comment_tree import attach_replies
+from .moderation import moderate_comments
+from .trending import trending_posts
+from .conditional import annotate_comment_state, post_list_validators, post_validators, taxonomy_validators
+from core.conditional import ConditionalGetMixin, respond_conditionally
+from core.pagination import PageNumberOrKeysetPagination
+
+
+class BlogCategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = annotate_published_posts_count(BlogCategory.objects.filter(is_active=True))
     serializer_class = BlogCategorySerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['name', 'description']
@@ -26,9 +35,16 @@ class BlogCategoryViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
 
+    def get_list_validators(self, queryset):
+        categories = self.filter_queryset(BlogCategory.objects.filter(is_active=True))
+        return taxonomy_validators(self.request, categories, last_modified=False)
+
+    def get_object_validators(self, instance):
+        return taxonomy_validators(self.request, BlogCategory.objects.filter(pk=instance.pk))
 
-class BlogTagViewSet(viewsets.ModelViewSet):
-    queryset = BlogTag.objects.all()
+
+class BlogTagViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = annotate_published_posts_count(BlogTag.objects.all())
     serializer_class = BlogTagSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['name']
@@ -40,19 +56,33 @@ class BlogTagViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
 
+    def get_list_validators(self, queryset):
+        return taxonomy_validators(self.request, self.filter_queryset(BlogTag.objects.all()), last_modified=False)
 
-class BlogPostViewSet(viewsets.ModelViewSet):
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    def get_object_validators(self, instance):
+        return taxonomy_validators(self.request, BlogTag.objects.filter(pk=instance.pk))
+
+
+class BlogPostViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    # ?search= is answered from the search index, ranked by relevance
+    filter_backends = [DjangoFilterBackend, OrderingFilter, BlogPostSearchFilter]
     filterset_fields = ['category', 'author', 'status', 'is_featured']
-    search_fields = ['title', 'excerpt', 'content']
-    ordering_fields = ['created_at', 'published_date', 'views_count', 'title']
+    ordering_fields = ['created_at', 'published_date', 'views_count', 'trending_score', 'title']
     ordering = ['-published_date', '-created_at']
+    # ?cursor= switches from page numbers to keyset pagination
+    pagination_class = PageNumberOrKeysetPagination
+    keyset_ordering = ('-published_date', '-id')
 
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return BlogPost.objects.all()
-        return BlogPost.objects.filter(status='published')
+            queryset = blog_post_api_queryset(BlogPost.objects.all())
+        else:
+            queryset = blog_post_api_queryset(BlogPost.objects.filter(status='published'))
+        if self.action == 'retrieve':
+            # Comment state for the ETag
+            queryset = annotate_comment_state(queryset)
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -62,7 +92,7 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         return BlogPostDetailSerializer
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'trending']:
             return [permissions.AllowAny()]
         elif self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [permissions.IsAuthenticated()]
@@ -71,28 +101,50 @@ class BlogPostViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def get_list_validators(self, queryset):
+        return post_list_validators(self.request, queryset)
+
+    def get_object_validators(self, instance):
+        return post_validators(instance)
+
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Increment view count
-        instance.views_count += 1
-        instance.save(update_fields=['views_count'])
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        # Buffer the view, also for 304 responses; the serializer adds the
+        # views not yet flushed to the database
+        record_view(instance.pk)
+        etag, last_modified = self.get_object_validators(instance)
+
+        def render():
+            return Response(self.get_serializer(instance).data)
+
+        return respond_conditionally(request, etag, last_modified, render)
 
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """Get featured blog posts"""
-        featured_posts = BlogPost.objects.filter(status='published', is_featured=True)[:5]
+        featured_posts = blog_post_api_queryset(
+            BlogPost.objects.filter(status='published', is_featured=True)
+        )[:5]
         serializer = BlogPostListSerializer(featured_posts, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Get recent blog posts"""
-        recent_posts = BlogPost.objects.filter(status='published').order_by('-published_date')[:10]
+        recent_posts = blog_post_api_queryset(
+            BlogPost.objects.filter(status='published')
+        ).order_by('-published_date')[:10]
         serializer = BlogPostListSerializer(recent_posts, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Get trending blog posts, ranked by the precomputed trending score"""
+        posts = trending_posts(blog_post_api_queryset(BlogPost.objects.all()))
+        page = self.paginate_queryset(posts)
+        serializer = BlogPostListSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def publish(self, request, pk=None):
         """Publish a blog post"""
@@ -117,17 +169,33 @@ class BlogCommentViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['post', 'is_approved']
     ordering = ['created_at']
+    pagination_class = PageNumberOrKeysetPagination
+    keyset_ordering = ('created_at', 'id')
 
     def get_queryset(self):
         user = self.request.user
+        queryset = BlogComment.objects.select_related('author')
         if user.is_staff:
-            return BlogComment.objects.all()
+            return queryset
         elif user.is_authenticated:
             # Users can see approved comments and their own comments
-            return BlogComment.objects.filter(
+            return queryset.filter(
                 models.Q(is_approved=True) | models.Q(author=user)
             )
-        return BlogComment.objects.filter(is_approved=True)
+        return queryset.filter(is_approved=True)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        comments = list(page if page is not None else queryset)
+        
+        # Load the replies of the whole page with a single query
+        attach_replies(comments)
+        
+        serializer = self.get_serializer(comments, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -139,24 +207,36 @@ class BlogCommentViewSet(viewsets.ModelViewSet):
         return [permissions.IsAdminUser()]
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        # The comment and its side effects (blog_comment_posted) commit together
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def approve(self, request, pk=None):
         """Approve a comment"""
         comment = self.get_object()
-        comment.is_approved = True
-        comment.save()
+        moderate_comments([comment.pk], approve=True)
         return Response({'message': 'Comment approved successfully'})
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def reject(self, request, pk=None):
         """Reject a comment"""
         comment = self.get_object()
-        comment.is_approved = False
-        comment.save()
+        moderate_comments([comment.pk], approve=False)
         return Response({'message': 'Comment rejected successfully'})
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser],
+            serializer_class=CommentModerationSerializer)
+    def moderate(self, request):
+        """Approve or reject a list of comments: {"ids": [...], "action": "approve" | "reject"}"""
+        serializer = CommentModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = moderate_comments(
+            serializer.validated_data['ids'],
+            approve=serializer.validated_data['action'] == 'approve'
+        )
+        return Response({'updated': updated})
+
 
 class NewsletterViewSet(viewsets.ModelViewSet):
     queryset = Newsletter.objects.all()
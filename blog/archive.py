@@ -0,0 +1,89 @@
+"""
+Monthly archive of published blog posts.
+
+``BlogArchiveMonth`` keeps the number of published posts per (year, month)
+so the archive sidebar is one small query. The rows are recounted from
+the post save/delete signals, and archive pages filter with half-open
+``published_date`` ranges that can use the (status, published_date) index.
+"""
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BlogArchiveMonth, BlogPost
+
+
+def post_month(published_date):
+    """(year, month) of a publication date in the site's time zone"""
+    local = timezone.localtime(published_date)
+    return local.year, local.month
+
+
+def month_range(year, month=None):
+    """Aware [start, end) datetimes of a month, or of the whole year"""
+    tz = timezone.get_current_timezone()
+    if month is None:
+        start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    else:
+        start = datetime(year, month, 1)
+        end = datetime(year + (month == 12), month % 12 + 1, 1)
+    return timezone.make_aware(start, tz), timezone.make_aware(end, tz)
+
+
+def archive_filter(year=None, month=None):
+    """Q restricting ``published_date`` to a year, a month, or a month of any year"""
+    if year is not None:
+        start, end = month_range(year, month)
+        return Q(published_date__gte=start, published_date__lt=end)
+    if month is not None:
+        years = BlogArchiveMonth.objects.filter(
+            month=month, post_count__gt=0
+        ).values_list('year', flat=True)
+        condition = Q(pk__in=[])
+        for archive_year in years:
+            start, end = month_range(archive_year, month)
+            condition |= Q(published_date__gte=start, published_date__lt=end)
+        return condition
+    return Q()
+
+
+def refresh_archive_months(months):
+    """Recount the published posts of the given (year, month) pairs"""
+    for year, month in set(months):
+        start, end = month_range(year, month)
+        count = BlogPost.objects.filter(
+            status='published',
+            published_date__gte=start,
+            published_date__lt=end
+        ).count()
+        if count:
+            BlogArchiveMonth.objects.update_or_create(
+                year=year, month=month, defaults={'post_count': count}
+            )
+        else:
+            BlogArchiveMonth.objects.filter(year=year, month=month).delete()
+
+
+def rebuild_archive():
+    """Recount every month from scratch"""
+    counts = {}
+    dates = BlogPost.objects.filter(
+        status='published',
+        published_date__isnull=False
+    ).values_list('published_date', flat=True)
+    for published_date in dates.iterator():
+        key = post_month(published_date)
+        counts[key] = counts.get(key, 0) + 1
+
+    BlogArchiveMonth.objects.all().delete()
+    BlogArchiveMonth.objects.bulk_create([
+        BlogArchiveMonth(year=year, month=month, post_count=count)
+        for (year, month), count in counts.items()
+    ])
+    return len(counts)
+
+
+def get_archive_months():
+    """Months with published posts, newest first"""
+    return list(BlogArchiveMonth.objects.filter(post_count__gt=0))
@@ -0,0 +1,104 @@
+"""
+Load threaded blog comments in a single query.
+
+Comments carry a materialized ``path``; ordering a post's comments by it
+yields the tree in depth-first order, which is assembled in memory here.
+Every loaded comment gets a ``thread_replies`` list that serializers and
+templates read instead of querying ``replies``.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import BlogComment
+
+
+def get_max_depth():
+    return getattr(settings, 'BLOG_COMMENT_TREE_MAX_DEPTH', 5)
+
+
+def get_max_comments():
+    return getattr(settings, 'BLOG_COMMENT_TREE_MAX_COMMENTS', 500)
+
+
+def build_tree(comments, root_depth=0):
+    """
+    Link a path-ordered list of comments into trees and return the roots.
+
+    Comments whose parent is not in the list (e.g. it is not approved or
+    was cut off by a limit) are dropped with their whole branch.
+    """
+    by_id = {}
+    roots = []
+    for comment in comments:
+        comment.thread_replies = []
+        by_id[comment.pk] = comment
+        if comment.depth == root_depth:
+            roots.append(comment)
+        elif comment.parent_id in by_id:
+            by_id[comment.parent_id].thread_replies.append(comment)
+    return roots
+
+
+def load_comment_tree(post, max_depth=None, max_comments=None):
+    """
+    Return ``(roots, truncated)`` for the approved comments of a post.
+
+    Threads deeper than ``max_depth`` are cut, and at most ``max_comments``
+    comments are loaded, taken from the newest threads; ``truncated`` tells
+    whether the size limit was hit. Roots come back oldest first.
+    """
+    max_depth = get_max_depth() if max_depth is None else max_depth
+    max_comments = get_max_comments() if max_comments is None else max_comments
+
+    approved = BlogComment.objects.filter(post=post, is_approved=True)
+    root_paths = list(
+        approved.filter(depth=0).order_by('-path').values_list('path', flat=True)[:max_comments + 1]
+    )
+    if not root_paths:
+        return [], False
+    truncated = len(root_paths) > max_comments
+    root_paths = root_paths[:max_comments]
+
+    # Every thread at or after the oldest selected root sorts after its path;
+    # reading them backwards keeps the newest threads when the limit cuts in
+    comments = list(
+        approved.filter(depth__lte=max_depth, path__gte=root_paths[-1])
+        .select_related('author')
+        .order_by('-path')[:max_comments + 1]
+    )
+    truncated = truncated or len(comments) > max_comments
+    return build_tree(comments[:max_comments][::-1]), truncated
+
+
+def attach_replies(comments, max_depth=None):
+    """Fill ``thread_replies`` on the given comments with one query for all their descendants"""
+    comments = [comment for comment in comments if comment.path]
+    for comment in comments:
+        comment.thread_replies = []
+    if not comments:
+        return comments
+
+    max_depth = get_max_depth() if max_depth is None else max_depth
+    prefixes = Q()
+    for comment in comments:
+        prefixes |= Q(post_id=comment.post_id, path__startswith=f"{comment.path}/")
+
+    descendants = BlogComment.objects.filter(
+        prefixes, is_approved=True
+    ).select_related('author').order_by('path')
+
+    by_id = {comment.pk: comment for comment in comments}
+    # Depth relative to the comment the thread was requested for
+    relative_depth = {comment.pk: 0 for comment in comments}
+    for descendant in descendants:
+        parent = by_id.get(descendant.parent_id)
+        depth = relative_depth.get(descendant.parent_id, max_depth) + 1
+        if parent is None or depth > max_depth:
+            continue
+        # Reuse the instance if this reply was itself one of the requested comments
+        descendant = by_id.setdefault(descendant.pk, descendant)
+        if not hasattr(descendant, 'thread_replies'):
+            descendant.thread_replies = []
+        relative_depth[descendant.pk] = min(depth, relative_depth.get(descendant.pk, depth))
+        parent.thread_replies.append(descendant)
+    return comments
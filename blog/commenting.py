@@ -0,0 +1,102 @@
+"""
+Posting blog comments.
+
+``post_comment()`` saves a new comment in a transaction. Its side effects
+(points, activity, notifications, commenter achievements) are applied by
+``apply_comment_side_effects()``, which the ``blog_comment_posted``
+receiver runs once for every created comment, whether it came from the
+site, the API or the admin. Points are added with one F() UPDATE instead
+of ``User.save()`` and all notifications are written with one
+``bulk_create``.
+"""
+from django.db import transaction
+
+from accounts.models import UserAchievement, UserNotification
+from accounts.signals import increment_points
+from dashboard.models import UserActivity
+from .models import BlogComment
+from .moderation import approval_notification
+
+COMMENT_POINTS = 5
+
+# (approved comments, title, description); awards threshold points
+COMMENTER_ACHIEVEMENTS = [
+    (10, 'Active Commenter', 'Made 10 comments'),
+    (25, 'Community Contributor', 'Made 25 comments'),
+    (50, 'Discussion Leader', 'Made 50 comments'),
+    (100, 'Community Champion', 'Made 100 comments'),
+]
+
+
+def commenter_achievement(comment):
+    """The achievement this (approved) comment earns its author, if any"""
+    if not comment.is_approved:
+        # Unapproved comments do not change the count
+        return None
+    comment_count = BlogComment.objects.filter(author_id=comment.author_id, is_approved=True).count()
+    for threshold, title, description in COMMENTER_ACHIEVEMENTS:
+        if comment_count == threshold:
+            return UserAchievement(
+                user_id=comment.author_id,
+                title=title,
+                description=description,
+                achievement_type='points_milestone',
+                points_awarded=threshold,
+                badge_icon='fas fa-comments'
+            )
+    return None
+
+
+def apply_comment_side_effects(comment):
+    """Rewards and notifications for a newly created comment"""
+    post, author = comment.post, comment.author
+    points = COMMENT_POINTS
+
+    UserActivity.objects.create(
+        user=author,
+        activity_type='comment',
+        description=f'Commented on: {post.title}'
+    )
+
+    # One notification per recipient; replies to the post author's own
+    # comments get the reply notification only
+    notifications = {}
+    if post.author_id != author.pk:
+        notifications[post.author_id] = UserNotification(
+            user_id=post.author_id,
+            title='New Comment on Your Post',
+            message=f'{author.get_full_name()} commented on "{post.title}"',
+            notification_type='comment'
+        )
+    if comment.parent_id and comment.parent.author_id != author.pk:
+        notifications[comment.parent.author_id] = UserNotification(
+            user_id=comment.parent.author_id,
+            title='Reply to Your Comment',
+            message=f'{author.get_full_name()} replied to your comment on "{post.title}"',
+            notification_type='comment'
+        )
+    notifications = list(notifications.values())
+    if comment.is_approved:
+        notifications.append(approval_notification(author.pk, post.title))
+
+    achievement = commenter_achievement(comment)
+    if achievement:
+        # bulk_create skips achievement_earned_notification; do its work here
+        UserAchievement.objects.bulk_create([achievement])
+        notifications.append(UserNotification(
+            user_id=author.pk,
+            title='Achievement Unlocked!',
+            message=f'You earned the "{achievement.title}" achievement!',
+            notification_type='achievement_unlocked'
+        ))
+        points += achievement.points_awarded
+
+    UserNotification.objects.bulk_create(notifications)
+    increment_points(author, points)
+
+
+def post_comment(comment):
+    """Save a new comment and apply its side effects atomically"""
+    with transaction.atomic():
+        comment.save()
+    return comment
@@ -0,0 +1,78 @@
+"""
+Validators for conditional GETs of blog pages and API endpoints
+(see core.conditional).
+
+A post's content changes with its ``updated_at`` and with its approved
+comments, so post querysets are annotated with the comment state and the
+validators are computed from the loaded row. Lists are validated by an
+ETag over the newest ``updated_at`` and the row count of the filtered
+queryset, plus the request path (page, ordering, filters) and whether
+drafts are visible.
+The post page also covers the related and adjacent posts and the sidebar
+it shows.
+"""
+from django.db.models import Count, Max, Q, Sum
+
+from core.conditional import latest, make_etag, queryset_state
+
+
+def annotate_comment_state(queryset):
+    """Annotate posts with the count and last change of their approved comments"""
+    approved = Q(comments__is_approved=True)
+    # blog_post_api_queryset() already counts them
+    if 'approved_comments_count' not in queryset.query.annotations:
+        queryset = queryset.annotate(
+            approved_comments_count=Count('comments', filter=approved, distinct=True)
+        )
+    return queryset.annotate(last_comment_at=Max('comments__updated_at', filter=approved))
+
+
+def post_validators(post, *parts):
+    """(etag, last_modified) of a post annotated by ``annotate_comment_state``"""
+    etag = make_etag(post.pk, post.updated_at, post.approved_comments_count, post.last_comment_at, *parts)
+    return etag, latest(post.updated_at, post.last_comment_at)
+
+
+def posts_state(posts):
+    """ETag part for the other posts a page links to"""
+    return [(post.pk, post.updated_at) for post in posts if post is not None]
+
+
+def sidebar_state(sidebar):
+    """ETag part for the sidebar bundle: what it lists and the post counts"""
+    return (
+        posts_state(sidebar['featured_posts'] + sidebar['recent_posts']),
+        [(category.pk, category.updated_at, category.post_count) for category in sidebar['categories']],
+        [(tag.pk, tag.updated_at, tag.post_count) for tag in sidebar['popular_tags']],
+    )
+
+
+def post_list_validators(request, queryset):
+    """(etag, None) of a filtered post list carrying ``approved_comments_count``"""
+    state = queryset_state(queryset, comments=Sum('approved_comments_count'))
+    etag = make_etag(
+        request.get_full_path(), request.user.is_staff,
+        state['last_modified'], state['count'], state['comments']
+    )
+    # A deletion moves no date, so lists have no Last-Modified
+    return etag, None
+
+
+def taxonomy_validators(request, queryset, last_modified=True):
+    """
+    (etag, last_modified) of categories or tags with their published post
+    counts; post links are counted so retagging changes the ETag too.
+    Lists pass ``last_modified=False``, as a deletion moves no date.
+    """
+    state = queryset_state(
+        queryset,
+        posts_modified=Max('posts__updated_at'),
+        published_links=Count('posts', filter=Q(posts__status='published')),
+    )
+    etag = make_etag(
+        request.get_full_path(), state['last_modified'], state['count'],
+        state['posts_modified'], state['published_links']
+    )
+    if not last_modified:
+        return etag, None
+    return etag, latest(state['last_modified'], state['posts_modified'])
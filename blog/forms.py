@@ -1,6 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Fieldset, Row, Column, Submit, HTML, Div
@@ -9,8 +10,11 @@ from ckeditor_uploader.widgets import CKEditorUploadingWidget
 
 from .models import (
     BlogPost, BlogCategory, BlogComment, BlogTag, Newsletter,
-    ContactMessage, FAQ, Testimonial
+    ContactMessage, FAQ, Testimonial, NewsletterCampaign, NewsletterInterest
 )
+from .newsletter import send_test_message, set_interests
+from .importer import BlogImportError, import_posts
+from .tagging import set_post_tag_names
 
 User = get_user_model()
 
@@ -173,23 +177,18 @@ class BlogPostForm(forms.ModelForm):
             post.status = 'published'
             post.published_date = timezone.now()
         elif self.cleaned_data.get('schedule_publish'):
-            post.status = 'draft'  # Will be published later by a scheduled task
+            post.status = 'draft'  # Published later by the publish_scheduled_posts command
             post.published_date = self.cleaned_data['schedule_publish']
+            post.is_scheduled = True
         
         if commit:
-            post.save()
-            self.save_m2m()
-            
-            # Handle tags
-            tag_names = self.cleaned_data.get('tags', [])
-            post.tags.clear()
-            
-            for tag_name in tag_names:
-                tag, created = BlogTag.objects.get_or_create(
-                    name=tag_name,
-                    defaults={'slug': tag_name.lower().replace(' ', '-')}
-                )
-                post.tags.add(tag)
+            # One transaction, so related posts are recomputed once
+            with transaction.atomic():
+                post.save()
+                self.save_m2m()
+                
+                # Handle tags
+                set_post_tag_names(post, self.cleaned_data.get('tags', []))
         
         return post
 
@@ -300,15 +299,7 @@ class NewsletterForm(forms.ModelForm):
     """Newsletter subscription form with preferences"""
     
     interests = forms.MultipleChoiceField(
-        choices=[
-            ('programming', 'Programming & Development'),
-            ('design', 'Design & UX/UI'),
-            ('cybersecurity', 'Cybersecurity'),
-            ('ai_ml', 'AI & Machine Learning'),
-            ('marketing', 'Digital Marketing'),
-            ('business', 'Business & Entrepreneurship'),
-            ('career', 'Career Development'),
-        ],
+        choices=NewsletterInterest.TOPIC_CHOICES,
         widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
         required=False,
         help_text="Select topics you're interested in (optional)"
@@ -369,6 +360,12 @@ class NewsletterForm(forms.ModelForm):
         if Newsletter.objects.filter(email=email, is_active=True).exists():
             raise ValidationError('This email is already subscribed to our newsletter.')
         return email
+    
+    def save(self, commit=True):
+        subscriber = super().save(commit)
+        if commit:
+            set_interests(subscriber, self.cleaned_data.get('interests'))
+        return subscriber
 
 class BlogSearchForm(forms.Form):
     """Advanced form for searching blog posts"""
@@ -413,6 +410,7 @@ class BlogSearchForm(forms.Form):
             ('-published_date', 'Newest First'),
             ('published_date', 'Oldest First'),
             ('-views_count', 'Most Popular'),
+            ('-trending_score', 'Trending'),
             ('title', 'Title A-Z'),
             ('-title', 'Title Z-A'),
             ('-created_at', 'Recently Added'),
@@ -669,15 +667,10 @@ class EmailNewsletterForm(forms.Form):
         help_text="Send test email to this address first"
     )
     subscriber_categories = forms.MultipleChoiceField(
-        choices=[
-            ('programming', 'Programming Enthusiasts'),
-            ('design', 'Design Professionals'),
-            ('business', 'Business Leaders'),
-            ('students', 'Students'),
-        ],
+        choices=NewsletterInterest.TOPIC_CHOICES,
         widget=forms.CheckboxSelectMultiple(),
         required=False,
-        help_text="Target specific subscriber categories"
+        help_text="Target subscribers interested in these topics"
     )
     
     def __init__(self, *args, **kwargs):
@@ -699,6 +692,30 @@ class EmailNewsletterForm(forms.Form):
                 Submit('send_newsletter', 'Send Newsletter', css_class='btn btn-primary ms-2'),
             )
         )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('send_to_all'):
+            cleaned_data['subscriber_categories'] = []
+        elif not cleaned_data.get('subscriber_categories'):
+            raise forms.ValidationError("Choose the subscriber categories or send to all subscribers.")
+        return cleaned_data
+    
+    def create_campaign(self, created_by=None, queue=True):
+        """Store the newsletter as a campaign for the send_newsletter command"""
+        campaign = NewsletterCampaign.objects.create(
+            subject=self.cleaned_data['subject'],
+            content=self.cleaned_data['content'],
+            subscriber_categories=self.cleaned_data['subscriber_categories'],
+            status='queued' if queue else 'draft',
+            created_by=created_by,
+        )
+        
+        test_email = self.cleaned_data.get('test_email')
+        if test_email:
+            send_test_message(campaign, test_email)
+        
+        return campaign
 
 class ContactMessageFilterForm(forms.Form):
     """Form for filtering contact messages in admin"""
@@ -822,7 +839,7 @@ class BlogImportForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-control'})
     )
     import_file = forms.FileField(
-        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.xml,.csv,.json'}),
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.xml,.zip,.csv,.json,.jsonl'}),
         help_text="Upload your export file"
     )
     default_category = forms.ModelChoiceField(
@@ -865,6 +882,21 @@ class BlogImportForm(forms.Form):
                 Submit('submit', 'Import Posts', css_class='btn btn-primary'),
             )
         )
+    
+    def import_posts(self, author):
+        """Run the import; returns an ImportResult, or None with a form error if the file is unreadable"""
+        try:
+            return import_posts(
+                self.cleaned_data['import_file'],
+                self.cleaned_data['import_source'],
+                default_author=author,
+                default_category=self.cleaned_data['default_category'],
+                default_status=self.cleaned_data['default_status'],
+                preserve_dates=self.cleaned_data['preserve_dates'],
+            )
+        except BlogImportError as e:
+            self.add_error('import_file', str(e))
+            return None
 
 class SubscriberPreferencesForm(forms.Form):
     """Form for managing subscriber preferences"""
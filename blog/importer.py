@@ -0,0 +1,502 @@
+"""
+Streaming import of blog posts from WordPress (WXR), Medium, CSV and JSON
+exports.
+
+Each parser reads its file incrementally and yields ``ImportedPost``
+records: WXR with ``iterparse`` (every ``<item>`` is dropped once it has
+been read), Medium zip archives one member at a time, CSV row by row and
+JSON one array element (or JSON Lines record) at a time. ``BlogImporter``
+groups the records into batches of ``BLOG_IMPORT_BATCH_SIZE`` and writes
+each batch with a handful of ``bulk_create`` calls, resolving authors,
+categories and tags through in-memory maps so each one is looked up once
+per import. ``bulk_create`` does not send model signals, so the derived
+data the signals would maintain (search index, archive months, sidebar) is
+written in bulk here instead.
+"""
+import csv
+import io
+import json
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from html import unescape
+from html.parser import HTMLParser
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import slugify
+
+from core.content import truncate_text
+from core.slugs import unique_values
+from .archive import post_month, refresh_archive_months
+from .models import BlogCategory, BlogPost, BlogTag
+from .search import index_new_posts
+from .sidebar import invalidate_sidebar
+from .tagging import normalize_tag_names, resolve_tags
+
+User = get_user_model()
+
+TITLE_MAX_LENGTH = BlogPost._meta.get_field('title').max_length
+EXCERPT_MAX_LENGTH = 300
+POST_STATUSES = {status for status, _ in BlogPost.STATUS_CHOICES}
+
+# WordPress post statuses; anything else (trash, auto-draft, inherit) is skipped
+WORDPRESS_STATUSES = {
+    'publish': 'published',
+    'future': 'draft',
+    'draft': 'draft',
+    'pending': 'draft',
+    'private': 'archived',
+}
+
+
+class BlogImportError(Exception):
+    """The export file could not be read"""
+
+
+@dataclass
+class ImportedPost:
+    title: str
+    content: str = ''
+    excerpt: str = ''
+    slug: str = ''
+    status: str = ''
+    published_date: datetime = None
+    author: str = ''  # email or username
+    category: str = ''  # name or slug
+    tags: list = field(default_factory=list)
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    skipped: int = 0
+    tags_created: int = 0
+
+
+def get_import_batch_size():
+    return getattr(settings, 'BLOG_IMPORT_BATCH_SIZE', 500)
+
+
+def to_datetime(value):
+    """Parse an ISO date/datetime from an export; naive values use the site time zone"""
+    if isinstance(value, datetime):
+        parsed = value
+    elif not value:
+        return None
+    else:
+        value = str(value).strip()
+        try:
+            parsed = parse_datetime(value.replace('Z', '+00:00'))
+            if parsed is None:
+                day = parse_date(value)
+                parsed = datetime(day.year, day.month, day.day) if day else None
+        except ValueError:
+            parsed = None
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def split_tags(value):
+    """Tags from a list or a comma/pipe separated string"""
+    if isinstance(value, (list, tuple)):
+        return normalize_tag_names(value)
+    return normalize_tag_names(str(value or '').replace('|', ',').split(','))
+
+
+# WordPress
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _wxr_date(item):
+    gmt = item.get('post_date_gmt', '')
+    if gmt and not gmt.startswith('0000'):
+        try:
+            return datetime.strptime(gmt, '%Y-%m-%d %H:%M:%S').replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            pass
+    if item.get('pubDate'):
+        try:
+            return parsedate_to_datetime(item['pubDate'])
+        except (TypeError, ValueError):
+            pass
+    local = item.get('post_date', '')
+    if local and not local.startswith('0000'):
+        return to_datetime(local)
+    return None
+
+
+def _wxr_item(elem, author_emails):
+    """ImportedPost for a WXR <item>, or None for pages, attachments and trash"""
+    item = {}
+    categories, tags = [], []
+    for child in elem:
+        name = _local_name(child.tag)
+        text = child.text or ''
+        if name == 'encoded':
+            # content:encoded and excerpt:encoded share the local name
+            item['excerpt' if 'excerpt' in child.tag else 'content'] = text
+        elif name == 'category':
+            if child.get('domain') == 'post_tag':
+                tags.append(text.strip())
+            elif child.get('domain') == 'category':
+                categories.append(child.get('nicename') or text.strip())
+        else:
+            item[name] = text
+
+    status = WORDPRESS_STATUSES.get(item.get('status', 'publish'))
+    if item.get('post_type', 'post') != 'post' or status is None:
+        return None
+
+    creator = item.get('creator', '').strip()
+    return ImportedPost(
+        title=item.get('title', '').strip(),
+        content=item.get('content', ''),
+        excerpt=item.get('excerpt', '').strip(),
+        slug=item.get('post_name', ''),
+        status=status,
+        published_date=_wxr_date(item),
+        author=author_emails.get(creator, creator),
+        category=categories[0] if categories else '',
+        tags=split_tags(tags),
+    )
+
+
+def parse_wordpress(fileobj):
+    """Yield the posts of a WordPress WXR export"""
+    author_emails = {}
+    channel = None
+    try:
+        for event, elem in iterparse(fileobj, events=('start', 'end')):
+            name = _local_name(elem.tag)
+            if event == 'start':
+                if name == 'channel':
+                    channel = elem
+                continue
+
+            if name == 'item':
+                yield _wxr_item(elem, author_emails)
+            elif name == 'author' and elem.tag.startswith('{http://wordpress.org/export/'):
+                # <wp:author> entries map the login in <dc:creator> to an email
+                fields = {_local_name(child.tag): (child.text or '').strip() for child in elem}
+                if fields.get('author_login') and fields.get('author_email'):
+                    author_emails[fields['author_login']] = fields['author_email']
+            else:
+                continue
+
+            # Drop the element so memory stays flat however long the export is
+            elem.clear()
+            if channel is not None:
+                channel.remove(elem)
+    except ParseError as e:
+        raise BlogImportError(f"Invalid WordPress export: {e}")
+
+
+# Medium
+
+class _MediumPostParser(HTMLParser):
+    """Title, subtitle, body HTML and date of one post of a Medium export"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.title = ''
+        self.subtitle = []
+        self.body = []
+        self.published = ''
+        self._in_title = False
+        self._section = None  # data-field of the open top-level section
+        self._depth = 0  # nested <section> tags inside it
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self._section == 'body':
+            if tag == 'section':
+                self._depth += 1
+            self.body.append(self.get_starttag_text())
+            return
+        if tag == 'section' and attrs.get('data-field') in ('body', 'subtitle'):
+            self._section = attrs['data-field']
+            self._depth = 0
+        elif tag == 'h1' and 'p-name' in (attrs.get('class') or '') and not self.title:
+            self._in_title = True
+        elif tag == 'time' and 'dt-published' in (attrs.get('class') or ''):
+            self.published = attrs.get('datetime', '')
+
+    def handle_startendtag(self, tag, attrs):
+        if self._section == 'body':
+            self.body.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self._section and tag == 'section':
+            if self._depth:
+                self._depth -= 1
+            else:
+                self._section = None
+                return
+        if self._section == 'body':
+            self.body.append(f"</{tag}>")
+        elif tag == 'h1':
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._section == 'body':
+            self.body.append(data)
+        elif self._section == 'subtitle':
+            self.subtitle.append(data)
+        elif self._in_title:
+            self.title += data
+
+    def handle_entityref(self, name):
+        self.handle_data(f"&{name};")
+
+    def handle_charref(self, name):
+        self.handle_data(f"&#{name};")
+
+
+def parse_medium(fileobj):
+    """Yield the posts of a Medium export archive (posts/*.html)"""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise BlogImportError(f"Invalid Medium export: {e}")
+
+    with archive:
+        for info in archive.infolist():
+            filename = info.filename.rsplit('/', 1)[-1]
+            if not info.filename.startswith('posts/') or not filename.endswith('.html'):
+                continue
+            parser = _MediumPostParser()
+            parser.feed(archive.read(info).decode('utf-8', errors='replace'))
+            parser.close()
+            yield ImportedPost(
+                title=unescape(' '.join(parser.title.split())),
+                content=''.join(parser.body),
+                excerpt=unescape(' '.join(''.join(parser.subtitle).split())),
+                status='draft' if filename.startswith('draft_') else 'published',
+                published_date=to_datetime(parser.published),
+            )
+
+
+# CSV and JSON
+
+def _post_from_record(record):
+    """ImportedPost from a CSV row or JSON object"""
+    if not isinstance(record, dict):
+        return None
+    record = {str(key).strip().lower(): value for key, value in record.items()}
+    return ImportedPost(
+        title=str(record.get('title') or '').strip(),
+        content=str(record.get('content') or ''),
+        excerpt=str(record.get('excerpt') or '').strip(),
+        slug=str(record.get('slug') or ''),
+        status=str(record.get('status') or '').strip().lower(),
+        published_date=to_datetime(record.get('published_date') or record.get('date')),
+        author=str(record.get('author') or record.get('author_email') or '').strip(),
+        category=str(record.get('category') or '').strip(),
+        tags=split_tags(record.get('tags')),
+    )
+
+
+def parse_csv(fileobj):
+    """Yield the posts of a CSV file with a header row (title, content, excerpt, tags, ...)"""
+    stream = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.DictReader(stream):
+            yield _post_from_record(row)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise BlogImportError(f"Invalid CSV file: {e}")
+    finally:
+        stream.detach()
+
+
+def iter_json_values(stream, chunk_size=64 * 1024):
+    """
+    Yield the elements of a top-level JSON array, or the records of a JSON
+    Lines file, reading ``chunk_size`` characters at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    while True:
+        # Skip whitespace and the separators between top-level values
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            chunk = stream.read(chunk_size)
+            buffer, position, eof = chunk, 0, not chunk
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise BlogImportError(f"Invalid JSON file: {e}")
+            chunk = stream.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+
+        buffer, position = buffer[end:], 0
+        if isinstance(value, dict) and isinstance(value.get('posts'), list):
+            # {"posts": [...]} wrapper; only this form is read into memory whole
+            yield from value['posts']
+        else:
+            yield value
+
+
+def parse_json(fileobj):
+    """Yield the posts of a JSON array of post objects (or JSON Lines)"""
+    stream = io.TextIOWrapper(fileobj, encoding='utf-8-sig')
+    try:
+        for record in iter_json_values(stream):
+            yield _post_from_record(record)
+    except UnicodeDecodeError as e:
+        raise BlogImportError(f"Invalid JSON file: {e}")
+    finally:
+        stream.detach()
+
+
+PARSERS = {
+    'wordpress': parse_wordpress,
+    'medium': parse_medium,
+    'csv': parse_csv,
+    'json': parse_json,
+}
+
+
+class BlogImporter:
+    """Writes parsed posts to the database in fixed-size batches"""
+
+    def __init__(self, default_author, default_category, default_status='draft',
+                 preserve_dates=True, batch_size=None):
+        self.default_author = default_author
+        self.default_category = default_category
+        self.default_status = default_status
+        self.preserve_dates = preserve_dates
+        self.batch_size = batch_size or get_import_batch_size()
+
+        # Lower-cased key -> id, filled as the import goes
+        self.author_ids = {}
+        self.tag_ids = {}
+        self.category_ids = {}
+        for category_id, name, slug in BlogCategory.objects.values_list('id', 'name', 'slug'):
+            self.category_ids[name.lower()] = category_id
+            self.category_ids[slug.lower()] = category_id
+
+        self.tag_count = BlogTag.objects.count()
+        self.months = set()
+        self.result = ImportResult()
+
+    def run(self, records):
+        batch = []
+        for record in records:
+            if record is None or not record.title:
+                self.result.skipped += 1
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+
+        self.result.tags_created = BlogTag.objects.count() - self.tag_count
+        refresh_archive_months(self.months)
+        invalidate_sidebar()
+        return self.result
+
+    # Lookups
+
+    def resolve_authors(self, records):
+        keys = {record.author.lower() for record in records if record.author}
+        missing = keys - self.author_ids.keys()
+        if missing:
+            for user_id, email, username in User.objects.filter(
+                Q(email__in=missing) | Q(username__in=missing)
+            ).values_list('id', 'email', 'username'):
+                self.author_ids[email.lower()] = user_id
+                self.author_ids[username.lower()] = user_id
+            for key in missing - self.author_ids.keys():
+                # Unknown authors are credited to the importing user
+                self.author_ids[key] = self.default_author.pk
+
+    def resolve_tags(self, records):
+        names = [
+            name for record in records for name in record.tags
+            if name.lower() not in self.tag_ids
+        ]
+        if names:
+            self.tag_ids.update(resolve_tags(names))
+
+    # Writing
+
+    def build_post(self, record, slug, now):
+        status = record.status if record.status in POST_STATUSES else self.default_status
+        published_date = record.published_date if self.preserve_dates else None
+        if status == 'published' and published_date is None:
+            published_date = now
+
+        post = BlogPost(
+            title=record.title[:TITLE_MAX_LENGTH],
+            slug=slug,
+            author_id=self.author_ids.get(record.author.lower(), self.default_author.pk),
+            category_id=self.category_ids.get(record.category.lower(), self.default_category.pk),
+            excerpt=truncate_text(record.excerpt, EXCERPT_MAX_LENGTH),
+            content=record.content,
+            status=status,
+            published_date=published_date,
+        )
+        post.process_content()
+        return post
+
+    def import_batch(self, records):
+        now = timezone.now()
+        with transaction.atomic():
+            self.resolve_authors(records)
+            self.resolve_tags(records)
+            slugs = unique_values(BlogPost, 'slug', [slugify(r.slug or r.title) or 'post' for r in records])
+            posts = [self.build_post(record, slug, now) for record, slug in zip(records, slugs)]
+
+            BlogPost.objects.bulk_create(posts)
+            if any(post.pk is None for post in posts):
+                # MySQL does not return the ids of bulk inserted rows
+                ids = dict(BlogPost.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+                for post in posts:
+                    post.pk = ids[post.slug]
+
+            Through = BlogTag.posts.through
+            Through.objects.bulk_create([
+                Through(blogtag_id=self.tag_ids[name.lower()], blogpost_id=post.pk)
+                for record, post in zip(records, posts)
+                for name in record.tags
+            ], ignore_conflicts=True)
+
+            index_new_posts(posts)
+
+        self.months.update(
+            post_month(post.published_date) for post in posts
+            if post.status == 'published' and post.published_date
+        )
+        self.result.imported += len(posts)
+
+
+def import_posts(fileobj, source, default_author, default_category, default_status='draft',
+                 preserve_dates=True, batch_size=None):
+    """Import an export file; returns an ``ImportResult``"""
+    if source not in PARSERS:
+        raise BlogImportError(f"Unsupported import source: {source}")
+    importer = BlogImporter(
+        default_author, default_category, default_status, preserve_dates, batch_size
+    )
+    return importer.run(PARSERS[source](fileobj))
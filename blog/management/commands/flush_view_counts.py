@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.models import BlogPost
+from blog.view_counter import buffer_is_local, flush_view_counts, get_flush_interval
+
+
+class Command(BaseCommand):
+    help = 'Write buffered blog post views to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and flush once per interval')
+        parser.add_argument('--interval', type=int, help='Seconds between flushes (defaults to BLOG_VIEW_COUNT_FLUSH_INTERVAL)')
+        parser.add_argument('--all', action='store_true', help='Check every post, not only the ones logged as viewed')
+
+    def handle(self, *args, **options):
+        interval = options.get('interval') or get_flush_interval()
+        if buffer_is_local():
+            self.stdout.write(self.style.WARNING(
+                'The cache is local to each process, so only views buffered by this one are flushed; '
+                'the web processes flush their own'
+            ))
+
+        while True:
+            post_ids = BlogPost.objects.values_list('pk', flat=True) if options.get('all') else None
+            flushed = flush_view_counts(post_ids)
+            if flushed is None:
+                self.stdout.write(self.style.WARNING('Another flush is running, skipped'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} views'))
+
+            if not options.get('loop'):
+                break
+            time.sleep(interval)
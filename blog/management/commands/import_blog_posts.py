@@ -0,0 +1,64 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.importer import PARSERS, BlogImportError, import_posts
+from blog.models import BlogCategory, BlogPost
+
+EXTENSION_SOURCES = {
+    '.xml': 'wordpress',
+    '.zip': 'medium',
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'json',
+}
+
+
+class Command(BaseCommand):
+    help = 'Import blog posts from a WordPress (WXR), Medium, CSV or JSON export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Export file to import')
+        parser.add_argument('--source', choices=sorted(PARSERS), help='Export format (guessed from the file extension by default)')
+        parser.add_argument('--author', required=True, help='Email of the user credited for posts whose author is unknown')
+        parser.add_argument('--category', required=True, help='Slug of the category for posts without a known category')
+        parser.add_argument('--status', choices=[status for status, _ in BlogPost.STATUS_CHOICES], default='draft',
+                            help='Status for posts whose export has none')
+        parser.add_argument('--no-preserve-dates', action='store_true', help='Ignore the original publication dates')
+        parser.add_argument('--batch-size', type=int, help='Posts written per transaction (defaults to BLOG_IMPORT_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        source = options.get('source') or EXTENSION_SOURCES.get(os.path.splitext(path)[1].lower())
+        if not source:
+            raise CommandError('Could not guess the export format, pass --source')
+
+        try:
+            author = get_user_model().objects.get(email=options['author'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['author']}")
+        try:
+            category = BlogCategory.objects.get(slug=options['category'])
+        except BlogCategory.DoesNotExist:
+            raise CommandError(f"No blog category with slug {options['category']}")
+
+        try:
+            with open(path, 'rb') as export:
+                result = import_posts(
+                    export,
+                    source,
+                    default_author=author,
+                    default_category=category,
+                    default_status=options['status'],
+                    preserve_dates=not options['no_preserve_dates'],
+                    batch_size=options.get('batch_size'),
+                )
+        except (OSError, BlogImportError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} posts ({result.skipped} skipped, {result.tags_created} new tags)'
+        ))
+        if result.imported:
+            self.stdout.write('Run rebuild_related_posts to include the imported posts in related post lists')
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.publishing import publish_due_posts
+
+
+class Command(BaseCommand):
+    help = 'Publish scheduled blog posts whose publish date has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and check once per interval')
+        parser.add_argument('--interval', type=int, help='Seconds between checks (defaults to BLOG_SCHEDULED_PUBLISH_INTERVAL)')
+        parser.add_argument('--batch-size', type=int, help='Posts published per transaction (defaults to BLOG_SCHEDULED_PUBLISH_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        interval = options.get('interval') or getattr(settings, 'BLOG_SCHEDULED_PUBLISH_INTERVAL', 60)
+
+        while True:
+            published = publish_due_posts(batch_size=options.get('batch_size'))
+            self.stdout.write(self.style.SUCCESS(f'Published {published} scheduled posts'))
+
+            if not options.get('loop'):
+                break
+            time.sleep(interval)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.archive import rebuild_archive
+
+
+class Command(BaseCommand):
+    help = 'Recount the monthly blog archive from the published posts'
+
+    def handle(self, *args, **options):
+        months = rebuild_archive()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {months} archive months'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import BlogPost, RelatedPost
+from blog.related import update_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related posts of every published post'
+
+    def handle(self, *args, **options):
+        RelatedPost.objects.exclude(post__status='published').delete()
+        RelatedPost.objects.exclude(related__status='published').delete()
+
+        count = 0
+        for post in BlogPost.objects.filter(status='published').iterator(chunk_size=200):
+            update_related_posts(post, update_neighbours=False)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed related posts for {count} posts'))
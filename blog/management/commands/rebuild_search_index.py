@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import BlogPost
+from blog.search import index_post
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the blog search index for every post'
+
+    def handle(self, *args, **options):
+        count = 0
+        for post in BlogPost.objects.only('pk', 'title', 'excerpt', 'content', 'content_text').iterator(chunk_size=200):
+            index_post(post)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} posts'))
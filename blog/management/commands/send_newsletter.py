@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import NewsletterCampaign
+from blog.newsletter import send_campaign, send_pending_campaigns
+
+
+class Command(BaseCommand):
+    help = 'Send queued newsletter campaigns, resuming interrupted ones from their checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaign', type=int, help='Send (or resume) only this campaign, whatever its status')
+        parser.add_argument('--batch-size', type=int, help='Messages per batch (defaults to NEWSLETTER_BATCH_SIZE)')
+        parser.add_argument('--rate', type=float, help='Maximum messages per second (defaults to NEWSLETTER_MAX_PER_SECOND)')
+
+    def handle(self, *args, **options):
+        kwargs = {'batch_size': options.get('batch_size'), 'max_per_second': options.get('rate')}
+
+        if options.get('campaign'):
+            try:
+                campaign = NewsletterCampaign.objects.get(pk=options['campaign'])
+            except NewsletterCampaign.DoesNotExist:
+                raise CommandError(f"Campaign {options['campaign']} does not exist")
+            sent = send_campaign(campaign, **kwargs)
+        else:
+            sent = send_pending_campaigns(**kwargs)
+
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} newsletter messages'))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.trending import get_update_interval, update_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed trending score of blog posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and recompute once per interval')
+        parser.add_argument('--interval', type=int, help='Seconds between updates (defaults to BLOG_TRENDING_UPDATE_INTERVAL)')
+
+    def handle(self, *args, **options):
+        interval = options.get('interval') or get_update_interval()
+
+        while True:
+            trending = update_trending_scores()
+            self.stdout.write(self.style.SUCCESS(f'Updated trending scores of {trending} posts'))
+
+            if not options.get('loop'):
+                break
+            time.sleep(interval)
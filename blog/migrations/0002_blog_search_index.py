@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='blog.blogpost')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BlogSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='blog.blogpost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'weight'], name='blog_blogse_term_cfe99d_idx')],
+                'unique_together': {('term', 'post')},
+            },
+        ),
+    ]
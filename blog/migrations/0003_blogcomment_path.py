@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# BlogComment.MAX_STORED_DEPTH when this migration was written
+MAX_STORED_DEPTH = 20
+
+
+def populate_comment_paths(apps, schema_editor):
+    """Compute path and depth for existing comments, parents before replies"""
+    BlogComment = apps.get_model('blog', 'BlogComment')
+    paths = {}
+    parents = {}
+    pending = list(BlogComment.objects.order_by('pk').values_list('pk', 'parent_id'))
+    
+    while pending:
+        remaining = []
+        for pk, parent_id in pending:
+            if parent_id is None:
+                paths[pk] = str(pk).zfill(10)
+            elif parent_id in paths:
+                # Like BlogComment.save, replies too deep for the path move up a level
+                while paths[parent_id].count('/') >= MAX_STORED_DEPTH:
+                    parent_id = parents[parent_id]
+                parents[pk] = parent_id
+                paths[pk] = f"{paths[parent_id]}/{str(pk).zfill(10)}"
+            else:
+                remaining.append((pk, parent_id))
+        if len(remaining) == len(pending):
+            break
+        pending = remaining
+    
+    comments = [
+        BlogComment(pk=pk, parent_id=parents.get(pk), path=path, depth=path.count('/'))
+        for pk, path in paths.items()
+    ]
+    BlogComment.objects.bulk_update(comments, ['parent', 'path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_blog_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogcomment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogcomment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_comment_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='blogcomment',
+            index=models.Index(fields=['post', 'path'], name='blog_blogco_post_id_bd72aa_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blogcomment_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogcomment',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='blog_blogco_post_id_49b0cf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', 'published_date', 'id'], name='blog_blogpo_status_93cc87_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='blog.blogpost')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.blogpost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['post', 'score'], name='blog_relate_post_id_ba211b_idx')],
+                'unique_together': {('post', 'related')},
+            },
+        ),
+    ]
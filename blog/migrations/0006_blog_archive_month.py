@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:25
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_archive_months(apps, schema_editor):
+    """Count the already published posts per month"""
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    BlogArchiveMonth = apps.get_model('blog', 'BlogArchiveMonth')
+    counts = {}
+    dates = BlogPost.objects.filter(
+        status='published', published_date__isnull=False
+    ).values_list('published_date', flat=True)
+    for published_date in dates.iterator():
+        local = timezone.localtime(published_date)
+        counts[(local.year, local.month)] = counts.get((local.year, local.month), 0) + 1
+    
+    BlogArchiveMonth.objects.bulk_create([
+        BlogArchiveMonth(year=year, month=month, post_count=count)
+        for (year, month), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_related_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('post_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'unique_together': {('year', 'month')},
+            },
+        ),
+        migrations.RunPython(populate_archive_months, migrations.RunPython.noop),
+    ]
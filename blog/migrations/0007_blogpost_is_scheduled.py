@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:26
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_scheduled_drafts(apps, schema_editor):
+    """Drafts saved with a future publish date were scheduled by the post form"""
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    BlogPost.objects.filter(
+        status='draft', published_date__gt=timezone.now()
+    ).update(is_scheduled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blog_archive_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='is_scheduled',
+            field=models.BooleanField(default=False, help_text='Draft to be published automatically at the published date'),
+        ),
+        migrations.RunPython(mark_scheduled_drafts, migrations.RunPython.noop),
+    ]
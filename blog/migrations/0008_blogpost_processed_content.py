@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+from core.content import process_html
+
+
+def process_existing_content(apps, schema_editor):
+    """Derive the new columns for posts saved before they existed; content is left as is"""
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    posts = []
+    for post in BlogPost.objects.only('pk', 'content').iterator(chunk_size=200):
+        processed = process_html(post.content)
+        post.content_text = processed.text
+        post.word_count = processed.word_count
+        post.reading_time = processed.reading_time
+        post.table_of_contents = processed.headings
+        posts.append(post)
+    
+    BlogPost.objects.bulk_update(
+        posts,
+        ['content_text', 'word_count', 'reading_time', 'table_of_contents'],
+        batch_size=200
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_blogpost_is_scheduled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_text',
+            field=models.TextField(blank=True, editable=False, help_text='Content without HTML'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='table_of_contents',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(process_existing_content, migrations.RunPython.noop),
+    ]
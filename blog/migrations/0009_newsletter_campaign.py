@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_blogpost_processed_content'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('content', models.TextField(help_text='HTML body; {{ subscriber.name }} and {{ subscriber.email }} are available')),
+                ('subscriber_categories', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('queued', 'Queued'), ('sending', 'Sending'), ('paused', 'Paused'), ('sent', 'Sent')], default='draft', max_length=20)),
+                ('last_subscriber_id', models.PositiveBigIntegerField(default=0, editable=False)),
+                ('sent_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('last_error', models.TextField(blank=True, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='newsletter_campaigns', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_newsletter_campaign'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogPostViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, help_text='Time-decayed recent views (see blog.trending)'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', 'trending_score', 'id'], name='blog_blogpo_status_8008b3_idx'),
+        ),
+        migrations.AddField(
+            model_name='blogpostviewbucket',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='blog.blogpost'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpostviewbucket',
+            index=models.Index(fields=['hour'], name='blog_blogpo_hour_8d770b_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='blogpostviewbucket',
+            unique_together={('post', 'hour')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_trending_posts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogcategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='blogtag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
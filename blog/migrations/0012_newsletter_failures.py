@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_category_tag_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettercampaign',
+            name='failed_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='newslettercampaign',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='NewsletterFailure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='failures', to='blog.newslettercampaign')),
+                ('subscriber', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='newsletter_failures', to='blog.newsletter')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
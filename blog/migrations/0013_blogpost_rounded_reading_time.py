@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:05
+
+from django.db import migrations
+
+
+def round_reading_times(apps, schema_editor):
+    """Reading times were briefly stored rounded down; round them to the nearest minute"""
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    posts = []
+    for post in BlogPost.objects.only('pk', 'word_count', 'reading_time').iterator(chunk_size=200):
+        reading_time = max(1, round(post.word_count / 200))
+        if post.reading_time != reading_time:
+            post.reading_time = reading_time
+            posts.append(post)
+    
+    BlogPost.objects.bulk_update(posts, ['reading_time'], batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_newsletter_failures'),
+    ]
+
+    operations = [
+        migrations.RunPython(round_reading_times, migrations.RunPython.noop),
+    ]
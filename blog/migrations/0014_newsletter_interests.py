@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_blogpost_rounded_reading_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterInterest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(choices=[('programming', 'Programming & Development'), ('design', 'Design & UX/UI'), ('cybersecurity', 'Cybersecurity'), ('ai_ml', 'AI & Machine Learning'), ('marketing', 'Digital Marketing'), ('business', 'Business & Entrepreneurship'), ('career', 'Career Development')], max_length=20)),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interests', to='blog.newsletter')),
+            ],
+            options={
+                'unique_together': {('subscriber', 'topic')},
+            },
+        ),
+    ]
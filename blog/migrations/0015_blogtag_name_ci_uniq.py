@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:04
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def merge_case_duplicates(apps, schema_editor):
+    """Fold tags whose names differ only in case into the oldest one"""
+    BlogTag = apps.get_model('blog', 'BlogTag')
+    Through = BlogTag.posts.through
+    kept = {}
+    duplicates = {}
+    for tag_id, name in BlogTag.objects.order_by('pk').values_list('pk', 'name'):
+        keeper = kept.setdefault(name.lower(), tag_id)
+        if keeper != tag_id:
+            duplicates[tag_id] = keeper
+    if not duplicates:
+        return
+    
+    links = Through.objects.filter(blogtag_id__in=duplicates).values_list('blogpost_id', 'blogtag_id')
+    Through.objects.bulk_create(
+        [Through(blogpost_id=post_id, blogtag_id=duplicates[tag_id]) for post_id, tag_id in links],
+        ignore_conflicts=True
+    )
+    BlogTag.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_newsletter_interests'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='blogtag',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='blog_blogtag_name_ci_uniq', violation_error_message='A tag with this name already exists.'),
+        ),
+    ]
@@ -1,9 +1,13 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
 from ckeditor_uploader.fields import RichTextUploadingField
 
+from core.content import build_toc, process_html
+from core.slugs import save_unique
+
 User = get_user_model()
 
 class BlogCategory(models.Model):
@@ -13,6 +17,7 @@ class BlogCategory(models.Model):
     color = models.CharField(max_length=7, default="#0066FF")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['name']
@@ -54,15 +59,28 @@ class BlogPost(models.Model):
     
     # Stats
     views_count = models.PositiveIntegerField(default=0)
+    trending_score = models.FloatField(default=0, editable=False, help_text="Time-decayed recent views (see blog.trending)")
     reading_time = models.PositiveIntegerField(default=5, help_text="Estimated reading time in minutes")
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Derived from content on save (see core.content)
+    content_text = models.TextField(blank=True, editable=False, help_text="Content without HTML")
+    table_of_contents = models.JSONField(default=list, blank=True, editable=False)
     
     # Dates
     published_date = models.DateTimeField(null=True, blank=True)
+    is_scheduled = models.BooleanField(default=False, help_text="Draft to be published automatically at the published date")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-published_date', '-created_at']
+        indexes = [
+            # Keyset pagination of published posts
+            models.Index(fields=['status', 'published_date', 'id']),
+            # Trending ranking
+            models.Index(fields=['status', 'trending_score', 'id']),
+        ]
     
     def __str__(self):
         return self.title
@@ -70,22 +88,45 @@ class BlogPost(models.Model):
     def get_absolute_url(self):
         return reverse('blog:post_detail', kwargs={'slug': self.slug})
     
+    # Derived from the content by process_content()
+    PROCESSED_FIELDS = ('content_text', 'word_count', 'reading_time', 'table_of_contents', 'excerpt')
+    
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
+        # Derive text, reading time, excerpt and TOC from the content in one pass,
+        # unless this save leaves the content alone
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.process_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.PROCESSED_FIELDS)
         
-        # Auto-calculate reading time based on content length
-        if self.content:
-            word_count = len(self.content.split())
-            self.reading_time = max(1, word_count // 200)  # 200 words per minute
-        
-        super().save(*args, **kwargs)
+        if not self.slug:
+            save_unique(self, 'slug', slugify(self.title) or 'post',
+                        lambda: super(BlogPost, self).save(*args, **kwargs))
+        else:
+            super().save(*args, **kwargs)
+    
+    def process_content(self):
+        processed = process_html(self.content)
+        self.content_text = processed.text
+        self.word_count = processed.word_count
+        self.reading_time = processed.reading_time
+        self.table_of_contents = processed.headings
+        if not self.excerpt:
+            self.excerpt = processed.excerpt(300)
+    
+    @property
+    def toc_html(self):
+        return build_toc(self.table_of_contents)
     
     @property
     def is_published(self):
         return self.status == 'published' and self.published_date
 
 class BlogComment(models.Model):
+    PATH_STEP = 10  # digits per path segment
+    MAX_STORED_DEPTH = 20  # deepest level that fits in `path`
+    
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_comments')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, 
@@ -95,12 +136,57 @@ class BlogComment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Materialized path ("0000000001/0000000007") so a whole thread sorts in tree order
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'path']),
+            models.Index(fields=['post', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.get_full_name()} on {self.post.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets comment_approved tell an approval from a re-save
+        instance._was_approved = dict(zip(field_names, values)).get('is_approved') is True
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # Replies nested deeper than the path can hold are attached one level up
+        while self.parent and self.parent.depth >= self.MAX_STORED_DEPTH:
+            self.parent = self.parent.parent
+        self.depth = self.parent.depth + 1 if self.parent else 0
+        
+        super().save(*args, **kwargs)
+        
+        path = self.build_path()
+        if path != self.path:
+            old_path = self.path
+            self.path = path
+            BlogComment.objects.filter(pk=self.pk).update(path=path, depth=self.depth)
+            if old_path:
+                self._move_descendants(old_path)
+    
+    def build_path(self):
+        segment = str(self.pk).zfill(self.PATH_STEP)
+        return f"{self.parent.path}/{segment}" if self.parent else segment
+    
+    def _move_descendants(self, old_path):
+        """Rewrite the paths below this comment after it changed parent"""
+        descendants = list(BlogComment.objects.filter(
+            post_id=self.post_id, path__startswith=f"{old_path}/"
+        ))
+        for descendant in descendants:
+            descendant.path = self.path + descendant.path[len(old_path):]
+            descendant.depth = descendant.path.count('/')
+        BlogComment.objects.bulk_update(descendants, ['path', 'depth'])
+    
     @property
     def is_reply(self):
         return self.parent is not None
@@ -110,9 +196,17 @@ class BlogTag(models.Model):
     slug = models.SlugField(unique=True, blank=True)
     posts = models.ManyToManyField(BlogPost, related_name='tags', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['name']
+        constraints = [
+            # Serves the lower-cased name lookups of blog.tagging and keeps "Python" and "python" one tag
+            models.UniqueConstraint(
+                Lower('name'), name='blog_blogtag_name_ci_uniq',
+                violation_error_message='A tag with this name already exists.'
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -131,6 +225,27 @@ class Newsletter(models.Model):
     def __str__(self):
         return self.email
 
+class NewsletterInterest(models.Model):
+    """A topic a subscriber asked for; campaigns can be limited to topics"""
+    TOPIC_CHOICES = (
+        ('programming', 'Programming & Development'),
+        ('design', 'Design & UX/UI'),
+        ('cybersecurity', 'Cybersecurity'),
+        ('ai_ml', 'AI & Machine Learning'),
+        ('marketing', 'Digital Marketing'),
+        ('business', 'Business & Entrepreneurship'),
+        ('career', 'Career Development'),
+    )
+    
+    subscriber = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='interests')
+    topic = models.CharField(max_length=20, choices=TOPIC_CHOICES)
+    
+    class Meta:
+        unique_together = ['subscriber', 'topic']
+    
+    def __str__(self):
+        return f"{self.subscriber.email}: {self.get_topic_display()}"
+
 class ContactMessage(models.Model):
     SUBJECT_CHOICES = (
         ('general', 'General Inquiry'),
@@ -219,4 +334,122 @@ class Testimonial(models.Model):
         ordering = ['-is_featured', '-created_at']
     
     def __str__(self):
-        return f"{self.name} - {self.title}"
\ No newline at end of file
+        return f"{self.name} - {self.title}"
+
+class BlogSearchDocument(models.Model):
+    """HTML-stripped text of a post, used to build search snippets"""
+    post = models.OneToOneField(BlogPost, on_delete=models.CASCADE, related_name='search_document')
+    text = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Search document for {self.post.title}"
+
+class BlogSearchTerm(models.Model):
+    """Inverted index entry: one row per (term, post) with a relevance weight"""
+    term = models.CharField(max_length=50)
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        unique_together = ['term', 'post']
+        indexes = [
+            models.Index(fields=['term', 'weight']),
+        ]
+    
+    def __str__(self):
+        return f"{self.term} -> {self.post_id} ({self.weight})"
+
+class RelatedPost(models.Model):
+    """Precomputed neighbour of a published post, maintained by blog.related"""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    
+    class Meta:
+        unique_together = ['post', 'related']
+        indexes = [
+            models.Index(fields=['post', 'score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id} ({self.score:.2f})"
+
+class BlogPostViewBucket(models.Model):
+    """Views of a post during one hour, feeding the trending score"""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='view_buckets')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['post', 'hour']
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+    
+    def __str__(self):
+        return f"{self.post_id} @ {self.hour:%Y-%m-%d %H:00} ({self.views})"
+
+class BlogArchiveMonth(models.Model):
+    """Number of published posts per month, maintained by blog.archive"""
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    post_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['year', 'month']
+        ordering = ['-year', '-month']
+    
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} ({self.post_count})"
+
+class NewsletterCampaign(models.Model):
+    """A newsletter sent to the active subscribers by blog.newsletter"""
+    STATUS_CHOICES = (
+        ('draft', 'Draft'),
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('paused', 'Paused'),
+        ('sent', 'Sent'),
+    )
+    
+    subject = models.CharField(max_length=200)
+    content = models.TextField(help_text="HTML body; {{ subscriber.name }} and {{ subscriber.email }} are available")
+    # NewsletterInterest topics; empty sends to every active subscriber
+    subscriber_categories = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='newsletter_campaigns')
+    
+    # Progress; subscribers are sent in primary key order
+    last_subscriber_id = models.PositiveBigIntegerField(default=0, editable=False)
+    sent_count = models.PositiveIntegerField(default=0, editable=False)
+    failed_count = models.PositiveIntegerField(default=0, editable=False)
+    last_error = models.TextField(blank=True, editable=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Refreshed by the sending worker after every batch
+    heartbeat_at = models.DateTimeField(null=True, blank=True, editable=False)
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.subject} ({self.get_status_display()})"
+
+class NewsletterFailure(models.Model):
+    """A subscriber the mail server refused while a campaign was sent"""
+    campaign = models.ForeignKey(NewsletterCampaign, on_delete=models.CASCADE, related_name='failures')
+    subscriber = models.ForeignKey(Newsletter, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='newsletter_failures')
+    email = models.EmailField()
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"{self.email} ({self.campaign_id})"
@@ -0,0 +1,60 @@
+"""
+Comment moderation in bulk.
+
+``moderate_comments()`` approves or rejects a list of comments with one
+UPDATE instead of saving them one by one (which runs every ``post_save``
+receiver per comment), and notifies the authors of newly approved
+comments with a single ``bulk_create``. Comments already in the requested
+state are left alone, so nobody is notified twice. Only the comment rows
+are locked; post titles for the notifications are read afterwards, so
+moderation never blocks writes to the posts.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import UserNotification
+from .models import BlogComment, BlogPost
+
+MODERATION_BATCH_SIZE = 1000
+
+
+def approval_notification(author_id, post_title):
+    # Same notification as the comment_approved receiver
+    return UserNotification(
+        user_id=author_id,
+        title='Comment Approved',
+        message=f'Your comment on "{post_title}" has been approved and is now visible.',
+        notification_type='comment'
+    )
+
+
+def moderate_comments(comment_ids, approve=True):
+    """Approve (or reject) the given comments; returns how many changed"""
+    comment_ids = list(comment_ids)
+    changed = 0
+    for start in range(0, len(comment_ids), MODERATION_BATCH_SIZE):
+        with transaction.atomic():
+            # No join here: it would lock the post rows as well
+            comments = list(
+                BlogComment.objects.select_for_update()
+                .filter(pk__in=comment_ids[start:start + MODERATION_BATCH_SIZE])
+                .exclude(is_approved=approve)
+                .values_list('pk', 'author_id', 'post_id')
+            )
+            if not comments:
+                continue
+
+            # updated_at moves too, as the post validators depend on it
+            BlogComment.objects.filter(pk__in=[pk for pk, _, _ in comments]).update(
+                is_approved=approve, updated_at=timezone.now()
+            )
+            if approve:
+                titles = dict(BlogPost.objects.filter(
+                    pk__in={post_id for _, _, post_id in comments}
+                ).values_list('pk', 'title'))
+                UserNotification.objects.bulk_create([
+                    approval_notification(author_id, titles[post_id])
+                    for _, author_id, post_id in comments
+                ])
+            changed += len(comments)
+    return changed
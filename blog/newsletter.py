@@ -0,0 +1,235 @@
+"""
+Bulk newsletter delivery.
+
+A ``NewsletterCampaign`` is sent to the active ``Newsletter`` subscribers in
+primary key order, limited to those interested in one of its
+``subscriber_categories`` when it has any. Each batch of personalised messages goes out over one
+SMTP connection, the send rate is capped at ``NEWSLETTER_MAX_PER_SECOND``
+and the campaign records the last subscriber sent after every batch, so an
+interrupted campaign resumes where it stopped instead of mailing everyone
+again.
+
+A worker claims a campaign with a conditional UPDATE before sending it and
+refreshes ``heartbeat_at`` at every checkpoint; a campaign left 'sending'
+without a heartbeat for ``NEWSLETTER_CLAIM_TIMEOUT`` seconds is taken over
+by the next run. Recipients the server refuses are recorded as
+``NewsletterFailure`` rows and skipped, so one bad address cannot stall a
+campaign.
+"""
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Coalesce
+from django.template import Context, Template
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import Newsletter, NewsletterCampaign, NewsletterFailure, NewsletterInterest
+
+# Errors that concern one recipient only; anything else pauses the campaign
+RECIPIENT_ERRORS = (smtplib.SMTPRecipientsRefused, ValueError)
+
+
+def get_batch_size():
+    return getattr(settings, 'NEWSLETTER_BATCH_SIZE', 100)
+
+
+def get_max_per_second():
+    return getattr(settings, 'NEWSLETTER_MAX_PER_SECOND', 10)
+
+
+def get_claim_timeout():
+    return getattr(settings, 'NEWSLETTER_CLAIM_TIMEOUT', 10 * 60)
+
+
+def get_newsletter_connection(**kwargs):
+    """Mail connection for newsletters; NEWSLETTER_EMAIL_BACKEND may differ from transactional mail"""
+    backend = getattr(settings, 'NEWSLETTER_EMAIL_BACKEND', None)
+    return get_connection(backend=backend, **kwargs)
+
+
+def set_interests(subscriber, topics):
+    """Replace a subscriber's interests with ``topics``, ignoring unknown ones"""
+    known = dict(NewsletterInterest.TOPIC_CHOICES)
+    topics = {topic for topic in topics or () if topic in known}
+    subscriber.interests.exclude(topic__in=topics).delete()
+    NewsletterInterest.objects.bulk_create(
+        [NewsletterInterest(subscriber=subscriber, topic=topic) for topic in topics],
+        ignore_conflicts=True
+    )
+
+
+def campaign_subscribers(topics=None):
+    """Active subscribers, or those interested in any of ``topics``"""
+    subscribers = Newsletter.objects.filter(is_active=True)
+    if topics:
+        subscribers = subscribers.filter(Exists(
+            NewsletterInterest.objects.filter(subscriber=OuterRef('pk'), topic__in=topics)
+        ))
+    return subscribers
+
+
+def iter_subscriber_batches(after_id=0, batch_size=None, topics=None):
+    """Yield lists of a campaign's subscribers, keyset paginated on the primary key"""
+    batch_size = batch_size or get_batch_size()
+    subscribers = campaign_subscribers(topics)
+    while True:
+        batch = list(subscribers.filter(pk__gt=after_id).order_by('pk')[:batch_size])
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1].pk
+
+
+class CampaignRenderer:
+    """Renders the per-subscriber message of a campaign; the template is compiled once"""
+
+    def __init__(self, campaign):
+        self.campaign = campaign
+        self.subject = campaign.subject
+        self.template = Template(campaign.content)
+
+    def render(self, subscriber, connection=None):
+        html_message = self.template.render(Context({
+            'subscriber': subscriber,
+            'site_name': 'Debsploit Solutions',
+            'site_url': settings.SITE_URL,
+        }))
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=strip_tags(html_message),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[subscriber.email],
+            connection=connection,
+        )
+        message.attach_alternative(html_message, 'text/html')
+        return message
+
+
+class RateLimiter:
+    """Sleeps as needed to stay under ``per_second`` messages per second"""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0
+        self.next_allowed = time.monotonic()
+
+    def wait(self, count):
+        now = time.monotonic()
+        if self.next_allowed > now:
+            time.sleep(self.next_allowed - now)
+            now = self.next_allowed
+        self.next_allowed = now + count * self.interval
+
+
+def send_test_message(campaign, email):
+    """Send the campaign to a single address, e.g. the form's test_email"""
+    subscriber = Newsletter(email=email, name='')
+    return CampaignRenderer(campaign).render(subscriber, get_newsletter_connection()).send()
+
+
+def claim_campaign(campaign):
+    """
+    Mark a campaign as being sent by this worker; returns False while
+    another worker is sending it.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=get_claim_timeout())
+    claimed = NewsletterCampaign.objects.filter(pk=campaign.pk).exclude(
+        status='sending', heartbeat_at__gte=stale
+    ).update(
+        status='sending',
+        heartbeat_at=now,
+        started_at=Coalesce('started_at', Value(now)),
+        last_error=''
+    )
+    if claimed:
+        campaign.refresh_from_db()
+    return bool(claimed)
+
+
+def send_batch(connection, messages):
+    """Send messages one by one; returns (sent, [(message, error), ...] refused)"""
+    sent = 0
+    refused = []
+    for message in messages:
+        try:
+            sent += connection.send_messages([message]) or 0
+        except RECIPIENT_ERRORS as e:
+            refused.append((message, e))
+    return sent, refused
+
+
+def send_campaign(campaign, batch_size=None, max_per_second=None, connection=None):
+    """
+    Send (or resume) a campaign; returns the number of messages sent now.
+
+    Progress is saved after every batch. If sending fails the campaign is
+    paused with the error and the failing batch is retried on the next run,
+    so at most one batch can be delivered twice.
+    """
+    if not claim_campaign(campaign):
+        print(f"Newsletter campaign {campaign.pk} is being sent by another worker, skipped")
+        return 0
+
+    max_per_second = get_max_per_second() if max_per_second is None else max_per_second
+    limiter = RateLimiter(max_per_second)
+    connection = connection or get_newsletter_connection()
+
+    sent = 0
+    try:
+        renderer = CampaignRenderer(campaign)
+        connection.open()
+        batches = iter_subscriber_batches(campaign.last_subscriber_id, batch_size, campaign.subscriber_categories)
+        for batch in batches:
+            messages = [renderer.render(subscriber, connection) for subscriber in batch]
+            limiter.wait(len(messages))
+            count, refused = send_batch(connection, messages)
+            sent += count
+
+            # Checkpoint so a restart continues after this batch
+            subscribers = {subscriber.email: subscriber for subscriber in batch}
+            campaign.last_subscriber_id = batch[-1].pk
+            campaign.sent_count += count
+            campaign.failed_count += len(refused)
+            with transaction.atomic():
+                NewsletterFailure.objects.bulk_create([
+                    NewsletterFailure(
+                        campaign=campaign, subscriber=subscribers[message.to[0]],
+                        email=message.to[0], error=str(error)
+                    )
+                    for message, error in refused
+                ])
+                NewsletterCampaign.objects.filter(pk=campaign.pk).update(
+                    last_subscriber_id=campaign.last_subscriber_id,
+                    sent_count=campaign.sent_count,
+                    failed_count=campaign.failed_count,
+                    heartbeat_at=timezone.now()
+                )
+    except Exception as e:
+        # Includes template syntax errors, which only concern this campaign
+        print(f"Failed to send newsletter campaign {campaign.pk}: {e}")
+        NewsletterCampaign.objects.filter(pk=campaign.pk).update(status='paused', last_error=str(e))
+        campaign.status = 'paused'
+        return sent
+    finally:
+        connection.close()
+
+    campaign.status = 'sent'
+    campaign.completed_at = timezone.now()
+    NewsletterCampaign.objects.filter(pk=campaign.pk).update(
+        status='sent', completed_at=campaign.completed_at
+    )
+    return sent
+
+
+def send_pending_campaigns(**kwargs):
+    """Send queued campaigns and resume abandoned ones; returns messages sent"""
+    sent = 0
+    for campaign in NewsletterCampaign.objects.filter(status__in=['queued', 'sending']).order_by('created_at'):
+        sent += send_campaign(campaign, **kwargs)
+    return sent
@@ -0,0 +1,165 @@
+"""
+Scheduled publishing of blog posts.
+
+``BlogPostForm`` saves a scheduled post as a draft with ``is_scheduled`` and
+a future ``published_date``. ``publish_due_posts()`` (run by the
+``publish_scheduled_posts`` command) finds the due drafts through the
+(status, published_date) index and publishes them a batch at a time, with
+the publication rewards written in bulk instead of one ``save()`` per post.
+"""
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from accounts.models import User, UserAchievement, UserNotification
+from accounts.signals import check_points_milestones
+from dashboard.models import UserActivity
+from .models import BlogPost
+from .archive import post_month, refresh_archive_months
+from .related import update_related_posts_many
+from .sidebar import invalidate_sidebar
+
+PUBLISH_POINTS = 25
+FIRST_POST_ACHIEVEMENT = ('First Blog Post', 'Published your first blog post', 50)
+
+# (published posts, title, description); awards threshold * 10 points
+PUBLISHED_POST_ACHIEVEMENTS = [
+    (5, 'Prolific Writer', 'Published 5 blog posts'),
+    (10, 'Content Creator', 'Published 10 blog posts'),
+    (25, 'Blog Master', 'Published 25 blog posts'),
+    (50, 'Content Guru', 'Published 50 blog posts'),
+]
+
+
+def get_publish_batch_size():
+    return getattr(settings, 'BLOG_SCHEDULED_PUBLISH_BATCH_SIZE', 100)
+
+
+def get_due_posts(now=None):
+    """Scheduled drafts whose publish date has passed"""
+    return BlogPost.objects.filter(
+        status='draft',
+        published_date__lte=now or timezone.now(),
+        is_scheduled=True
+    )
+
+
+def award_publication_rewards(posts):
+    """
+    Bulk version of the ``blog_post_published`` side effects for posts that
+    were just published: activity entries, writer achievements (with their
+    notifications) and points, using a fixed number of queries per batch.
+    """
+    posts_by_author = defaultdict(list)
+    for post in posts:
+        posts_by_author[post.author_id].append(post)
+    if not posts_by_author:
+        return
+
+    published_counts = dict(
+        BlogPost.objects.filter(
+            author_id__in=list(posts_by_author),
+            status='published'
+        ).values_list('author_id').annotate(count=Count('id')).order_by()
+    )
+
+    activities, achievements = [], []
+    points = Counter()
+    for author_id, author_posts in posts_by_author.items():
+        after = published_counts.get(author_id, len(author_posts))
+        before = after - len(author_posts)
+        points[author_id] += PUBLISH_POINTS * len(author_posts)
+
+        activities.extend(
+            UserActivity(
+                user_id=author_id,
+                activity_type='blog_post',
+                description=f'Published blog post: {post.title}'
+            )
+            for post in author_posts
+        )
+
+        if before == 0:
+            title, description, awarded = FIRST_POST_ACHIEVEMENT
+            achievements.append(UserAchievement(
+                user_id=author_id, title=title, description=description,
+                achievement_type='special_recognition', points_awarded=awarded,
+                badge_icon='fas fa-pen'
+            ))
+        for threshold, title, description in PUBLISHED_POST_ACHIEVEMENTS:
+            if before < threshold <= after:
+                achievements.append(UserAchievement(
+                    user_id=author_id, title=title, description=description,
+                    achievement_type='points_milestone', points_awarded=threshold * 10,
+                    badge_icon='fas fa-trophy'
+                ))
+
+    UserActivity.objects.bulk_create(activities)
+    UserAchievement.objects.bulk_create(achievements)
+    UserNotification.objects.bulk_create([
+        UserNotification(
+            user_id=achievement.user_id,
+            title='Achievement Unlocked!',
+            message=f'You earned the "{achievement.title}" achievement!',
+            notification_type='achievement_unlocked'
+        )
+        for achievement in achievements
+    ])
+    for achievement in achievements:
+        points[achievement.user_id] += achievement.points_awarded
+
+    for author_id, total in points.items():
+        User.objects.filter(pk=author_id).update(points=F('points') + total)
+
+    # Points milestones are normally checked when the user is saved
+    for author in User.objects.filter(pk__in=list(points)):
+        check_points_milestones(author)
+
+
+def publish_posts(post_ids):
+    """Publish the given scheduled drafts; returns the published posts"""
+    with transaction.atomic():
+        posts = list(
+            BlogPost.objects.select_for_update(skip_locked=True)
+            .filter(pk__in=post_ids, status='draft', is_scheduled=True)
+        )
+        if not posts:
+            return []
+
+        BlogPost.objects.filter(pk__in=[post.pk for post in posts]).update(
+            status='published',
+            is_scheduled=False,
+            updated_at=timezone.now()
+        )
+        for post in posts:
+            post.status = 'published'
+            post.is_scheduled = False
+
+        award_publication_rewards(posts)
+        refresh_archive_months(post_month(post.published_date) for post in posts)
+        update_related_posts_many(posts)
+        invalidate_sidebar()
+
+    return posts
+
+
+def publish_due_posts(batch_size=None, now=None):
+    """Publish every due scheduled draft, a batch at a time; returns the count"""
+    batch_size = batch_size or get_publish_batch_size()
+    now = now or timezone.now()
+    published = 0
+    while True:
+        post_ids = list(
+            get_due_posts(now).order_by('published_date', 'id')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not post_ids:
+            return published
+        posts = publish_posts(post_ids)
+        if not posts:
+            # The rest is locked by another worker
+            return published
+        published += len(posts)
@@ -0,0 +1,189 @@
+"""
+Precomputed related posts for blog detail pages.
+
+Similarity combines shared tags, the same category and overlapping search
+terms (from the ``BlogSearchTerm`` index). The top neighbours of every
+published post are stored as ``RelatedPost`` rows, so a detail page reads
+them with one indexed lookup. Publishing, editing or retagging a post
+recomputes its own list and merges it into the lists of its neighbours,
+once per transaction however many of those changes it made. Candidate
+queries are aggregated and limited in the database, so the cost does not
+grow with the number of posts sharing a tag or a term.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Least
+
+from .models import BlogPost, BlogSearchTerm, RelatedPost
+
+TAG_WEIGHT = 3.0
+CATEGORY_WEIGHT = 1.0
+TERM_WEIGHT = 2.0
+
+# Highest weighted terms of a post compared against other posts
+TOP_TERMS = 20
+# Newest posts of the same category always considered as candidates
+CATEGORY_CANDIDATES = 50
+# Best posts by shared tags and by term overlap considered as candidates
+TAG_CANDIDATES = 100
+TERM_CANDIDATES = 100
+
+
+def get_related_count():
+    """Number of neighbours stored per post"""
+    return getattr(settings, 'BLOG_RELATED_POSTS_COUNT', 6)
+
+
+def score_candidates(post):
+    """Return {post_id: similarity} for published posts similar to ``post``"""
+    published = BlogPost.objects.filter(status='published').exclude(pk=post.pk)
+    scores = defaultdict(float)
+
+    # Shared tags, as a fraction of the post's tags
+    tag_ids = list(post.tags.values_list('pk', flat=True))
+    if tag_ids:
+        shared_tags = BlogPost.tags.through.objects.filter(
+            blogtag_id__in=tag_ids,
+            blogpost__in=published
+        ).values('blogpost_id').annotate(shared=Count('blogtag_id')).order_by('-shared', '-blogpost_id')
+        for row in shared_tags[:TAG_CANDIDATES]:
+            scores[row['blogpost_id']] += TAG_WEIGHT * row['shared'] / len(tag_ids)
+
+    # Overlap of the weighted term vectors
+    top_terms = dict(
+        BlogSearchTerm.objects.filter(post=post).order_by('-weight')
+        .values_list('term', 'weight')[:TOP_TERMS]
+    )
+    if top_terms:
+        total = sum(top_terms.values())
+        overlap = Sum(Case(
+            *[When(term=term, then=Least('weight', Value(weight))) for term, weight in top_terms.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        matches = BlogSearchTerm.objects.filter(
+            term__in=list(top_terms),
+            post__in=published
+        ).values('post_id').annotate(overlap=overlap).order_by('-overlap', '-post_id')
+        for row in matches[:TERM_CANDIDATES]:
+            scores[row['post_id']] += TERM_WEIGHT * row['overlap'] / total
+
+    # Same category
+    same_category = published.filter(category_id=post.category_id)
+    category_ids = set(
+        same_category.order_by('-published_date').values_list('pk', flat=True)[:CATEGORY_CANDIDATES]
+    )
+    if scores:
+        category_ids.update(same_category.filter(pk__in=list(scores)).values_list('pk', flat=True))
+    for post_id in category_ids:
+        scores[post_id] += CATEGORY_WEIGHT
+
+    return dict(scores)
+
+
+def _top(scores, count):
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return ranked[:count]
+
+
+def refresh_related_posts_on_commit(post):
+    """
+    Recompute the related posts of ``post`` when the transaction commits.
+    Saving a post and setting its tags in one transaction recomputes once.
+    """
+    if getattr(post, '_related_posts_pending', False):
+        return
+    post._related_posts_pending = True
+
+    def refresh():
+        post._related_posts_pending = False
+        update_related_posts(post)
+
+    transaction.on_commit(refresh)
+
+
+@transaction.atomic
+def update_related_posts(post, update_neighbours=True):
+    """
+    Recompute the stored neighbours of ``post``.
+
+    With ``update_neighbours`` the post is also inserted into (or removed
+    from) the lists of the posts it is similar to, evicting their weakest
+    entry when a list is full. Similarity is taken as symmetric there; the
+    ``rebuild_related_posts`` command recomputes every list exactly.
+    """
+    update_related_posts_many([post], update_neighbours)
+
+
+@transaction.atomic
+def update_related_posts_many(posts, update_neighbours=True):
+    """
+    ``update_related_posts()`` for several posts, e.g. a batch published
+    together: candidates are still scored per post, but the lists are read
+    and written with a fixed number of queries for the whole batch.
+    """
+    unpublished = [post.pk for post in posts if post.status != 'published']
+    if unpublished:
+        RelatedPost.objects.filter(Q(post_id__in=unpublished) | Q(related_id__in=unpublished)).delete()
+
+    count = get_related_count()
+    scores = {post.pk: score_candidates(post) for post in posts if post.status == 'published'}
+    if not scores:
+        return
+
+    RelatedPost.objects.filter(post_id__in=list(scores)).delete()
+    links = [
+        RelatedPost(post_id=post_id, related_id=related_id, score=score)
+        for post_id, post_scores in scores.items()
+        for related_id, score in _top(post_scores, count)
+    ]
+    if update_neighbours:
+        links.extend(_merge_into_neighbours(scores, count))
+    RelatedPost.objects.bulk_create(links)
+
+
+def _merge_into_neighbours(scores, count):
+    """
+    Drop the old links to the scored posts from their neighbours' lists and
+    return the new ones that make a neighbour's top ``count``. Stored links
+    pushed out are deleted; on equal scores the stored link stays.
+    """
+    candidates = defaultdict(list)
+    for post_id, post_scores in scores.items():
+        for neighbour_id, score in post_scores.items():
+            # Posts of the batch got their own full list above
+            if neighbour_id not in scores:
+                candidates[neighbour_id].append((score, False, post_id))
+
+    RelatedPost.objects.filter(related_id__in=list(scores)).exclude(post_id__in=list(scores)).delete()
+    stored = defaultdict(list)
+    neighbour_rows = RelatedPost.objects.filter(
+        post_id__in=list(candidates)
+    ).values_list('pk', 'post_id', 'score')
+    for pk, post_id, score in neighbour_rows:
+        stored[post_id].append((score, True, pk))
+
+    new_links, evicted = [], []
+    for neighbour_id, entries in candidates.items():
+        ranked = sorted(stored[neighbour_id] + entries, key=lambda entry: entry[:2], reverse=True)
+        evicted.extend(pk for _, is_stored, pk in ranked[count:] if is_stored)
+        new_links.extend(
+            RelatedPost(post_id=neighbour_id, related_id=post_id, score=score)
+            for score, is_stored, post_id in ranked[:count] if not is_stored
+        )
+
+    if evicted:
+        RelatedPost.objects.filter(pk__in=evicted).delete()
+    return new_links
+
+
+def get_related_posts(post, limit=4):
+    """Published neighbours of ``post``, most similar first"""
+    links = RelatedPost.objects.filter(
+        post=post,
+        related__status='published'
+    ).select_related('related__author', 'related__category').order_by('-score')[:limit]
+    return [link.related for link in links]
@@ -0,0 +1,222 @@
+"""
+Full-text search for blog posts backed by a maintained inverted index.
+
+Every saved post is stripped of its HTML, tokenized and stored as weighted
+``BlogSearchTerm`` rows. Queries look terms up through the (term, weight)
+index instead of scanning the ``content`` column, so latency does not grow
+with the number of posts.
+"""
+import html
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, Q, Sum, Value, When
+from django.utils import timezone
+from django.utils.html import escape, strip_tags
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .models import BlogPost, BlogSearchDocument, BlogSearchTerm
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERM_LENGTH = 50
+MIN_TERM_LENGTH = 2
+MAX_QUERY_TERMS = 8
+
+# Relevance weight per occurrence, by field
+TITLE_WEIGHT = 10
+EXCERPT_WEIGHT = 3
+CONTENT_WEIGHT = 1
+MAX_CONTENT_OCCURRENCES = 10
+
+STOP_WORDS = frozenset("""
+    a an and are as at be but by for from has have he her his i in is it its
+    of on or our she that the their them they this to was we were will with
+    you your
+""".split())
+
+
+def get_max_results():
+    """Upper bound on the posts a search ranks, so the rank CASE stays small"""
+    return getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 200)
+
+
+def html_to_text(value):
+    """Strip tags and entities from rich-text HTML"""
+    text = html.unescape(strip_tags(value or ''))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def tokenize(text):
+    """Split text into normalized index terms"""
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if len(token) < MIN_TERM_LENGTH or token in STOP_WORDS:
+            continue
+        terms.append(token[:MAX_TERM_LENGTH])
+    return terms
+
+
+def build_index(post):
+    """(document text, {term: weight}) for a post"""
+    # Stored by BlogPost.save; strip the HTML for rows saved before that
+    content_text = post.content_text or html_to_text(post.content)
+    weights = Counter()
+
+    for term in tokenize(post.title):
+        weights[term] += TITLE_WEIGHT
+    for term in tokenize(post.excerpt):
+        weights[term] += EXCERPT_WEIGHT
+    content_counts = Counter(tokenize(content_text))
+    for term, count in content_counts.items():
+        weights[term] += CONTENT_WEIGHT * min(count, MAX_CONTENT_OCCURRENCES)
+
+    return f"{post.title}. {post.excerpt} {content_text}", weights
+
+
+def index_post(post):
+    """(Re)build the index rows for a single post"""
+    text, weights = build_index(post)
+
+    with transaction.atomic():
+        BlogSearchDocument.objects.update_or_create(
+            post=post,
+            defaults={'text': text}
+        )
+        BlogSearchTerm.objects.filter(post=post).delete()
+        BlogSearchTerm.objects.bulk_create([
+            BlogSearchTerm(term=term, post=post, weight=weight)
+            for term, weight in weights.items()
+        ])
+
+
+def index_new_posts(posts):
+    """Index posts that have no index rows yet (e.g. bulk imported) with two inserts"""
+    documents, terms = [], []
+    for post in posts:
+        text, weights = build_index(post)
+        documents.append(BlogSearchDocument(post_id=post.pk, text=text))
+        terms.extend(
+            BlogSearchTerm(term=term, post_id=post.pk, weight=weight)
+            for term, weight in weights.items()
+        )
+    BlogSearchDocument.objects.bulk_create(documents)
+    BlogSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+def rank_posts(query, queryset=None, limit=None):
+    """
+    Return ``[(post_id, score), ...]`` best match first, at most ``limit``
+    (capped by ``BLOG_SEARCH_MAX_RESULTS``) posts.
+
+    Posts matching more query terms rank first, then by summed weight. The
+    last term is matched as a prefix so results update while typing; the
+    variants it matches count as one matched term.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    *exact_terms, prefix = terms
+    matches = BlogSearchTerm.objects.filter(Q(term__in=exact_terms) | Q(term__startswith=prefix))
+    if queryset is not None:
+        matches = matches.filter(post__in=queryset.values('pk'))
+
+    prefix_matched = Max(Case(
+        When(term__startswith=prefix, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    exact_matched = Count('term', filter=Q(term__in=exact_terms), distinct=True)
+    ranked = matches.values('post').annotate(
+        matched=exact_matched + prefix_matched,
+        score=Sum('weight'),
+    ).order_by('-matched', '-score', '-post')
+    limit = min(limit or get_max_results(), get_max_results())
+    return [(row['post'], row['score']) for row in ranked[:limit]]
+
+
+def order_by_rank(queryset, ranked):
+    """Restrict a queryset to ranked post ids, keeping the rank order"""
+    post_ids = [post_id for post_id, _ in ranked]
+    if not post_ids:
+        return queryset.none()
+    position = Case(
+        *[When(pk=post_id, then=index) for index, post_id in enumerate(post_ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=post_ids).order_by(position)
+
+
+def search_posts(query, queryset=None, limit=None):
+    """Published posts matching ``query``, most relevant first"""
+    if queryset is None:
+        queryset = BlogPost.objects.filter(
+            status='published',
+            published_date__lte=timezone.now()
+        )
+    return order_by_rank(queryset, rank_posts(query, queryset, limit))
+
+
+def build_snippet(text, query, length=200):
+    """Return an HTML-safe excerpt of ``text`` around the first match, with <mark> highlights"""
+    terms = tokenize(query)
+    if not text:
+        return ''
+
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in terms]
+    positions = [position for position in positions if position >= 0]
+    start = max(0, min(positions) - length // 4) if positions else 0
+    snippet = text[start:start + length]
+
+    # Highlight whole words starting with a query term, escaping around the marks
+    highlighted = escape(snippet)
+    if terms:
+        pattern = re.compile(
+            r'\b(' + '|'.join(re.escape(term) for term in terms) + r')\w*',
+            re.IGNORECASE
+        )
+        pieces = []
+        end = 0
+        for match in pattern.finditer(snippet):
+            pieces.append(escape(snippet[end:match.start()]))
+            pieces.append(f'<mark>{escape(match.group(0))}</mark>')
+            end = match.end()
+        pieces.append(escape(snippet[end:]))
+        highlighted = ''.join(pieces)
+
+    prefix = '...' if start > 0 else ''
+    suffix = '...' if start + length < len(text) else ''
+    return f"{prefix}{highlighted}{suffix}"
+
+
+def get_snippets(posts, query, length=200):
+    """Return {post_id: snippet} using the stored search documents"""
+    documents = BlogSearchDocument.objects.filter(
+        post__in=[post.pk for post in posts]
+    ).values_list('post_id', 'text')
+    return {post_id: build_snippet(text, query, length) for post_id, text in documents}
+
+
+class BlogPostSearchFilter(BaseFilterBackend):
+    """
+    DRF filter backend that answers ``?search=`` from the search index.
+
+    Place it after ``OrderingFilter``: relevance order wins unless the
+    client asked for an explicit ``ordering``.
+    """
+    search_param = api_settings.SEARCH_PARAM
+    ordering_param = api_settings.ORDERING_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        ranked = order_by_rank(queryset, rank_posts(query, queryset))
+        if request.query_params.get(self.ordering_param):
+            return ranked.order_by(*queryset.query.order_by)
+        return ranked
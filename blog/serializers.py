@@ -1,8 +1,48 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
 from typing import List, Dict, Any
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q
 from .models import BlogCategory, BlogPost, BlogComment, BlogTag, Newsletter, ContactMessage
 from accounts.serializers import UserListSerializer
+from .comment_tree import attach_replies, load_comment_tree
+from .tagging import resolve_tags, set_post_tags
+from .view_counter import get_pending_views
+from core.rendering import render_rich_text
+
+
+# Querysets carrying the annotations the serializers below read, so that a
+# page of results costs a fixed number of queries instead of one per row.
+
+def annotate_published_posts_count(queryset):
+    """Annotate categories or tags with their number of published posts"""
+    return queryset.annotate(
+        published_posts_count=Count('posts', filter=Q(posts__status='published'), distinct=True)
+    )
+
+
+def blog_post_api_queryset(queryset):
+    """Eager-load and annotate everything the post serializers need"""
+    return queryset.select_related('author').prefetch_related(
+        Prefetch('category', queryset=annotate_published_posts_count(BlogCategory.objects.all())),
+        Prefetch('tags', queryset=annotate_published_posts_count(BlogTag.objects.all())),
+    ).annotate(
+        approved_comments_count=Count('comments', filter=Q(comments__is_approved=True), distinct=True)
+    )
+
+
+def _published_posts_count(obj):
+    count = getattr(obj, 'published_posts_count', None)
+    if count is None:
+        count = obj.posts.filter(status='published').count()
+    return count
+
+
+def _approved_comments_count(obj):
+    count = getattr(obj, 'approved_comments_count', None)
+    if count is None:
+        count = obj.comments.filter(is_approved=True).count()
+    return count
 
 
 class BlogCategorySerializer(serializers.ModelSerializer):
@@ -15,7 +55,7 @@ class BlogCategorySerializer(serializers.ModelSerializer):
     
     @extend_schema_field(serializers.IntegerField())
     def get_posts_count(self, obj) -> int:
-        return obj.posts.filter(status='published').count()
+        return _published_posts_count(obj)
 
 
 class BlogTagSerializer(serializers.ModelSerializer):
@@ -28,7 +68,7 @@ class BlogTagSerializer(serializers.ModelSerializer):
     
     @extend_schema_field(serializers.IntegerField())
     def get_posts_count(self, obj) -> int:
-        return obj.posts.filter(status='published').count()
+        return _published_posts_count(obj)
 
 
 class BlogCommentSerializer(serializers.ModelSerializer):
@@ -45,9 +85,21 @@ class BlogCommentSerializer(serializers.ModelSerializer):
     
     @extend_schema_field(serializers.ListField(child=serializers.DictField()))
     def get_replies(self, obj) -> List[Dict[str, Any]]:
-        if obj.replies.exists():
-            return BlogCommentSerializer(obj.replies.filter(is_approved=True), many=True).data
-        return []
+        # Replies are loaded for the whole thread at once (see blog.comment_tree)
+        if not hasattr(obj, 'thread_replies'):
+            attach_replies([obj])
+        return BlogCommentSerializer(obj.thread_replies, many=True, context=self.context).data
+
+
+class PendingViewsListSerializer(serializers.ListSerializer):
+    """Adds the buffered views not yet flushed to each post's views_count"""
+    
+    def to_representation(self, data):
+        posts = super().to_representation(data)
+        pending = get_pending_views([post['id'] for post in posts])
+        for post in posts:
+            post['views_count'] += pending.get(post['id'], 0)
+        return posts
 
 
 class BlogPostListSerializer(serializers.ModelSerializer):
@@ -60,13 +112,14 @@ class BlogPostListSerializer(serializers.ModelSerializer):
         model = BlogPost
         fields = [
             'id', 'title', 'slug', 'author', 'category', 'excerpt', 'featured_image',
-            'status', 'is_featured', 'views_count', 'reading_time', 'tags',
+            'status', 'is_featured', 'views_count', 'reading_time', 'word_count', 'tags',
             'comments_count', 'published_date', 'created_at', 'updated_at'
         ]
+        list_serializer_class = PendingViewsListSerializer
     
     @extend_schema_field(serializers.IntegerField())
     def get_comments_count(self, obj) -> int:
-        return obj.comments.filter(is_approved=True).count()
+        return _approved_comments_count(obj)
 
 
 class BlogPostDetailSerializer(serializers.ModelSerializer):
@@ -75,57 +128,94 @@ class BlogPostDetailSerializer(serializers.ModelSerializer):
     tags = BlogTagSerializer(many=True, read_only=True)
     comments = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
+    content_html = serializers.SerializerMethodField()
     
     class Meta:
         model = BlogPost
         fields = [
-            'id', 'title', 'slug', 'author', 'category', 'excerpt', 'content',
+            'id', 'title', 'slug', 'author', 'category', 'excerpt', 'content', 'content_html',
             'featured_image', 'meta_description', 'meta_keywords', 'status',
             'is_featured', 'allow_comments', 'views_count', 'reading_time',
-            'tags', 'comments', 'comments_count', 'published_date', 
-            'created_at', 'updated_at'
+            'word_count', 'table_of_contents', 'tags', 'comments', 'comments_count',
+            'published_date', 'created_at', 'updated_at'
         ]
     
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Views still buffered, not yet flushed to the database
+        data['views_count'] += get_pending_views([instance.pk]).get(instance.pk, 0)
+        return data
+    
+    @extend_schema_field(serializers.CharField())
+    def get_content_html(self, obj) -> str:
+        return render_rich_text(obj, 'content')
+    
     @extend_schema_field(serializers.ListField(child=serializers.DictField()))
     def get_comments(self, obj) -> List[Dict[str, Any]]:
         # Only return top-level comments (replies are nested in BlogCommentSerializer)
-        comments = obj.comments.filter(is_approved=True, parent=None).order_by('created_at')
-        return BlogCommentSerializer(comments, many=True).data
+        comments, truncated = load_comment_tree(obj)
+        return BlogCommentSerializer(comments, many=True, context=self.context).data
     
     @extend_schema_field(serializers.IntegerField())
     def get_comments_count(self, obj) -> int:
-        return obj.comments.filter(is_approved=True).count()
+        return _approved_comments_count(obj)
 
 
 class BlogPostCreateUpdateSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(many=True, queryset=BlogTag.objects.all(), required=False)
+    tag_names = serializers.ListField(
+        child=serializers.CharField(min_length=2, max_length=50),
+        write_only=True,
+        required=False,
+        help_text="Tags by name; missing tags are created"
+    )
     
     class Meta:
         model = BlogPost
         fields = [
             'title', 'category', 'excerpt', 'content', 'featured_image',
             'meta_description', 'meta_keywords', 'status', 'is_featured',
-            'allow_comments', 'tags', 'published_date'
+            'allow_comments', 'tags', 'tag_names', 'published_date'
         ]
     
+    def _tag_ids(self, tags, tag_names):
+        """Ids for the given tags plus the tags named, or None if neither was sent"""
+        if tags is None and tag_names is None:
+            return None
+        tag_ids = {tag.pk for tag in tags or []}
+        tag_ids.update(resolve_tags(tag_names or []).values())
+        return tag_ids
+    
+    @transaction.atomic
     def create(self, validated_data):
-        tags = validated_data.pop('tags', [])
+        tag_ids = self._tag_ids(validated_data.pop('tags', None), validated_data.pop('tag_names', None))
         post = BlogPost.objects.create(**validated_data)
-        post.tags.set(tags)
+        if tag_ids:
+            set_post_tags(post, tag_ids)
         return post
     
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags', None)
+        tag_ids = self._tag_ids(validated_data.pop('tags', None), validated_data.pop('tag_names', None))
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
         
-        if tags is not None:
-            instance.tags.set(tags)
+        if tag_ids is not None:
+            set_post_tags(instance, tag_ids)
         
         return instance
 
 
+class CommentModerationSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000
+    )
+    action = serializers.ChoiceField(choices=['approve', 'reject'])
+
+
 class NewsletterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Newsletter
@@ -0,0 +1,52 @@
+"""
+Cached sidebar bundle shared by the blog list, category and tag pages.
+
+The featured posts, category counts, popular tags and recent posts only
+change when a post, category or tag changes, so they are computed once and
+kept in the cache until one of the receivers in ``blog.signals`` drops them.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import BlogCategory, BlogPost, BlogTag
+
+SIDEBAR_CACHE_KEY = 'blog:sidebar'
+
+
+def get_sidebar_timeout():
+    """Upper bound on the cache lifetime, so scheduled posts show up in time"""
+    return getattr(settings, 'BLOG_SIDEBAR_CACHE_TIMEOUT', 600)
+
+
+def build_sidebar():
+    published = BlogPost.objects.filter(
+        status='published',
+        published_date__lte=timezone.now()
+    )
+    return {
+        'featured_posts': list(published.filter(is_featured=True)[:3]),
+        'categories': list(BlogCategory.objects.filter(is_active=True).annotate(
+            post_count=Count('posts', filter=Q(posts__status='published'))
+        )),
+        'popular_tags': list(BlogTag.objects.annotate(
+            post_count=Count('posts', filter=Q(posts__status='published'))
+        ).filter(post_count__gt=0).order_by('-post_count')[:10]),
+        'recent_posts': list(published.order_by('-published_date')[:5]),
+    }
+
+
+def get_sidebar():
+    """Return the sidebar context, computing it on a cache miss"""
+    sidebar = cache.get(SIDEBAR_CACHE_KEY)
+    if sidebar is None:
+        sidebar = build_sidebar()
+        cache.set(SIDEBAR_CACHE_KEY, sidebar, get_sidebar_timeout())
+    return sidebar
+
+
+def invalidate_sidebar():
+    """Drop the cached sidebar once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(SIDEBAR_CACHE_KEY))
@@ -1,34 +1,52 @@
-from django.db.models.signals import post_save, pre_save
+from django.core.signals import request_finished
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
-from django.utils.text import slugify
 
-from .models import BlogPost, BlogComment, Newsletter
+from .models import BlogPost, BlogCategory, BlogComment, BlogTag, Newsletter
+from .search import index_post
+from .related import refresh_related_posts_on_commit
+from .sidebar import invalidate_sidebar
+from .archive import post_month, refresh_archive_months
+from .publishing import PUBLISHED_POST_ACHIEVEMENTS
+from .moderation import approval_notification
+from .commenting import apply_comment_side_effects
+from .view_counter import flush_if_due
 from accounts.models import UserNotification, UserAchievement
 from dashboard.models import UserActivity
 
 @receiver(pre_save, sender=BlogPost)
 def blog_post_pre_save(sender, instance, **kwargs):
     """Handle blog post pre-save operations"""
-    # Auto-generate slug if not provided
-    if not instance.slug:
-        instance.slug = slugify(instance.title)
-        
-        # Ensure slug is unique
-        original_slug = instance.slug
-        counter = 1
-        while BlogPost.objects.filter(slug=instance.slug).exclude(pk=instance.pk).exists():
-            instance.slug = f"{original_slug}-{counter}"
-            counter += 1
-    
-    # Auto-calculate reading time if content exists
-    if instance.content:
-        word_count = len(instance.content.split())
-        instance.reading_time = max(1, word_count // 200)  # 200 words per minute
-    
     # Set published date when status changes to published
     if instance.status == 'published' and not instance.published_date:
         instance.published_date = timezone.now()
+    
+    # Only drafts wait for the scheduled publishing worker
+    if instance.status != 'draft':
+        instance.is_scheduled = False
+
+@receiver(pre_save, sender=BlogPost)
+def remember_archive_month(sender, instance, **kwargs):
+    """Note the month the post was archived under before this save"""
+    instance._archive_month = None
+    if instance.pk:
+        previous = BlogPost.objects.filter(
+            pk=instance.pk, status='published'
+        ).values_list('published_date', flat=True).first()
+        if previous:
+            instance._archive_month = post_month(previous)
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def update_archive_months(sender, instance, **kwargs):
+    """Recount the archive months the post left or joined"""
+    months = []
+    if getattr(instance, '_archive_month', None):
+        months.append(instance._archive_month)
+    if instance.status == 'published' and instance.published_date:
+        months.append(post_month(instance.published_date))
+    refresh_archive_months(months)
 
 @receiver(post_save, sender=BlogPost)
 def blog_post_published(sender, instance, created, **kwargs):
@@ -68,14 +86,7 @@ def blog_post_published(sender, instance, created, **kwargs):
             status='published'
         ).count()
         
-        achievements = [
-            (5, 'Prolific Writer', 'Published 5 blog posts'),
-            (10, 'Content Creator', 'Published 10 blog posts'),
-            (25, 'Blog Master', 'Published 25 blog posts'),
-            (50, 'Content Guru', 'Published 50 blog posts'),
-        ]
-        
-        for threshold, title, description in achievements:
+        for threshold, title, description in PUBLISHED_POST_ACHIEVEMENTS:
             if published_count == threshold:
                 UserAchievement.objects.create(
                     user=instance.author,
@@ -88,78 +99,59 @@ def blog_post_published(sender, instance, created, **kwargs):
                 instance.author.add_points(threshold * 10)
                 break
 
+@receiver(post_save, sender=BlogPost)
+def update_search_index(sender, instance, **kwargs):
+    """Keep the blog search index in sync with the post"""
+    index_post(instance)
+
+@receiver(post_save, sender=BlogPost)
+def refresh_related_posts(sender, instance, **kwargs):
+    """Recompute related posts once the search index is up to date"""
+    refresh_related_posts_on_commit(instance)
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Retagging changes the related posts and the sidebar tag counts"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate_sidebar()
+    if reverse:
+        # post.tags changed; the relation is declared on BlogTag
+        refresh_related_posts_on_commit(instance)
+    elif pk_set:
+        # tag.posts changed; pk_set holds post ids
+        for post in BlogPost.objects.filter(pk__in=pk_set):
+            refresh_related_posts_on_commit(post)
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_save, sender=BlogCategory)
+@receiver(post_delete, sender=BlogCategory)
+@receiver(post_save, sender=BlogTag)
+@receiver(post_delete, sender=BlogTag)
+def blog_sidebar_changed(sender, **kwargs):
+    """Posts, categories and tags are all shown in the cached sidebar"""
+    invalidate_sidebar()
+
 @receiver(post_save, sender=BlogComment)
 def blog_comment_posted(sender, instance, created, **kwargs):
     """Handle new blog comment"""
     if created:
-        # Award points for commenting
-        instance.author.add_points(5)
-        
-        # Log activity
-        UserActivity.objects.create(
-            user=instance.author,
-            activity_type='comment',
-            description=f'Commented on: {instance.post.title}'
-        )
-        
-        # Notify post author (if different from commenter)
-        if instance.post.author != instance.author:
-            UserNotification.objects.create(
-                user=instance.post.author,
-                title='New Comment on Your Post',
-                message=f'{instance.author.get_full_name()} commented on "{instance.post.title}"',
-                notification_type='comment'
-            )
-        
-        # Notify parent comment author (for replies)
-        if instance.parent and instance.parent.author != instance.author:
-            UserNotification.objects.create(
-                user=instance.parent.author,
-                title='Reply to Your Comment',
-                message=f'{instance.author.get_full_name()} replied to your comment on "{instance.post.title}"',
-                notification_type='comment'
-            )
-        
-        # Check for active commenter achievements
-        comment_count = BlogComment.objects.filter(
-            author=instance.author,
-            is_approved=True
-        ).count()
-        
-        achievements = [
-            (10, 'Active Commenter', 'Made 10 comments'),
-            (25, 'Community Contributor', 'Made 25 comments'),
-            (50, 'Discussion Leader', 'Made 50 comments'),
-            (100, 'Community Champion', 'Made 100 comments'),
-        ]
-        
-        for threshold, title, description in achievements:
-            if comment_count == threshold:
-                UserAchievement.objects.create(
-                    user=instance.author,
-                    title=title,
-                    description=description,
-                    achievement_type='points_milestone',
-                    points_awarded=threshold,
-                    badge_icon='fas fa-comments'
-                )
-                instance.author.add_points(threshold)
-                break
+        apply_comment_side_effects(instance)
 
 @receiver(post_save, sender=BlogComment)
-def comment_approved(sender, instance, **kwargs):
+def comment_approved(sender, instance, created, **kwargs):
     """Handle comment approval"""
+    # New comments are handled by blog_comment_posted; re-saving an already
+    # approved comment is not an approval
+    if created or getattr(instance, '_was_approved', False):
+        return
     if instance.is_approved and not getattr(instance, '_approval_processed', False):
         # Prevent duplicate processing
         instance._approval_processed = True
         
         # Notify commenter about approval
-        UserNotification.objects.create(
-            user=instance.author,
-            title='Comment Approved',
-            message=f'Your comment on "{instance.post.title}" has been approved and is now visible.',
-            notification_type='comment'
-        )
+        approval_notification(instance.author_id, instance.post.title).save()
 
 @receiver(post_save, sender=Newsletter)
 def newsletter_subscribed(sender, instance, created, **kwargs):
@@ -196,4 +188,9 @@ def newsletter_subscribed(sender, instance, created, **kwargs):
 def auto_approve_verified_comments(sender, instance, **kwargs):
     """Auto-approve comments from verified users"""
     if instance.author and instance.author.is_verified:
-        instance.is_approved = True
\ No newline at end of file
+        instance.is_approved = True
+
+@receiver(request_finished)
+def flush_local_view_counts(sender, **kwargs):
+    """Flush the views buffered in a local-memory cache, after the response"""
+    flush_if_due()
@@ -0,0 +1,83 @@
+"""
+Tag assignment for blog posts.
+
+``resolve_tags()`` turns a list of tag names into tag ids with one SELECT,
+creating the missing tags with a single ``bulk_create(ignore_conflicts=True)``
+(with unique slugs). ``set_post_tags()`` then writes only the difference
+between the post's current and new tags. The post form, the API serializer
+and the importer all go through here.
+
+Names are compared lower-cased; the lookup filters on ``LOWER(name)``, the
+expression of the case-insensitive unique index on ``BlogTag``, so it is an
+index lookup and two spellings of a name can't both be created.
+"""
+from django.db.models.functions import Lower
+from django.utils.text import slugify
+
+from core.slugs import unique_values
+from .models import BlogTag
+
+TAG_NAME_MAX_LENGTH = BlogTag._meta.get_field('name').max_length
+CREATE_ATTEMPTS = 2
+
+
+def normalize_tag_names(names):
+    """Stripped names without case-insensitive duplicates, first spelling wins"""
+    unique = {}
+    for name in names:
+        name = ' '.join(str(name).split())[:TAG_NAME_MAX_LENGTH]
+        if name:
+            unique.setdefault(name.lower(), name)
+    return list(unique.values())
+
+
+def _existing_tags(names):
+    # Must stay LOWER(name) to match the blog_blogtag_name_ci_uniq index
+    return {
+        name.lower(): tag_id
+        for tag_id, name in BlogTag.objects.annotate(lower_name=Lower('name'))
+        .filter(lower_name__in=[name.lower() for name in names])
+        .values_list('id', 'name')
+    }
+
+
+def resolve_tags(names):
+    """{lower-cased name: tag id} for the names, creating tags that do not exist"""
+    names = normalize_tag_names(names)
+    if not names:
+        return {}
+
+    tag_ids = _existing_tags(names)
+    for attempt in range(CREATE_ATTEMPTS):
+        missing = [name for name in names if name.lower() not in tag_ids]
+        if not missing:
+            break
+        slugs = unique_values(BlogTag, 'slug', [slugify(name) or 'tag' for name in missing])
+        # Conflicts are tags created concurrently; they are picked up by the next SELECT
+        BlogTag.objects.bulk_create(
+            [BlogTag(name=name, slug=slug) for name, slug in zip(missing, slugs)],
+            ignore_conflicts=True
+        )
+        tag_ids.update(_existing_tags(missing))
+    return tag_ids
+
+
+def set_post_tags(post, tag_ids):
+    """Make ``tag_ids`` the post's tags, adding and removing only what changed"""
+    Through = BlogTag.posts.through
+    tag_ids = set(tag_ids)
+    current = set(Through.objects.filter(blogpost_id=post.pk).values_list('blogtag_id', flat=True))
+    removed, added = current - tag_ids, tag_ids - current
+
+    if added:
+        if removed:
+            # The m2m_changed of the add below refreshes related posts for both changes
+            Through.objects.filter(blogpost_id=post.pk, blogtag_id__in=removed).delete()
+        post.tags.add(*added)
+    elif removed:
+        post.tags.remove(*removed)
+
+
+def set_post_tag_names(post, names):
+    """Tag a post by name, creating missing tags"""
+    set_post_tags(post, resolve_tags(names).values())
@@ -1,3 +1,1081 @@
-from django.test import TestCase
+import json
+import smtplib
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.core.management import call_command
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.functions import Lower
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from accounts.models import User, UserAchievement, UserNotification
+from core.pagination import PageNumberOrKeysetPagination
+from core.conditional import ConditionalGetMixin
+from .admin import BlogPostAdmin
+from .api_views import BlogCategoryViewSet
+from .archive import post_month
+from .comment_tree import load_comment_tree
+from .moderation import moderate_comments
+from .publishing import get_due_posts, publish_due_posts
+from .views import BlogPostDetailView, add_comment
+from .models import (
+    BlogArchiveMonth, BlogCategory, BlogPost, BlogPostViewBucket, BlogComment, BlogSearchTerm, BlogTag, Newsletter,
+    NewsletterCampaign, RelatedPost
+)
+from . import related
+from .importer import import_posts, iter_json_values
+from .forms import EmailNewsletterForm
+from .newsletter import send_campaign, send_pending_campaigns, set_interests
+from .serializers import BlogPostCreateUpdateSerializer
+from .search import build_snippet, rank_posts
+from .tagging import resolve_tags, set_post_tag_names
+from .trending import update_trending_scores
+from .view_counter import (
+    FLUSH_DUE_KEY, FLUSH_MUTEX_KEY, apply_pending_views, buffer_is_local, flush_view_counts, record_view
+)
+
+
+class BlogAPIQueryBudgetTests(TestCase):
+    """Blog API endpoints must cost a fixed number of queries, whatever the page size"""
+    QUERY_BUDGET = 8
+    POSTS = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        cls.staff = User.objects.create_user('staff@example.com', 'Staff', 'User', 'password123', is_staff=True)
+        categories = [BlogCategory.objects.create(name=f'Category {i}') for i in range(3)]
+        tags = [BlogTag.objects.create(name=f'Tag {i}') for i in range(5)]
+
+        for i in range(cls.POSTS):
+            post = BlogPost.objects.create(
+                title=f'Post {i}', author=cls.author, category=categories[i % 3],
+                excerpt='Excerpt', content='<p>Some content</p>',
+                status='published', is_featured=i % 2 == 0,
+            )
+            post.tags.set(tags[:i % 5 + 1])
+            BlogComment.objects.create(post=post, author=cls.author, content='Nice post', is_approved=True)
+
+        cls.post_without_comments = BlogPost.objects.create(
+            title='Quiet post', author=cls.author, category=categories[0],
+            excerpt='Excerpt', content='<p>Nothing to discuss</p>', status='published',
+        )
+        cls.post_without_comments.tags.set(tags)
+
+        # A discussion three levels deep
+        cls.threaded_post = BlogPost.objects.create(
+            title='Busy post', author=cls.author, category=categories[1],
+            excerpt='Excerpt', content='<p>Lots to discuss</p>', status='published',
+        )
+        for i in range(5):
+            top = BlogComment.objects.create(post=cls.threaded_post, author=cls.author, content=f'Top {i}', is_approved=True)
+            for j in range(3):
+                reply = BlogComment.objects.create(post=cls.threaded_post, author=cls.author, parent=top, content=f'Reply {j}', is_approved=True)
+                BlogComment.objects.create(post=cls.threaded_post, author=cls.author, parent=reply, content='Nested', is_approved=True)
+
+    def setUp(self):
+        cache.clear()
+        # The once-per-interval flush of buffered views is not part of a page
+        cache.set(FLUSH_DUE_KEY, 1)
+        self.client = APIClient()
+
+    def assertWithinBudget(self, url, user=None):
+        if user:
+            self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), self.QUERY_BUDGET,
+            f'{url} ran {len(queries)} queries (budget {self.QUERY_BUDGET})'
+        )
+        return response
+
+    def test_post_list(self):
+        response = self.assertWithinBudget('/api/v1/posts/?ordering=published_date')
+        first = response.data['results'][0]
+        self.assertEqual(first['comments_count'], 1)
+        self.assertGreater(first['category']['posts_count'], 0)
+
+    def test_post_list_as_staff(self):
+        self.assertWithinBudget('/api/v1/posts/', user=self.staff)
+
+    def test_post_search(self):
+        self.assertWithinBudget('/api/v1/posts/?search=post')
+
+    def test_post_detail(self):
+        self.assertWithinBudget(f'/api/v1/posts/{self.post_without_comments.pk}/')
+
+    def test_post_detail_with_thread(self):
+        response = self.assertWithinBudget(f'/api/v1/posts/{self.threaded_post.pk}/')
+        comments = response.data['comments']
+        self.assertEqual(len(comments), 5)
+        self.assertEqual(len(comments[0]['replies']), 3)
+        self.assertEqual(len(comments[0]['replies'][0]['replies']), 1)
+
+    def test_comment_list(self):
+        self.assertWithinBudget('/api/v1/comments/')
+
+    def test_featured_and_recent(self):
+        self.assertWithinBudget('/api/v1/posts/featured/', user=self.staff)
+        self.assertWithinBudget('/api/v1/posts/recent/', user=self.staff)
+
+    def test_category_list(self):
+        # /api/v1/categories/ resolves to the services app, so call the viewset directly
+        view = BlogCategoryViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/')
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+        self.assertLessEqual(len(queries), self.QUERY_BUDGET)
+        self.assertEqual(
+            sum(c['posts_count'] for c in response.data['results']),
+            BlogPost.objects.filter(status='published').count()
+        )
+
+    def test_tag_list(self):
+        self.assertWithinBudget('/api/v1/tags/')
+
+
+class CommentPostingTests(TestCase):
+    """Posting a comment applies each side effect once, in a few queries"""
+    QUERY_BUDGET = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        cls.commenter = User.objects.create_user('reader@example.com', 'Blog', 'Reader', 'password123')
+        category = BlogCategory.objects.create(name='Category')
+        cls.post = BlogPost.objects.create(
+            title='Post', author=cls.author, category=category,
+            excerpt='Excerpt', content='<p>Some content</p>', status='published',
+        )
+
+    def post_comment(self, **data):
+        request = RequestFactory().post('/', {'content': 'A thoughtful comment', **data})
+        request.user = User.objects.get(pk=self.commenter.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = add_comment(request, self.post.slug)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), self.QUERY_BUDGET,
+            f'Posting a comment ran {len(queries)} queries (budget {self.QUERY_BUDGET})'
+        )
+        return response
+
+    def test_comment_side_effects_run_once(self):
+        points = User.objects.get(pk=self.commenter.pk).points
+        notifications = UserNotification.objects.filter(user=self.author).count()
+
+        self.post_comment()
+
+        self.assertEqual(BlogComment.objects.filter(post=self.post).count(), 1)
+        self.assertEqual(User.objects.get(pk=self.commenter.pk).points, points + 5)
+        self.assertEqual(UserNotification.objects.filter(user=self.author).count(), notifications + 1)
+
+    def test_reply_notifies_each_recipient_once(self):
+        parent = BlogComment.objects.create(post=self.post, author=self.author, content='First', is_approved=True)
+        notifications = UserNotification.objects.filter(user=self.author).count()
+
+        self.post_comment(parent_id=parent.pk)
+
+        new = UserNotification.objects.filter(user=self.author).order_by('-id')
+        self.assertEqual(new.count(), notifications + 1)
+        self.assertEqual(new.first().title, 'Reply to Your Comment')
+
+    def test_resaving_approved_comment_does_not_notify_again(self):
+        comment = BlogComment.objects.create(post=self.post, author=self.commenter, content='Hi', is_approved=True)
+        notifications = UserNotification.objects.filter(user=self.commenter).count()
+
+        comment = BlogComment.objects.get(pk=comment.pk)
+        comment.content = 'Edited'
+        comment.save()
+
+        self.assertEqual(UserNotification.objects.filter(user=self.commenter).count(), notifications)
+
+
+class CommentTreeTests(TestCase):
+    """Large threads are cut from the oldest end, and paths never outgrow the column"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        category = BlogCategory.objects.create(name='Category')
+        cls.post = BlogPost.objects.create(
+            title='Post', author=cls.author, category=category,
+            excerpt='Excerpt', content='<p>Some content</p>', status='published',
+        )
+
+    def comment(self, parent=None, is_approved=True):
+        return BlogComment.objects.create(
+            post=self.post, author=self.author, parent=parent, content='Comment', is_approved=is_approved
+        )
+
+    def test_limit_keeps_the_newest_threads(self):
+        threads = []
+        for i in range(3):
+            root = self.comment()
+            self.comment(parent=self.comment(parent=root))
+            threads.append(root)
+
+        with self.assertNumQueries(2):
+            roots, truncated = load_comment_tree(self.post, max_comments=6)
+
+        self.assertTrue(truncated)
+        self.assertEqual(roots, threads[1:])
+        self.assertEqual([len(root.thread_replies) for root in roots], [1, 1])
+        self.assertEqual(len(roots[1].thread_replies[0].thread_replies), 1)
+
+    def test_everything_fits(self):
+        first, second = self.comment(), self.comment()
+        reply = self.comment(parent=first)
+        self.comment(is_approved=False)
+
+        roots, truncated = load_comment_tree(self.post)
+
+        self.assertFalse(truncated)
+        self.assertEqual(roots, [first, second])
+        self.assertEqual(roots[0].thread_replies, [reply])
+
+    def test_backfill_caps_the_depth(self):
+        migration = import_module('blog.migrations.0003_blogcomment_path')
+        chain = [self.comment()]
+        for i in range(BlogComment.MAX_STORED_DEPTH + 2):
+            chain.append(self.comment(parent=chain[-1]))
+        # Before paths existed nothing stopped a thread from nesting this deep
+        for parent, comment in zip(chain, chain[1:]):
+            BlogComment.objects.filter(pk=comment.pk).update(parent=parent)
+        BlogComment.objects.update(path='', depth=0)
+
+        migration.populate_comment_paths(django_apps, None)
+
+        saved = {comment.pk: comment for comment in BlogComment.objects.all()}
+        deepest = BlogComment.MAX_STORED_DEPTH
+        self.assertEqual(max(comment.depth for comment in saved.values()), deepest)
+        for comment in chain:
+            self.assertEqual(saved[comment.pk].path, comment.path)
+            self.assertEqual(saved[comment.pk].parent_id, comment.parent_id)
+            self.assertLessEqual(len(comment.path), BlogComment._meta.get_field('path').max_length)
+
+
+class ModerationTests(TestCase):
+    """Moderation flips comments in bulk, notifies approvals once and locks only the comments"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        cls.readers = [
+            User.objects.create_user(f'reader{i}@example.com', 'Blog', 'Reader', 'password123') for i in range(2)
+        ]
+        cls.staff = User.objects.create_user('staff@example.com', 'Staff', 'User', 'password123', is_staff=True)
+        category = BlogCategory.objects.create(name='Category')
+        cls.posts = [
+            BlogPost.objects.create(
+                title=f'Post {i}', author=cls.author, category=category,
+                excerpt='Excerpt', content='<p>Some content</p>', status='published',
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.comments = [
+            BlogComment.objects.create(post=post, author=reader, content='Comment')
+            for post in self.posts for reader in self.readers
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def approvals(self, user):
+        return list(
+            UserNotification.objects.filter(user=user, title='Comment Approved')
+            .order_by('id').values_list('message', flat=True)
+        )
+
+    def comments_count(self, post):
+        return self.client.get(f'/api/v1/posts/{post.pk}/').data['comments_count']
+
+    def test_approve_notifies_each_author_once(self):
+        self.assertEqual(self.comments_count(self.posts[0]), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(moderate_comments([comment.pk for comment in self.comments]), 4)
+        # The locking SELECT reads the comments table alone
+        lock = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT'))
+        self.assertNotIn('blog_blogpost', lock)
+
+        self.assertEqual(self.approvals(self.readers[0]), [
+            'Your comment on "Post 0" has been approved and is now visible.',
+            'Your comment on "Post 1" has been approved and is now visible.',
+        ])
+        self.assertEqual(self.comments_count(self.posts[0]), 2)
+
+        # Already approved comments are left alone
+        self.assertEqual(moderate_comments([self.comments[0].pk]), 0)
+        self.assertEqual(len(self.approvals(self.readers[0])), 2)
+
+    def test_reject_hides_without_notifying(self):
+        moderate_comments([self.comments[0].pk])
+        self.assertEqual(self.comments_count(self.posts[0]), 1)
+
+        self.assertEqual(moderate_comments([comment.pk for comment in self.comments], approve=False), 1)
+
+        self.assertFalse(BlogComment.objects.filter(is_approved=True).exists())
+        self.assertEqual(len(self.approvals(self.readers[0])), 1)
+        self.assertEqual(self.comments_count(self.posts[0]), 0)
+
+    def test_api_actions(self):
+        comment = self.comments[1]
+        response = self.client.post(f'/api/v1/comments/{comment.pk}/approve/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(BlogComment.objects.get(pk=comment.pk).is_approved)
+        self.assertEqual(len(self.approvals(self.readers[1])), 1)
+
+        self.assertEqual(self.client.post(f'/api/v1/comments/{comment.pk}/reject/').status_code, 200)
+        self.assertFalse(BlogComment.objects.get(pk=comment.pk).is_approved)
+
+        response = self.client.post('/api/v1/comments/moderate/', {
+            'ids': [comment.pk for comment in self.comments], 'action': 'approve'
+        }, format='json')
+        self.assertEqual(response.data, {'updated': 4})
+        self.assertEqual(len(self.approvals(self.readers[1])), 3)
+
+
+class ViewCounterTests(TestCase):
+    """Views are buffered in the cache and written once by a single flush"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        category = BlogCategory.objects.create(name='Category')
+        cls.posts = [
+            BlogPost.objects.create(
+                title=f'Post {i}', author=author, category=category,
+                excerpt='Excerpt', content='<p>Some content</p>', status='published',
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        # As with a shared cache, which only the flush_view_counts worker flushes
+        patcher = mock.patch('blog.view_counter.buffer_is_local', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def views_count(self, post):
+        return BlogPost.objects.get(pk=post.pk).views_count
+
+    def test_record_buffers_views(self):
+        record_view(self.posts[0].pk)
+        record_view(self.posts[0].pk)
+
+        self.assertEqual(self.views_count(self.posts[0]), 0)
+        post, = apply_pending_views(BlogPost.objects.filter(pk=self.posts[0].pk))
+        self.assertEqual(post.views_count, 2)
+
+    def test_flush_writes_viewed_posts_once(self):
+        for post in (self.posts[0], self.posts[0], self.posts[1]):
+            record_view(post.pk)
+
+        self.assertEqual(flush_view_counts(), 3)
+        self.assertEqual(self.views_count(self.posts[0]), 2)
+        self.assertEqual(self.views_count(self.posts[1]), 1)
+
+        self.assertEqual(flush_view_counts(), 0)
+        self.assertEqual(self.views_count(self.posts[0]), 2)
+
+    def test_views_after_a_flush_go_to_the_next_one(self):
+        record_view(self.posts[0].pk)
+        flush_view_counts()
+        record_view(self.posts[0].pk)
+
+        self.assertEqual(flush_view_counts(), 1)
+        self.assertEqual(self.views_count(self.posts[0]), 2)
+
+    def test_concurrent_flush_is_skipped(self):
+        record_view(self.posts[0].pk)
+
+        cache.add(FLUSH_MUTEX_KEY, 1)
+        self.assertIsNone(flush_view_counts())
+        out = StringIO()
+        call_command('flush_view_counts', stdout=out)
+        self.assertIn('Another flush is running', out.getvalue())
+        self.assertEqual(self.views_count(self.posts[0]), 0)
+
+        cache.delete(FLUSH_MUTEX_KEY)
+        call_command('flush_view_counts', stdout=StringIO())
+        self.assertEqual(flush_view_counts(), 0)
+        self.assertEqual(self.views_count(self.posts[0]), 1)
+
+
+    def test_post_page_only_buffers(self):
+        client = APIClient()
+        for _ in range(2):
+            self.assertEqual(client.get(f'/api/v1/posts/{self.posts[0].pk}/').status_code, 200)
+        self.assertEqual(self.views_count(self.posts[0]), 0)
+
+        self.assertEqual(flush_view_counts(), 2)
+        self.assertEqual(self.views_count(self.posts[0]), 2)
+
+    def test_cache_errors_do_not_break_the_request(self):
+        with mock.patch.object(cache, 'incr', side_effect=ConnectionError('cache down')):
+            record_view(self.posts[0].pk)
+            response = APIClient().get(f'/api/v1/posts/{self.posts[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_failed_flush_keeps_the_outer_transaction_usable(self):
+        record_view(self.posts[0].pk)
+        bulk_create = BlogPostViewBucket.objects.bulk_create
+
+        def racing_bulk_create(buckets, *args, **kwargs):
+            # Another writer inserts the same hourly buckets first
+            bulk_create([BlogPostViewBucket(post_id=b.post_id, hour=b.hour) for b in buckets])
+            return bulk_create(buckets, *args, **kwargs)
+
+        with transaction.atomic():
+            with mock.patch.object(BlogPostViewBucket.objects, 'bulk_create', side_effect=racing_bulk_create):
+                with self.assertRaises(IntegrityError):
+                    flush_view_counts()
+            # The flush rolled back to its savepoint only
+            self.assertEqual(self.views_count(self.posts[0]), 0)
+
+        self.assertEqual(flush_view_counts(), 1)
+        self.assertEqual(self.views_count(self.posts[0]), 1)
+
+
+class LocalViewCounterTests(TestCase):
+    """With the configured local-memory cache, web processes flush their own views"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        category = BlogCategory.objects.create(name='Category')
+        cls.post = BlogPost.objects.create(
+            title='Post', author=author, category=category,
+            excerpt='Excerpt', content='<p>Some content</p>', status='published',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.detail_url = f'/api/v1/posts/{self.post.pk}/'
+
+    def counts(self):
+        views = BlogPost.objects.get(pk=self.post.pk).views_count
+        bucketed = BlogPostViewBucket.objects.filter(post=self.post).aggregate(total=models.Sum('views'))['total']
+        return views, bucketed or 0
+
+    def test_views_reach_the_database_and_trending_buckets(self):
+        self.assertTrue(buffer_is_local())
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+
+        # The first request found the flush due; the others wait for the next interval
+        self.assertEqual(self.counts(), (1, 1))
+
+        # The interval passes
+        cache.delete(FLUSH_DUE_KEY)
+        self.client.get(self.detail_url)
+        self.assertEqual(self.counts(), (4, 4))
+
+    def test_lists_and_detail_show_buffered_views(self):
+        for _ in range(3):
+            self.client.get(self.detail_url)
+        # Two views wait for the next flush
+        self.assertEqual(self.counts(), (1, 1))
+
+        self.assertEqual(self.client.get(self.detail_url).data['views_count'], 4)
+        listed, = self.client.get('/api/v1/posts/').data['results']
+        self.assertEqual(listed['views_count'], 4)
+
+    def test_worker_warns_about_a_local_buffer(self):
+        out = StringIO()
+        call_command('flush_view_counts', stdout=out)
+        self.assertIn('local to each process', out.getvalue())
+
+
+class TrendingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        category = BlogCategory.objects.create(name='Category')
+        cls.posts = [
+            BlogPost.objects.create(
+                title=f'Post {i}', author=author, category=category,
+                excerpt='Excerpt', content='<p>Some content</p>', status='published',
+            )
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_recent_views_rank_first(self):
+        now = timezone.now()
+        with mock.patch('blog.trending.timezone.now', return_value=now - timedelta(days=2)):
+            for _ in range(10):
+                record_view(self.posts[0].pk)
+            flush_view_counts()
+        for post, views in ((self.posts[1], 3), (self.posts[2], 1)):
+            for _ in range(views):
+                record_view(post.pk)
+        flush_view_counts()
+
+        self.assertEqual(update_trending_scores(now), 3)
+        response = APIClient().get('/api/v1/posts/trending/')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            # 10 views two half-lives ago weigh 2.5
+            [self.posts[1].pk, self.posts[0].pk, self.posts[2].pk]
+        )
+
+    def test_trending_is_paginated(self):
+        BlogPost.objects.filter(pk__in=[post.pk for post in self.posts]).update(trending_score=1.0)
+
+        with mock.patch.object(PageNumberOrKeysetPagination, 'page_size', 2):
+            response = APIClient().get('/api/v1/posts/trending/', {'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            [self.posts[1].pk, self.posts[0].pk]
+        )
+
+
+class SearchTests(TestCase):
+    """Ranking and snippets of the blog search index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        category = BlogCategory.objects.create(name='Category')
+
+        def post(title, content):
+            return BlogPost.objects.create(
+                title=title, author=author, category=category,
+                excerpt='Excerpt', content=f'<p>{content}</p>', status='published',
+            )
+
+        cls.both_terms = post('Cloud security', 'Hardening a cloud account')
+        cls.many_variants = post('Secure, secured, securing', 'Security for secrets and sectors')
+
+    def test_prefix_variants_count_as_one_matched_term(self):
+        ranked = [post_id for post_id, _ in rank_posts('cloud sec')]
+        self.assertEqual(ranked, [self.both_terms.pk, self.many_variants.pk])
+
+    def test_results_are_capped(self):
+        with self.settings(BLOG_SEARCH_MAX_RESULTS=1):
+            self.assertEqual(len(rank_posts('sec')), 1)
+            self.assertEqual(len(rank_posts('sec', limit=10)), 1)
+
+    def test_snippet_highlights_before_escaping(self):
+        snippet = build_snippet('Tom & Jerry <b>example</b> sample', 'amp')
+        self.assertEqual(snippet, 'Tom &amp; Jerry &lt;b&gt;example&lt;/b&gt; sample')
+
+        snippet = build_snippet('Use <script> safely', 'script')
+        self.assertEqual(snippet, 'Use &lt;<mark>script</mark>&gt; safely')
+
+
+class TaggingTests(TestCase):
+    """Tags are found by case-insensitive name through an index and created once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        cls.category = BlogCategory.objects.create(name='Category')
+        cls.python = BlogTag.objects.create(name='Python')
+
+    def create_post(self, title, status='published'):
+        return BlogPost.objects.create(
+            title=title, author=self.author, category=self.category,
+            excerpt=title, content=f'<p>{title}</p>', status=status,
+        )
+
+    def test_resolve_reuses_and_creates(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_tags(['Python']), {'python': self.python.pk})
+
+        tag_ids = resolve_tags(['python', ' PYTHON ', 'Web  Security', 'web security'])
+
+        self.assertEqual(tag_ids['python'], self.python.pk)
+        security = BlogTag.objects.get(pk=tag_ids['web security'])
+        self.assertEqual((security.name, security.slug), ('Web Security', 'web-security'))
+        self.assertEqual(BlogTag.objects.count(), 2)
+
+    def test_names_are_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BlogTag.objects.create(name='PYTHON', slug='python-2')
+
+    def test_lookup_uses_the_name_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Reads the SQLite query plan')
+        plan = BlogTag.objects.annotate(lower_name=Lower('name')).filter(lower_name__in=['python']).explain()
+        self.assertIn('blog_blogtag_name_ci_uniq', plan)
+
+    def test_post_counts_follow_retagging(self):
+        first, second = self.create_post('First'), self.create_post('Second')
+        self.create_post('Draft', status='draft')
+        set_post_tag_names(first, ['Python', 'Django'])
+        set_post_tag_names(second, ['python'])
+        set_post_tag_names(BlogPost.objects.get(title='Draft'), ['Python'])
+
+        def counts():
+            response = APIClient().get('/api/v1/tags/')
+            return {tag['name']: tag['posts_count'] for tag in response.data['results']}
+
+        self.assertEqual(counts(), {'Python': 2, 'Django': 1})
+
+        set_post_tag_names(first, ['DJANGO', 'Rust'])
+        self.assertEqual(counts(), {'Python': 1, 'Django': 1, 'Rust': 1})
+
+
+class RelatedPostsTests(TestCase):
+    """Related posts follow tag changes from either side, once per transaction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        cls.categories = [BlogCategory.objects.create(name=f'Category {i}') for i in range(3)]
+        cls.tag = BlogTag.objects.create(name='Kubernetes')
+
+    def create_post(self, title, category, content=None):
+        # Only the given words overlap between posts
+        with self.captureOnCommitCallbacks(execute=True):
+            return BlogPost.objects.create(
+                title=title, author=self.author, category=category,
+                excerpt=title, content=content or f'<p>{title}</p>', status='published',
+            )
+
+    def related_ids(self, post):
+        return set(RelatedPost.objects.filter(post=post).values_list('related_id', flat=True))
+
+    def test_post_tags_change_refreshes_the_post(self):
+        first = self.create_post('Alpha', self.categories[0])
+        second = self.create_post('Beta', self.categories[1])
+        self.assertEqual(self.related_ids(first), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.tags.add(self.tag)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.tags.add(self.tag)
+
+        self.assertEqual(self.related_ids(first), {second.pk})
+        self.assertEqual(self.related_ids(second), {first.pk})
+
+    def test_tag_posts_change_refreshes_each_post(self):
+        first = self.create_post('Alpha', self.categories[0])
+        second = self.create_post('Beta', self.categories[1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.posts.add(first, second)
+
+        self.assertEqual(self.related_ids(first), {second.pk})
+        self.assertEqual(self.related_ids(second), {first.pk})
+
+    def test_saving_a_post_with_tags_recomputes_once(self):
+        serializer = BlogPostCreateUpdateSerializer(data={
+            'title': 'Gamma', 'category': self.categories[0].pk, 'excerpt': 'Excerpt',
+            'content': '<p>Notes</p>', 'status': 'published', 'tag_names': ['Kubernetes', 'Docker'],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with mock.patch.object(related, 'update_related_posts', wraps=related.update_related_posts) as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                serializer.save(author=self.author)
+        self.assertEqual(update.call_count, 1)
+
+    def test_candidates_are_limited_to_the_best_matches(self):
+        post = self.create_post('Cluster hardening', self.categories[0], '<p>cluster cluster hardening</p>')
+        close = self.create_post('Cluster hardening guide', self.categories[1], '<p>cluster cluster hardening</p>')
+        self.create_post('Cluster', self.categories[2])
+
+        with mock.patch.object(related, 'TERM_CANDIDATES', 1):
+            scores = related.score_candidates(post)
+        self.assertEqual(set(scores), {close.pk})
+
+
+class PublishingTests(TestCase):
+    """Scheduled drafts are published in batches with their rewards written in bulk"""
+
+    # A fixed cost per batch, plus scoring the related posts of each post
+    BATCH_QUERIES = 40
+    SCORING_QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        cls.category = BlogCategory.objects.create(name='Category')
+        cls.published = timezone.now() - timedelta(days=1)
+        cls.existing = BlogPost.objects.create(
+            title='Already out', author=User.objects.create_user('other@example.com', 'Other', 'Author', 'password123'),
+            category=cls.category, excerpt='Excerpt', content='<p>Some content</p>', status='published',
+            published_date=cls.published - timedelta(days=400),
+        )
+        cls.drafts = [
+            BlogPost.objects.create(
+                title=f'Scheduled {i}', author=cls.author, category=cls.category, excerpt='Excerpt',
+                content='<p>Some content</p>', status='draft', is_scheduled=True, published_date=cls.published,
+            )
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_publishing_awards_points_and_achievements(self):
+        points = User.objects.get(pk=self.author.pk).points
+        earlier = set(UserAchievement.objects.filter(user=self.author).values_list('pk', flat=True))
+        notified = UserNotification.objects.filter(user=self.author, notification_type='achievement_unlocked').count()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(publish_due_posts(batch_size=10), 6)
+        self.assertLessEqual(len(queries), self.BATCH_QUERIES + self.SCORING_QUERIES * len(self.drafts))
+
+        self.assertEqual(BlogPost.objects.filter(status='published', author=self.author).count(), 6)
+        # 25 per post, 50 for the first post, 50 for the fifth and 10 for First Century
+        self.assertEqual(User.objects.get(pk=self.author.pk).points, points + 6 * 25 + 50 + 50 + 10)
+        self.assertEqual(
+            set(UserAchievement.objects.filter(user=self.author).exclude(pk__in=earlier).values_list('title', flat=True)),
+            {'First Blog Post', 'Prolific Writer', 'First Century'}
+        )
+        self.assertEqual(
+            UserNotification.objects.filter(user=self.author, notification_type='achievement_unlocked').count(), notified + 3
+        )
+        year, month = post_month(self.published)
+        self.assertEqual(BlogArchiveMonth.objects.get(year=year, month=month).post_count, 6)
+
+        # The batch is related to each other and merged into the existing post's list
+        related_ids = set(RelatedPost.objects.filter(post=self.drafts[0]).values_list('related_id', flat=True))
+        self.assertEqual(len(related_ids), related.get_related_count())
+        self.assertNotIn(self.drafts[0].pk, related_ids)
+        self.assertEqual(RelatedPost.objects.filter(post=self.existing).count(), related.get_related_count())
+
+    def test_rerun_publishes_nothing(self):
+        publish_due_posts(batch_size=4)
+        points = User.objects.get(pk=self.author.pk).points
+        achievements = UserAchievement.objects.filter(user=self.author).count()
+
+        self.assertEqual(publish_due_posts(), 0)
+        self.assertEqual(User.objects.get(pk=self.author.pk).points, points)
+        self.assertEqual(UserAchievement.objects.filter(user=self.author).count(), achievements)
+        self.assertFalse(get_due_posts().exists())
+
+    def test_future_posts_wait(self):
+        BlogPost.objects.filter(pk=self.drafts[0].pk).update(published_date=timezone.now() + timedelta(days=1))
+
+        self.assertEqual(publish_due_posts(), 5)
+        self.assertEqual(BlogPost.objects.get(pk=self.drafts[0].pk).status, 'draft')
+
+
+class FakeConnection:
+    """Mail connection that refuses the addresses in ``refused``"""
+
+    def __init__(self, refused=()):
+        self.refused = set(refused)
+        self.sent = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0] in self.refused:
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'No such user')})
+            self.sent.append(message.to[0])
+        return len(messages)
+
+
+class NewsletterCampaignTests(TestCase):
+
+    def setUp(self):
+        for email in ('a@example.com', 'b@example.com', 'c@example.com'):
+            Newsletter.objects.create(email=email)
+
+    def create_campaign(self, content='<p>Hi {{ subscriber.email }}</p>', **kwargs):
+        return NewsletterCampaign.objects.create(subject='News', content=content, status='queued', **kwargs)
+
+    def test_refused_recipient_is_recorded_and_skipped(self):
+        campaign = self.create_campaign()
+        connection = FakeConnection(refused=['b@example.com'])
+
+        self.assertEqual(send_campaign(campaign, batch_size=2, max_per_second=0, connection=connection), 2)
+
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.sent_count, campaign.failed_count), ('sent', 2, 1))
+        self.assertEqual(connection.sent, ['a@example.com', 'c@example.com'])
+        failure = campaign.failures.get()
+        self.assertEqual((failure.email, failure.subscriber.email), ('b@example.com', 'b@example.com'))
+
+    def test_template_error_pauses_only_that_campaign(self):
+        broken = self.create_campaign(content='{% if %}')
+        campaign = self.create_campaign()
+        connection = FakeConnection()
+
+        self.assertEqual(send_pending_campaigns(max_per_second=0, connection=connection), 3)
+
+        broken.refresh_from_db()
+        campaign.refresh_from_db()
+        self.assertEqual(broken.status, 'paused')
+        self.assertIn('if', broken.last_error)
+        self.assertEqual((campaign.status, campaign.sent_count), ('sent', 3))
+
+    def test_campaign_being_sent_is_not_claimed_twice(self):
+        campaign = self.create_campaign(heartbeat_at=timezone.now())
+        NewsletterCampaign.objects.filter(pk=campaign.pk).update(status='sending')
+        connection = FakeConnection()
+
+        self.assertEqual(send_pending_campaigns(max_per_second=0, connection=connection), 0)
+        self.assertEqual(connection.sent, [])
+
+        # Without a heartbeat for the claim timeout, the next run resumes it
+        NewsletterCampaign.objects.filter(pk=campaign.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(send_pending_campaigns(max_per_second=0, connection=connection), 3)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, 'sent')
+
+    def test_categories_limit_the_recipients(self):
+        a, b, c = Newsletter.objects.order_by('pk')
+        set_interests(a, ['programming'])
+        set_interests(b, ['design', 'cybersecurity', 'unknown'])
+        Newsletter.objects.create(email='d@example.com', is_active=False).interests.create(topic='design')
+        campaign = self.create_campaign(subscriber_categories=['design', 'cybersecurity'])
+        connection = FakeConnection()
+
+        self.assertEqual(send_campaign(campaign, batch_size=1, max_per_second=0, connection=connection), 1)
+        # Once, however many of the topics match
+        self.assertEqual(connection.sent, ['b@example.com'])
+        self.assertEqual(set(b.interests.values_list('topic', flat=True)), {'design', 'cybersecurity'})
+
+    def test_form_needs_categories_unless_sent_to_all(self):
+        data = {'subject': 'News', 'content': '<p>Hi</p>', 'subscriber_categories': ['design']}
+        form = EmailNewsletterForm(data)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.create_campaign().subscriber_categories, ['design'])
+
+        form = EmailNewsletterForm({**data, 'send_to_all': 'on'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.create_campaign().subscriber_categories, [])
+
+        self.assertFalse(EmailNewsletterForm({'subject': 'News', 'content': '<p>Hi</p>'}).is_valid())
+
+
+WXR_EXPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"
+     xmlns:excerpt="http://wordpress.org/export/1.2/excerpt/"
+     xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:wp="http://wordpress.org/export/1.2/">
+<channel>
+  <wp:author><wp:author_login>jdoe</wp:author_login><wp:author_email>writer@example.com</wp:author_email></wp:author>
+  <item>
+    <title>Hardening SSH</title>
+    <dc:creator>jdoe</dc:creator>
+    <content:encoded><![CDATA[<p>Disable password logins on every server.</p>]]></content:encoded>
+    <excerpt:encoded><![CDATA[Lock down SSH]]></excerpt:encoded>
+    <wp:post_name>hardening-ssh</wp:post_name>
+    <wp:post_date_gmt>2024-03-05 10:00:00</wp:post_date_gmt>
+    <wp:status>publish</wp:status>
+    <wp:post_type>post</wp:post_type>
+    <category domain="category" nicename="security">Security</category>
+    <category domain="post_tag" nicename="ssh">SSH</category>
+    <category domain="post_tag" nicename="linux">Linux</category>
+  </item>
+  <item>
+    <title>About us</title>
+    <wp:status>publish</wp:status>
+    <wp:post_type>page</wp:post_type>
+  </item>
+  <item>
+    <title>Hardening SSH</title>
+    <dc:creator>someone</dc:creator>
+    <content:encoded><![CDATA[<p>A second take.</p>]]></content:encoded>
+    <wp:post_name>hardening-ssh</wp:post_name>
+    <wp:status>draft</wp:status>
+    <wp:post_type>post</wp:post_type>
+    <category domain="post_tag" nicename="linux">Linux</category>
+  </item>
+  <item>
+    <title>Firewall basics</title>
+    <dc:creator>jdoe</dc:creator>
+    <content:encoded><![CDATA[<p>Default deny.</p>]]></content:encoded>
+    <wp:status>trash</wp:status>
+    <wp:post_type>post</wp:post_type>
+  </item>
+</channel>
+</rss>
+"""
+
+
+class BlogImporterTests(TestCase):
+    """Exports are written in batches; tags, authors and slugs stay consistent across batch boundaries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.importer = User.objects.create_user('importer@example.com', 'Import', 'User', 'password123')
+        cls.writer = User.objects.create_user('writer@example.com', 'Blog', 'Writer', 'password123')
+        cls.default_category = BlogCategory.objects.create(name='General')
+        cls.security = BlogCategory.objects.create(name='Security')
+
+    def run_import(self, data, source, **kwargs):
+        return import_posts(
+            BytesIO(data.encode()), source, default_author=self.importer,
+            default_category=self.default_category, **kwargs
+        )
+
+    def test_wordpress_export(self):
+        result = self.run_import(WXR_EXPORT, 'wordpress', batch_size=1)
+
+        self.assertEqual((result.imported, result.skipped, result.tags_created), (2, 2, 2))
+        first, second = BlogPost.objects.order_by('id')
+        self.assertEqual(
+            (first.slug, first.author, first.category, first.status, first.excerpt),
+            ('hardening-ssh', self.writer, self.security, 'published', 'Lock down SSH')
+        )
+        self.assertEqual(first.published_date.year, 2024)
+        self.assertEqual(first.content_text, 'Disable password logins on every server.')
+        self.assertEqual(set(first.tags.values_list('name', flat=True)), {'SSH', 'Linux'})
+        self.assertTrue(BlogSearchTerm.objects.filter(post=first, term='password').exists())
+
+        # Unknown authors fall back to the importer; the duplicate slug gets a suffix
+        self.assertEqual(
+            (second.slug, second.author, second.category, second.status),
+            ('hardening-ssh-1', self.importer, self.default_category, 'draft')
+        )
+        self.assertEqual(list(second.tags.values_list('name', flat=True)), ['Linux'])
+        self.assertEqual(BlogTag.objects.filter(name='Linux').count(), 1)
+
+    def test_json_export_across_batches(self):
+        records = [
+            {'title': f'Post {i}', 'content': f'<p>Body {i}</p>', 'tags': 'Python, Django' if i % 2 else 'Python',
+             'author': 'writer@example.com', 'category': 'security', 'status': 'published',
+             'published_date': f'2024-0{i + 1}-01'}
+            for i in range(5)
+        ] + [{'title': ''}, 'not a post']
+
+        result = self.run_import(json.dumps(records), 'json', batch_size=2)
+
+        self.assertEqual((result.imported, result.skipped, result.tags_created), (5, 2, 2))
+        posts = list(BlogPost.objects.order_by('id'))
+        self.assertEqual([post.title for post in posts], [f'Post {i}' for i in range(5)])
+        self.assertEqual({post.author_id for post in posts}, {self.writer.pk})
+        self.assertEqual({post.category_id for post in posts}, {self.security.pk})
+        self.assertEqual(BlogTag.objects.get(name='Python').posts.count(), 5)
+        self.assertEqual(BlogTag.objects.get(name='Django').posts.count(), 2)
+        self.assertEqual([timezone.localtime(post.published_date).month for post in posts], [1, 2, 3, 4, 5])
+
+    def test_json_lines_and_dates_not_preserved(self):
+        lines = '\n'.join(json.dumps({'title': f'Line {i}', 'status': 'published', 'date': '2020-01-01'}) for i in range(3))
+
+        result = self.run_import(lines, 'json', batch_size=2, preserve_dates=False)
+
+        self.assertEqual(result.imported, 3)
+        self.assertFalse(BlogPost.objects.filter(published_date__year=2020).exists())
+
+    def test_json_values_split_across_chunks(self):
+        data = json.dumps([{'title': 'Ünïcode ' * 20, 'content': 'x' * 100} for _ in range(3)])
+        values = list(iter_json_values(StringIO(data), chunk_size=7))
+        self.assertEqual(values, json.loads(data))
+
+
+class ConditionalGetTests(TestCase):
+    """Every change a page shows moves its ETag; unchanged pages answer 304"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        cls.category = BlogCategory.objects.create(name='Category')
+        published = timezone.now() - timedelta(days=1)
+        cls.post, cls.other = [
+            BlogPost.objects.create(
+                title=title, author=cls.author, category=cls.category, excerpt='Excerpt',
+                content='<p>Some content</p>', status='published', published_date=published,
+            )
+            for title in ('First', 'Second')
+        ]
+        RelatedPost.objects.create(post=cls.post, related=cls.other, score=1.0)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def api_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        return response['ETag']
+
+    def page(self, etag=None):
+        request = RequestFactory().get(f'/blog/{self.post.slug}/', HTTP_IF_NONE_MATCH=etag or '')
+        request.user = AnonymousUser()
+        with mock.patch.object(BlogPostDetailView, 'render_to_response', return_value=HttpResponse('page')):
+            return BlogPostDetailView.as_view()(request, slug=self.post.slug)
+
+    def test_admin_actions_change_the_list_etag(self):
+        etag = self.api_etag('/api/v1/posts/')
+
+        with mock.patch.object(BlogPostAdmin, 'message_user'):
+            BlogPostAdmin(BlogPost, admin.site).feature_posts(None, BlogPost.objects.filter(pk=self.other.pk))
+        self.assertNotEqual(self.api_etag('/api/v1/posts/'), etag)
+
+    def test_moderation_moves_last_modified(self):
+        commenter = User.objects.create_user('commenter@example.com', 'Comment', 'Er', 'password123')
+        pending = BlogComment.objects.create(post=self.post, author=commenter, content='Hello', is_approved=False)
+        url = f'/api/v1/posts/{self.post.pk}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        with mock.patch('blog.moderation.timezone.now', return_value=timezone.now() + timedelta(minutes=1)):
+            moderate_comments([pending.pk], approve=True)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_post_page_etag_covers_related_posts_and_sidebar(self):
+        response = self.page()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.page(etag).status_code, 304)
+
+        # A related (and adjacent) post is renamed
+        self.other.title = 'Second, revised'
+        self.other.save()
+        response = self.page(etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # A new tag shows up in the sidebar
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogTag.objects.create(name='Python').posts.add(self.other)
+        self.assertEqual(self.page(etag).status_code, 200)
+
+    def test_mixin_without_validators_always_renders(self):
+        self.assertEqual(ConditionalGetMixin().get_list_validators(BlogPost.objects.all()), (None, None))
+        self.assertEqual(ConditionalGetMixin().get_object_validators(self.post), (None, None))
+
+    def test_malformed_or_missing_pk_is_not_found(self):
+        BlogTag.objects.create(name='Python')
+        for url in ('/api/v1/tags/abc/', '/api/v1/categories/abc/', '/api/v1/posts/abc/', '/api/v1/tags/0/'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_deleting_a_row_changes_the_list_validators(self):
+        BlogTag.objects.create(name='Python')
+        BlogTag.objects.create(name='Django')
+        for url, deleted in (
+            ('/api/v1/posts/', BlogPost.objects.filter(pk=self.other.pk)),
+            ('/api/v1/tags/', BlogTag.objects.filter(name='Django')),
+        ):
+            # Lists are validated by their ETag only
+            self.assertFalse(self.client.get(url).has_header('Last-Modified'), url)
+            etag = self.api_etag(url)
+            deleted.delete()
+            self.assertNotEqual(self.api_etag(url), etag, url)
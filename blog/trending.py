@@ -0,0 +1,128 @@
+"""
+Time-decayed trending ranking of blog posts.
+
+Every flush of the buffered view counter also adds the flushed views to
+an hourly ``BlogPostViewBucket`` per post. ``update_trending_scores()``
+(run by the ``update_trending_scores`` command) sums the buckets of the
+trending window with exponential decay::
+
+    score = sum(views * 0.5 ** (age in hours / BLOG_TRENDING_HALF_LIFE_HOURS))
+
+and stores the result in the indexed ``BlogPost.trending_score`` column,
+so ranking by trend is a plain indexed ORDER BY instead of an aggregate
+over the view history. Buckets older than the window are deleted.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.utils import timezone
+
+UPDATE_CHUNK_SIZE = 500
+
+
+def get_half_life_hours():
+    return getattr(settings, 'BLOG_TRENDING_HALF_LIFE_HOURS', 24)
+
+
+def get_window_hours():
+    return getattr(settings, 'BLOG_TRENDING_WINDOW_HOURS', 24 * 7)
+
+
+def get_update_interval():
+    return getattr(settings, 'BLOG_TRENDING_UPDATE_INTERVAL', 900)
+
+
+def current_hour(now=None):
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def add_views_to_buckets(pending, now=None):
+    """
+    Add {post_id: views} to the posts' buckets for the current hour.
+
+    Called inside the view counter's flush transaction: existing buckets are
+    bumped with one UPDATE and only missing ones are inserted. If a
+    concurrent flush inserts the same bucket first, the unique constraint
+    rolls the whole flush back and its views stay buffered for the next one.
+    """
+    from .models import BlogPostViewBucket
+
+    if not pending:
+        return
+    hour = current_hour(now)
+    buckets = BlogPostViewBucket.objects.filter(hour=hour, post_id__in=list(pending))
+    increment = Case(
+        *[When(post_id=post_id, then=Value(views)) for post_id, views in pending.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    updated = buckets.update(views=F('views') + increment)
+    if updated == len(pending):
+        return
+
+    existing = set(buckets.values_list('post_id', flat=True)) if updated else set()
+    BlogPostViewBucket.objects.bulk_create([
+        BlogPostViewBucket(post_id=post_id, hour=hour, views=views)
+        for post_id, views in pending.items() if post_id not in existing
+    ])
+
+
+def decay_factor(age_hours, half_life_hours):
+    return 0.5 ** (age_hours / half_life_hours)
+
+
+def compute_trending_scores(now=None):
+    """Return {post_id: decayed score} from the buckets inside the window"""
+    from .models import BlogPostViewBucket
+
+    now = now or timezone.now()
+    half_life = get_half_life_hours()
+    since = current_hour(now) - timedelta(hours=get_window_hours())
+
+    scores = {}
+    buckets = BlogPostViewBucket.objects.filter(hour__gte=since).values_list('post_id', 'hour', 'views')
+    for post_id, hour, views in buckets.iterator():
+        # Buckets are aged from the middle of their hour
+        age_hours = max((now - hour).total_seconds() / 3600 - 0.5, 0)
+        scores[post_id] = scores.get(post_id, 0) + views * decay_factor(age_hours, half_life)
+    return scores
+
+
+def update_trending_scores(now=None):
+    """
+    Recompute ``trending_score`` for every post with views in the window,
+    reset it for posts that dropped out and prune old buckets.
+    Returns the number of trending posts.
+    """
+    from .models import BlogPost, BlogPostViewBucket
+
+    now = now or timezone.now()
+    scores = {post_id: round(score, 4) for post_id, score in compute_trending_scores(now).items()}
+
+    with transaction.atomic():
+        BlogPost.objects.filter(trending_score__gt=0).exclude(pk__in=list(scores)).update(trending_score=0)
+
+        post_ids = list(scores)
+        for start in range(0, len(post_ids), UPDATE_CHUNK_SIZE):
+            chunk = post_ids[start:start + UPDATE_CHUNK_SIZE]
+            BlogPost.objects.filter(pk__in=chunk).update(trending_score=Case(
+                *[When(pk=post_id, then=Value(scores[post_id])) for post_id in chunk],
+                default=Value(0.0),
+                output_field=FloatField(),
+            ))
+
+        BlogPostViewBucket.objects.filter(
+            hour__lt=current_hour(now) - timedelta(hours=get_window_hours())
+        ).delete()
+
+    return len(scores)
+
+
+def trending_posts(queryset=None):
+    """Published posts with a trending score, best first (served by the index)"""
+    from .models import BlogPost
+
+    queryset = BlogPost.objects.all() if queryset is None else queryset
+    return queryset.filter(status='published', trending_score__gt=0).order_by('-trending_score', '-id')
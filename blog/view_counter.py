@@ -0,0 +1,179 @@
+"""
+Buffered (write-behind) view counter for blog posts.
+
+Views are accumulated in the cache and written to ``BlogPost.views_count``
+with a single batched UPDATE by the ``flush_view_counts --loop`` worker, so
+a popular post no longer turns into a hot, locked row and no request ever
+waits on (or fails with) a flush. The same flush adds the views to the
+hourly buckets behind the trending ranking (see blog.trending).
+
+The first view of a post after a flush appends its id to a dirty log (an
+``incr``-numbered run of slot keys), so a flush only reads the posts that
+were actually viewed. Flushes hold a mutex, so two of them never write the
+same pending views.
+
+A local-memory cache is private to each process, so the worker would never
+see the buffer. With such a cache every process flushes its own views once
+per interval, after finishing the request that found the flush due.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+PENDING_KEY = 'blog:views:pending:{}'
+DIRTY_KEY = 'blog:views:dirty:{}'
+DIRTY_LOG_INDEX_KEY = 'blog:views:dirty-log:index'
+DIRTY_LOG_CURSOR_KEY = 'blog:views:dirty-log:cursor'
+DIRTY_LOG_SLOT_KEY = 'blog:views:dirty-log:{}'
+FLUSH_MUTEX_KEY = 'blog:views:flushing'
+FLUSH_DUE_KEY = 'blog:views:flushed-recently'
+FLUSH_MUTEX_TIMEOUT = 300
+FLUSH_CHUNK_SIZE = 500
+# A post whose log slot got lost is logged again on its first view after this
+DIRTY_TIMEOUT = 60 * 60 * 24
+
+
+def get_flush_interval():
+    """Seconds between two flushes of the pending view counts"""
+    return getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', 60)
+
+
+def buffer_is_local():
+    """Whether the buffer lives in this process only, out of the worker's sight"""
+    return isinstance(caches['default'], LocMemCache)
+
+
+def flush_if_due():
+    """Flush a process-local buffer once per interval; a failed flush is retried next interval"""
+    if not buffer_is_local():
+        return None
+    try:
+        if cache.add(FLUSH_DUE_KEY, 1, timeout=get_flush_interval()):
+            return flush_view_counts()
+    except Exception as e:
+        print(f"Failed to flush view counts: {e}")
+    return None
+
+
+def record_view(post_id):
+    """Buffer one view of a post; a view that cannot be buffered is dropped"""
+    try:
+        _incr(PENDING_KEY.format(post_id))
+        mark_dirty(post_id)
+    except Exception as e:
+        print(f"Failed to record view of post {post_id}: {e}")
+
+
+def _incr(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key was evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def mark_dirty(post_id):
+    """Append a post to the dirty log unless it is already waiting for a flush"""
+    if cache.add(DIRTY_KEY.format(post_id), 1, timeout=DIRTY_TIMEOUT):
+        slot = _incr(DIRTY_LOG_INDEX_KEY)
+        cache.set(DIRTY_LOG_SLOT_KEY.format(slot), post_id, timeout=None)
+
+
+def take_dirty_post_ids():
+    """
+    Consume the dirty log and return the ids of the posts viewed since the
+    last flush. Their dirty marks are dropped first, so a view recorded
+    while the flush runs logs the post again for the next one.
+    """
+    cursor = cache.get(DIRTY_LOG_CURSOR_KEY, 0)
+    last = cache.get(DIRTY_LOG_INDEX_KEY, 0)
+    if last < cursor:
+        # The index was evicted and restarted
+        cursor = 0
+
+    post_ids = set()
+    for start in range(cursor + 1, last + 1, FLUSH_CHUNK_SIZE):
+        slots = [DIRTY_LOG_SLOT_KEY.format(slot) for slot in range(start, min(start + FLUSH_CHUNK_SIZE, last + 1))]
+        post_ids.update(cache.get_many(slots).values())
+        cache.delete_many(slots)
+    cache.set(DIRTY_LOG_CURSOR_KEY, last, timeout=None)
+    cache.delete_many([DIRTY_KEY.format(post_id) for post_id in post_ids])
+    return post_ids
+
+
+def get_pending_views(post_ids):
+    """Return {post_id: pending views} for the given posts"""
+    keys = {PENDING_KEY.format(post_id): post_id for post_id in post_ids}
+    values = cache.get_many(list(keys))
+    return {keys[key]: count for key, count in values.items() if count}
+
+
+def apply_pending_views(posts):
+    """Add the not yet flushed views to ``views_count`` of the given posts"""
+    posts = list(posts)
+    pending = get_pending_views([post.pk for post in posts])
+    for post in posts:
+        post.views_count += pending.get(post.pk, 0)
+    return posts
+
+
+def flush_view_counts(post_ids=None):
+    """
+    Write the pending view counts of the dirty posts (or of ``post_ids``)
+    to the database with one UPDATE.
+
+    Only the amounts that were read are subtracted from the buffer, so views
+    recorded while the flush runs are kept for the next interval.
+    Returns the number of views written, or None if another flush is running.
+    """
+    if not cache.add(FLUSH_MUTEX_KEY, 1, timeout=FLUSH_MUTEX_TIMEOUT):
+        return None
+    try:
+        return _flush_view_counts(post_ids)
+    finally:
+        cache.delete(FLUSH_MUTEX_KEY)
+
+
+def _flush_view_counts(post_ids):
+    from .models import BlogPost
+    from .trending import add_views_to_buckets
+
+    logged = post_ids is None
+    post_ids = list(take_dirty_post_ids() if logged else post_ids)
+
+    pending = {}
+    for start in range(0, len(post_ids), FLUSH_CHUNK_SIZE):
+        pending.update(get_pending_views(post_ids[start:start + FLUSH_CHUNK_SIZE]))
+
+    if not pending:
+        return 0
+
+    increment = Case(
+        *[When(pk=post_id, then=Value(count)) for post_id, count in pending.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    try:
+        with transaction.atomic():
+            BlogPost.objects.filter(pk__in=list(pending)).update(
+                views_count=F('views_count') + increment
+            )
+            add_views_to_buckets(pending)
+    except Exception:
+        # The views are still buffered; log the posts again for the next flush
+        if logged:
+            for post_id in pending:
+                mark_dirty(post_id)
+        raise
+
+    for post_id, count in pending.items():
+        try:
+            cache.decr(PENDING_KEY.format(post_id), count)
+        except ValueError:
+            pass
+
+    return sum(pending.values())
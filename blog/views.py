@@ -6,15 +6,14 @@ from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView
 )
 from django.http import JsonResponse, HttpResponseForbidden
-from django.core.paginator import Paginator
 from django.db.models import Q, Count, F
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.db import models
+from datetime import date
 
 from .models import (
     BlogPost, BlogCategory, BlogComment, BlogTag, Newsletter,
@@ -24,31 +23,45 @@ from .forms import (
     BlogPostForm, BlogCommentForm, ContactForm, NewsletterForm,
     FAQForm, TestimonialForm, BlogSearchForm
 )
-from accounts.models import UserNotification
+from .view_counter import record_view, apply_pending_views
+from .search import search_posts, get_snippets
+from .comment_tree import load_comment_tree
+from .related import get_related_posts
+from .sidebar import get_sidebar
+from .archive import archive_filter, get_archive_months
+from .commenting import post_comment
+from .newsletter import set_interests
+from .conditional import annotate_comment_state, post_validators, posts_state, sidebar_state
+from core.conditional import respond_conditionally
+from core.pagination import KeysetPaginationMixin, get_page
+from core.rendering import render_rich_text, render_rich_text_many
+from core.mail import queue_mail
 from dashboard.models import UserActivity
 
-class BlogPostListView(ListView):
+class BlogPostListView(KeysetPaginationMixin, ListView):
     """List all published blog posts"""
     model = BlogPost
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     paginate_by = 10
     
+    # Keyset ordering for each sort option; the last key breaks ties.
+    # Counters change while a reader pages, so those sorts use page numbers.
+    SORT_KEYSETS = {
+        '-published_date': ('-published_date', '-id'),
+        'published_date': ('published_date', 'id'),
+        '-views_count': None,
+        '-trending_score': None,
+        'title': ('title', 'id'),
+        '-title': ('-title', '-id'),
+    }
+    
     def get_queryset(self):
         queryset = BlogPost.objects.filter(
             status='published',
             published_date__lte=timezone.now()
         ).select_related('author', 'category').prefetch_related('tags')
         
-        # Search functionality
-        search_query = self.request.GET.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(content__icontains=search_query) |
-                Q(excerpt__icontains=search_query)
-            )
-        
         # Filter by category
         category_slug = self.request.GET.get('category')
         if category_slug:
@@ -66,36 +79,35 @@ class BlogPostListView(ListView):
         
         # Sorting
         sort_by = self.request.GET.get('sort', '-published_date')
-        if sort_by in ['-published_date', 'published_date', '-views_count', 'title', '-title']:
-            queryset = queryset.order_by(sort_by)
+        sort_allowed = sort_by in self.SORT_KEYSETS
+        if sort_allowed:
+            queryset = queryset.order_by(sort_by, '-id')
+        
+        # Search functionality (relevance order unless a sort was requested)
+        search_query = self.request.GET.get('search')
+        if search_query:
+            queryset = search_posts(search_query, queryset)
+            if sort_allowed and 'sort' in self.request.GET:
+                queryset = queryset.order_by(sort_by, '-id')
         
         return queryset
     
+    def get_keyset_ordering(self):
+        # Relevance-ranked search results are paginated by offset
+        if self.request.GET.get('search') and 'sort' not in self.request.GET:
+            return None
+        return self.SORT_KEYSETS.get(self.request.GET.get('sort', '-published_date'))
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Featured posts
-        context['featured_posts'] = BlogPost.objects.filter(
-            status='published',
-            is_featured=True,
-            published_date__lte=timezone.now()
-        )[:3]
-        
-        # Categories
-        context['categories'] = BlogCategory.objects.filter(is_active=True).annotate(
-            post_count=Count('posts', filter=Q(posts__status='published'))
-        )
-        
-        # Popular tags
-        context['popular_tags'] = BlogTag.objects.annotate(
-            post_count=Count('posts', filter=Q(posts__status='published'))
-        ).filter(post_count__gt=0).order_by('-post_count')[:10]
+        # Featured posts, categories, popular tags and recent posts (cached)
+        context.update(get_sidebar())
         
-        # Recent posts sidebar
-        context['recent_posts'] = BlogPost.objects.filter(
-            status='published',
-            published_date__lte=timezone.now()
-        ).order_by('-published_date')[:5]
+        # Highlighted snippets for search results
+        search_query = self.request.GET.get('search')
+        if search_query:
+            context['search_snippets'] = get_snippets(context['posts'], search_query)
         
         # Current filters
         context['current_filters'] = {
@@ -115,7 +127,9 @@ class BlogPostDetailView(DetailView):
     context_object_name = 'post'
     
     def get_queryset(self):
-        queryset = BlogPost.objects.select_related('author', 'category').prefetch_related('tags')
+        queryset = annotate_comment_state(
+            BlogPost.objects.select_related('author', 'category').prefetch_related('tags')
+        )
         
         # Allow authors and staff to view unpublished posts
         if self.request.user.is_authenticated and (
@@ -130,53 +144,79 @@ class BlogPostDetailView(DetailView):
             published_date__lte=timezone.now()
         )
     
-    def get_object(self):
-        post = super().get_object()
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
         
-        # Increment view count
-        BlogPost.objects.filter(pk=post.pk).update(views_count=F('views_count') + 1)
-        post.refresh_from_db()
+        # Buffer the view, also for 304 responses; it is written to the
+        # database by the periodic flush
+        record_view(self.object.pk)
         
-        return post
+        # Loaded before the check, as the page shows them too
+        self.related_posts = get_related_posts(self.object, limit=4)
+        self.previous_post, self.next_post = self.get_adjacent_posts(self.object)
+        self.sidebar = get_sidebar()
+        
+        # The page shows the comment form and the user's menu
+        etag, _ = post_validators(
+            self.object, request.user.pk,
+            posts_state(self.related_posts + [self.previous_post, self.next_post]),
+            sidebar_state(self.sidebar)
+        )
+        
+        def render():
+            apply_pending_views([self.object])
+            return self.render_to_response(self.get_context_data(object=self.object))
+        
+        # The sidebar counts have no modification date, so the page is
+        # validated by its ETag only
+        return respond_conditionally(request, etag, None, render)
+    
+    def get_adjacent_posts(self, post):
+        """Previous and next posts, by the (status, published_date, id) index"""
+        if not post.published_date:
+            return None, None
+        published = BlogPost.objects.filter(
+            status='published',
+            published_date__lte=timezone.now()
+        )
+        previous_post = published.filter(
+            Q(published_date__lt=post.published_date) |
+            Q(published_date=post.published_date, id__lt=post.id)
+        ).order_by('-published_date', '-id').first()
+        next_post = published.filter(
+            Q(published_date__gt=post.published_date) |
+            Q(published_date=post.published_date, id__gt=post.id)
+        ).order_by('published_date', 'id').first()
+        return previous_post, next_post
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         post = self.object
         
-        # Comments
-        comments = BlogComment.objects.filter(
-            post=post,
-            parent__isnull=True,
-            is_approved=True
-        ).select_related('author').order_by('-created_at')
+        # Comments: the newest approved threads in two queries, shown newest first
+        comments, truncated = load_comment_tree(post)
         
-        context['comments'] = comments
+        context['comments'] = comments[::-1]
+        context['comments_truncated'] = truncated
+        # Every approved comment, including ones the tree does not show
         context['comments_count'] = BlogComment.objects.filter(
             post=post,
             is_approved=True
         ).count()
         
+        # Rewritten content (lazy images, srcset), cached per post version
+        context['content_html'] = render_rich_text(post, 'content')
+        
         # Comment form
         if self.request.user.is_authenticated:
             context['comment_form'] = BlogCommentForm()
         
-        # Related posts
-        context['related_posts'] = BlogPost.objects.filter(
-            category=post.category,
-            status='published',
-            published_date__lte=timezone.now()
-        ).exclude(id=post.id)[:4]
-        
-        # Previous and next posts
-        context['previous_post'] = BlogPost.objects.filter(
-            status='published',
-            published_date__lt=post.published_date
-        ).order_by('-published_date').first()
-        
-        context['next_post'] = BlogPost.objects.filter(
-            status='published',
-            published_date__gt=post.published_date
-        ).order_by('published_date').first()
+        # Related posts (precomputed by blog.related), adjacent posts and
+        # the sidebar, loaded by get()
+        context['related_posts'] = self.related_posts
+        context['previous_post'] = self.previous_post
+        context['next_post'] = self.next_post
+        context.update(self.sidebar)
         
         return context
 
@@ -201,8 +241,9 @@ class BlogCategoryView(ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(get_sidebar())
         context['category'] = self.category
-        context['all_categories'] = BlogCategory.objects.filter(is_active=True)
+        context['all_categories'] = context['categories']
         return context
 
 class BlogTagView(ListView):
@@ -222,6 +263,7 @@ class BlogTagView(ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(get_sidebar())
         context['tag'] = self.tag
         return context
 
@@ -337,26 +379,8 @@ def add_comment(request, post_slug):
             except BlogComment.DoesNotExist:
                 pass
         
-        comment.save()
-        
-        # Notify post author
-        if post.author != request.user:
-            UserNotification.objects.create(
-                user=post.author,
-                title='New Comment on Your Post',
-                message=f'{request.user.get_full_name()} commented on "{post.title}"',
-                notification_type='comment'
-            )
-        
-        # Award points for commenting
-        request.user.add_points(5)
-        
-        # Log activity
-        UserActivity.objects.create(
-            user=request.user,
-            activity_type='comment',
-            description=f'Commented on blog post: {post.title}'
-        )
+        # Points, activity and notifications are applied once, in the same transaction
+        post_comment(comment)
         
         return JsonResponse({
             'success': True,
@@ -384,7 +408,7 @@ def contact_view(request):
             
             # Send notification email to admin
             try:
-                send_mail(
+                queue_mail(
                     subject=f'New Contact Message: {contact_message.get_subject_display()}',
                     message=f'''
                     New contact message received:
@@ -399,10 +423,10 @@ def contact_view(request):
                     ''',
                     from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[settings.DEFAULT_FROM_EMAIL],
-                    fail_silently=True,
+                    reply_to=[contact_message.email],
                 )
             except Exception as e:
-                print(f"Failed to send contact notification email: {e}")
+                print(f"Failed to queue contact notification email: {e}")
             
             messages.success(request, 'Thank you for your message! We\'ll get back to you soon.')
             return redirect('blog:contact')
@@ -410,7 +434,9 @@ def contact_view(request):
         form = ContactForm()
     
     # Get FAQs
-    faqs = FAQ.objects.filter(is_active=True).order_by('category', 'order')
+    faqs = render_rich_text_many(
+        FAQ.objects.filter(is_active=True).order_by('category', 'order'), 'answer'
+    )
     faq_categories = {}
     for faq in faqs:
         category = faq.get_category_display()
@@ -446,11 +472,12 @@ def newsletter_signup(request):
             })
         
         # Create newsletter subscription
-        Newsletter.objects.create(email=email, name=name)
+        subscriber = Newsletter.objects.create(email=email, name=name)
+        set_interests(subscriber, request.POST.getlist('interests'))
         
         # Send welcome email
         try:
-            send_mail(
+            queue_mail(
                 subject='Welcome to Debsploit Solutions Newsletter!',
                 message=f'''
                 Hi {name or "there"},
@@ -466,10 +493,9 @@ def newsletter_signup(request):
                 ''',
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[email],
-                fail_silently=True,
             )
         except Exception as e:
-            print(f"Failed to send newsletter welcome email: {e}")
+            print(f"Failed to queue newsletter welcome email: {e}")
         
         return JsonResponse({
             'success': True,
@@ -497,19 +523,15 @@ def blog_search(request):
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    posts = BlogPost.objects.filter(
-        Q(title__icontains=query) |
-        Q(content__icontains=query) |
-        Q(excerpt__icontains=query),
-        status='published',
-        published_date__lte=timezone.now()
-    ).select_related('author', 'category')[:10]
+    posts = list(search_posts(query, limit=10).select_related('author', 'category'))
+    snippets = get_snippets(posts, query)
     
     results = [
         {
             'id': post.id,
             'title': post.title,
             'excerpt': post.excerpt,
+            'snippet': snippets.get(post.id, ''),
             'author': post.author.get_full_name(),
             'category': post.category.name,
             'published_date': post.published_date.strftime('%B %d, %Y'),
@@ -532,32 +554,34 @@ def archive_view(request):
         published_date__lte=timezone.now()
     ).select_related('author', 'category')
     
-    if year:
-        posts = posts.filter(published_date__year=year)
-    if month:
-        posts = posts.filter(published_date__month=month)
-    
-    posts = posts.order_by('-published_date')
+    # Filter by indexed date ranges rather than __year/__month
+    year = _parse_int(year, 1, 9998)
+    month = _parse_int(month, 1, 12)
+    posts = posts.filter(archive_filter(year, month))
     
     # Pagination
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page(request, posts, ('-published_date', '-id'), 10)
     
-    # Archive dates for sidebar
-    archive_dates = BlogPost.objects.filter(
-        status='published'
-    ).dates('published_date', 'month', order='DESC')
+    # Archive months for sidebar, from the maintained rollup
+    archive_months = get_archive_months()
     
     context = {
         'posts': page_obj,
-        'archive_dates': archive_dates,
+        'archive_months': archive_months,
+        'archive_dates': [date(row.year, row.month, 1) for row in archive_months],
         'current_year': year,
         'current_month': month,
     }
     
     return render(request, 'blog/archive.html', context)
 
+def _parse_int(value, minimum, maximum):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if minimum <= value <= maximum else None
+
 def author_posts(request, author_id):
     """List posts by a specific author"""
     from django.contrib.auth import get_user_model
@@ -569,17 +593,16 @@ def author_posts(request, author_id):
         author=author,
         status='published',
         published_date__lte=timezone.now()
-    ).select_related('category').order_by('-published_date')
+    ).select_related('category')
     
     # Pagination
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page(request, posts, ('-published_date', '-id'), 10)
     
     # Author stats
+    totals = posts.aggregate(total_posts=Count('id'), total_views=models.Sum('views_count'))
     author_stats = {
-        'total_posts': posts.count(),
-        'total_views': posts.aggregate(total_views=models.Sum('views_count'))['total_views'] or 0,
+        'total_posts': totals['total_posts'],
+        'total_views': totals['total_views'] or 0,
         'member_since': author.date_joined,
     }
     
@@ -3,9 +3,10 @@ from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.urls import reverse
 from django.db.models import Count
+from django.utils import timezone
 from .models import (
     SiteSettings, HeroSection, CompanyStatistic, PageContent,
-    TeamMember, Announcement, SiteAnalytics, EmailTemplate
+    TeamMember, Announcement, SiteAnalytics, EmailTemplate, OutboundEmail, ImageVariant
 )
 
 @admin.register(SiteSettings)
@@ -237,6 +238,41 @@ class EmailTemplateAdmin(admin.ModelAdmin):
             return ['template_type']
         return []
 
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'to']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'sent_at']
+    date_hierarchy = 'created_at'
+    
+    actions = ['retry_now']
+    
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+    recipients.short_description = 'To'
+    
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(
+            status='queued', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} emails queued for another attempt.')
+    retry_now.short_description = "Retry selected emails now"
+
+@admin.register(ImageVariant)
+class ImageVariantAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'widths', 'created_at', 'generated_at']
+    list_filter = ['status']
+    search_fields = ['name']
+    readonly_fields = ['widths', 'created_at', 'generated_at']
+    
+    actions = ['regenerate']
+    
+    def regenerate(self, request, queryset):
+        updated = queryset.update(status='pending')
+        self.message_user(request, f'{updated} images queued for variant generation.')
+    regenerate.short_description = "Regenerate variants of selected images"
+
 # Custom admin site branding
 admin.site.site_header = "Debsploit Solutions Administration"
 admin.site.site_title = "Debsploit Admin"
@@ -0,0 +1,105 @@
+"""
+Conditional GET for views and API endpoints.
+
+A view computes cheap validators first, an ETag and a Last-Modified date
+derived from ``updated_at`` columns. Lists only get an ETag, over the
+newest ``updated_at`` plus the row count: deleting a row changes the
+count but moves no date. ``respond_conditionally()``
+answers a matching ``If-None-Match`` or ``If-Modified-Since`` with
+304 Not Modified and only renders or serializes the response otherwise.
+Side effects such as recording a view belong before the check.
+"""
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """ETag value over the parts that determine a response's content"""
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def latest(*dates):
+    """Newest of the given datetimes, ignoring missing ones"""
+    dates = [date for date in dates if date]
+    return max(dates) if dates else None
+
+
+def queryset_state(queryset, **extra):
+    """
+    Newest ``updated_at``, row count and any ``extra`` aggregates of a
+    queryset, in one query.
+    """
+    return queryset.order_by().aggregate(
+        last_modified=Max('updated_at'),
+        count=Count('pk', distinct=True),
+        **extra
+    )
+
+
+def _timestamp(last_modified):
+    return timegm(last_modified.utctimetuple()) if last_modified else None
+
+
+def respond_conditionally(request, etag, last_modified, render):
+    """
+    Return 304 if the client's copy is current, else ``render()``.
+    Either response carries the validators.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return render()
+
+    etag = quote_etag(etag) if etag else None
+    timestamp = _timestamp(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = render()
+
+    if response.status_code in (200, 304):
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        if timestamp and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin answering conditional ``list`` and ``retrieve`` requests
+    before serialization. Subclasses override ``get_list_validators()``
+    and ``get_object_validators()``, returning ``(etag, last_modified)``;
+    without validators the response is always rendered. The object is
+    looked up first, so a missing or malformed pk is a 404.
+    """
+
+    def get_list_validators(self, queryset):
+        return None, None
+
+    def get_object_validators(self, instance):
+        return None, None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.get_list_validators(queryset)
+
+        def render():
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+
+        return respond_conditionally(request, etag, last_modified, render)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validators(instance)
+        return respond_conditionally(
+            request, etag, last_modified,
+            lambda: Response(self.get_serializer(instance).data)
+        )
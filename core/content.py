@@ -0,0 +1,204 @@
+"""
+One-pass processing of rich-text (CKEditor) HTML.
+
+``sanitize_html()`` cleans untrusted HTML with nh3 (the ammonia sanitizer)
+against an allowlist of tags, attributes, URL schemes and style
+properties. ``process_html()`` parses the sanitized HTML once and returns
+everything the site derives from it: the HTML with anchor ids on headings,
+the plain text, word count, reading time, first paragraph and the headings
+for a table of contents. Models store the derived values when they are
+saved; the stored HTML stays as written and is sanitized when it is
+rendered (see core.rendering).
+"""
+from dataclasses import dataclass, field
+from html import escape
+from html.parser import HTMLParser
+
+import nh3
+from django.utils.safestring import mark_safe
+from django.utils.text import slugify
+
+WORDS_PER_MINUTE = 200
+FIRST_PARAGRAPH_MIN_LENGTH = 20
+TOC_LEVELS = ('h2', 'h3', 'h4')
+
+ALLOWED_TAGS = nh3.ALLOWED_TAGS | {'section'}
+ALLOWED_ATTRIBUTES = {
+    **{tag: set(names) for tag, names in nh3.ALLOWED_ATTRIBUTES.items()},
+    '*': {'id', 'class', 'title', 'style', 'lang', 'dir'},
+    'a': {'href', 'hreflang', 'name', 'target'},
+    'table': {'align', 'border', 'cellpadding', 'cellspacing', 'summary', 'width'},
+}
+ALLOWED_URL_SCHEMES = {'http', 'https', 'mailto', 'tel'}
+ALLOWED_STYLE_PROPERTIES = {
+    'text-align', 'float', 'width', 'height', 'margin', 'margin-left', 'margin-right',
+    'margin-top', 'margin-bottom', 'vertical-align', 'color', 'background-color',
+    'font-weight', 'font-style', 'text-decoration',
+}
+VOID_TAGS = frozenset([
+    'area', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr',
+])
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption',
+    'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p',
+    'pre', 'section', 'table', 'td', 'th', 'tr', 'ul',
+])
+
+
+def sanitize_html(value):
+    """Untrusted rich-text HTML reduced to the allowed tags, attributes and URLs"""
+    return nh3.clean(
+        str(value or ''),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes=ALLOWED_URL_SCHEMES,
+        filter_style_properties=ALLOWED_STYLE_PROPERTIES,
+    )
+
+
+@dataclass
+class ProcessedContent:
+    html: str = ''
+    text: str = ''
+    word_count: int = 0
+    first_paragraph: str = ''
+    headings: list = field(default_factory=list)
+
+    @property
+    def reading_time(self):
+        """Minutes, rounded, at least one"""
+        return max(1, round(self.word_count / WORDS_PER_MINUTE))
+
+    def excerpt(self, length=300):
+        """First paragraph (or the start of the text) cut at a word boundary"""
+        source = self.first_paragraph or self.text
+        return truncate_text(source, length)
+
+
+def truncate_text(text, length):
+    if len(text) <= length:
+        return text
+    cut = text[:length - 3].rsplit(' ', 1)[0]
+    return f"{cut}..."
+
+
+class _ContentParser(HTMLParser):
+    """Walks sanitized HTML, adding heading anchors and collecting the text"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.text = []
+        self.headings = []
+        self.first_paragraph = ''
+        self._heading = None  # (tag, output index, attrs, text parts)
+        self._paragraph = None
+        self._used_ids = set()
+
+    # Output helpers
+
+    def _start_tag(self, tag, attrs, closed=False):
+        parts = [tag]
+        for name, value in attrs:
+            if value is None:
+                parts.append(name)
+            else:
+                parts.append(f'{name}="{escape(value, quote=True)}"')
+        return f"<{' '.join(parts)}{' /' if closed else ''}>"
+
+    def _unique_id(self, title):
+        base = slugify(title) or 'section'
+        candidate, counter = base, 1
+        while candidate in self._used_ids:
+            counter += 1
+            candidate = f"{base}-{counter}"
+        self._used_ids.add(candidate)
+        return candidate
+
+    # Parser callbacks
+
+    def handle_starttag(self, tag, attrs, closed=False):
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag in TOC_LEVELS and self._heading is None:
+            self._heading = (tag, len(self.output), attrs, [])
+        if tag == 'p' and self._paragraph is None and not self.first_paragraph:
+            self._paragraph = []
+        self.output.append(self._start_tag(tag, attrs, closed))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, closed=True)
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if self._heading and tag == self._heading[0]:
+            heading_tag, index, attrs, parts = self._heading
+            title = ' '.join(''.join(parts).split())
+            anchor = dict(attrs).get('id')
+            if anchor:
+                self._used_ids.add(anchor)
+            else:
+                anchor = self._unique_id(title)
+                attrs = attrs + [('id', anchor)]
+                self.output[index] = self._start_tag(heading_tag, attrs)
+            if title:
+                self.headings.append({'level': int(heading_tag[1]), 'id': anchor, 'title': title})
+            self._heading = None
+        if tag == 'p' and self._paragraph is not None:
+            paragraph = ' '.join(''.join(self._paragraph).split())
+            if len(paragraph) > FIRST_PARAGRAPH_MIN_LENGTH:
+                self.first_paragraph = paragraph
+            self._paragraph = None
+        if tag not in VOID_TAGS:
+            self.output.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        self.output.append(escape(data, quote=False))
+        self.text.append(data)
+        if self._heading:
+            self._heading[3].append(data)
+        if self._paragraph is not None:
+            self._paragraph.append(data)
+
+
+def process_html(value):
+    """Sanitize rich-text HTML, parse it once and return a ``ProcessedContent``"""
+    if not value:
+        return ProcessedContent()
+
+    parser = _ContentParser()
+    parser.feed(sanitize_html(value))
+    parser.close()
+
+    text = ' '.join(''.join(parser.text).split())
+    return ProcessedContent(
+        html=''.join(parser.output),
+        text=text,
+        word_count=len(text.split()),
+        first_paragraph=parser.first_paragraph,
+        headings=parser.headings,
+    )
+
+
+def build_toc(headings):
+    """Nested ``<ul>`` table of contents for stored headings"""
+    if not headings:
+        return ''
+    parts = []
+    levels = []
+    for heading in headings:
+        level = heading['level']
+        if not levels or level > levels[-1]:
+            parts.append('<ul>')
+            levels.append(level)
+        else:
+            parts.append('</li>')
+            while len(levels) > 1 and level < levels[-1]:
+                parts.append('</ul></li>')
+                levels.pop()
+        parts.append(f'<li><a href="#{escape(heading["id"])}">{escape(heading["title"])}</a>')
+    parts.append('</li>')
+    parts.append('</ul></li>' * (len(levels) - 1))
+    parts.append('</ul>')
+    return mark_safe(''.join(parts))
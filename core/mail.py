@@ -0,0 +1,153 @@
+"""
+Outbound email queue.
+
+``queue_mail()`` takes the same arguments as ``send_mail()`` but only
+stores an ``OutboundEmail`` row, inside the caller's transaction, so views
+and signals never wait on SMTP. The ``send_queued_mail`` command drains the
+queue: due messages are claimed a batch at a time, sent over one
+connection and failures are retried with exponential backoff until
+``OUTBOX_MAX_ATTEMPTS`` is reached.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def get_batch_size():
+    return getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+
+
+def get_max_attempts():
+    return getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def get_retry_delay():
+    return getattr(settings, 'OUTBOX_RETRY_DELAY', 60)
+
+
+def get_claim_timeout():
+    return getattr(settings, 'OUTBOX_CLAIM_TIMEOUT', 5 * 60)
+
+
+def queue_mail(subject, message, recipient_list, from_email=None, html_message=None, reply_to=None):
+    """Queue an email for the worker; returns the ``OutboundEmail``"""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+        reply_to=list(reply_to or []),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt: the base delay doubled per failure, capped at a day"""
+    return timedelta(seconds=min(get_retry_delay() * 2 ** (attempts - 1), 60 * 60 * 24))
+
+
+def build_message(email, connection=None):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        reply_to=email.reply_to or None,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def record_failure(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to ``batch_size`` due messages for this worker.
+
+    The rows are locked (``skip_locked``) only long enough to push their
+    ``next_attempt_at`` past the claim timeout, so other workers pass over
+    them while they are sent outside the transaction, and a worker that
+    dies leaves them due again once the claim expires.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if emails:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now + timedelta(seconds=get_claim_timeout())
+            )
+    return emails
+
+
+def send_queued_batch(batch_size=None, connection=None):
+    """Send one batch of due messages; returns (sent, failed)"""
+    batch_size = batch_size or get_batch_size()
+    max_attempts = get_max_attempts()
+    connection = connection or get_connection()
+    sent = failed = 0
+
+    emails = claim_batch(batch_size)
+    if not emails:
+        return sent, failed
+
+    try:
+        connection.open()
+    except Exception as e:
+        # Mail server unreachable: back off the whole batch
+        print(f"Failed to open mail connection: {e}")
+        for email in emails:
+            record_failure(email, e, max_attempts)
+        failed = len(emails)
+    else:
+        try:
+            for email in emails:
+                try:
+                    connection.send_messages([build_message(email, connection)])
+                except Exception as e:
+                    print(f"Failed to send queued email {email.pk}: {e}")
+                    record_failure(email, e, max_attempts)
+                    failed += 1
+                else:
+                    email.attempts += 1
+                    email.status = 'sent'
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    sent += 1
+        finally:
+            connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+
+    return sent, failed
+
+
+def send_queued_mail(batch_size=None):
+    """Drain every due message; returns (sent, failed)"""
+    connection = get_connection()
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = send_queued_batch(batch_size, connection)
+        if not sent and not failed:
+            return total_sent, total_failed
+        total_sent += sent
+        total_failed += failed
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.rendering import generate_pending_variants
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized variants of queued rich-text images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and check once per interval')
+        parser.add_argument('--interval', type=int, help='Seconds between checks (defaults to RICH_TEXT_VARIANT_POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        interval = options.get('interval') or getattr(settings, 'RICH_TEXT_VARIANT_POLL_INTERVAL', 10)
+
+        while True:
+            processed = generate_pending_variants()
+            if processed or not options.get('loop'):
+                self.stdout.write(self.style.SUCCESS(f'Generated variants for {processed} images'))
+
+            if not options.get('loop'):
+                break
+            time.sleep(interval)
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound email, retrying failed messages with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and check once per interval')
+        parser.add_argument('--interval', type=int, help='Seconds between checks (defaults to OUTBOX_POLL_INTERVAL)')
+        parser.add_argument('--batch-size', type=int, help='Messages sent per connection (defaults to OUTBOX_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        interval = options.get('interval') or getattr(settings, 'OUTBOX_POLL_INTERVAL', 10)
+
+        while True:
+            sent, failed = send_queued_mail(batch_size=options.get('batch_size'))
+            if sent or failed or not options.get('loop'):
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} queued emails, {failed} failed'))
+
+            if not options.get('loop'):
+                break
+            time.sleep(interval)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_outbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name of the original image', max_length=255, unique=True)),
+                ('widths', models.JSONField(blank=True, default=list, help_text='Widths of the variants that exist')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('generating', 'Generating'), ('done', 'Done')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('generated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_imagev_status_4b1311_idx')],
+            },
+        ),
+    ]
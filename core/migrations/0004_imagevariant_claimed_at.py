@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_image_variant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagevariant',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
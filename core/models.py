@@ -333,4 +333,65 @@ class EmailTemplate(models.Model):
         unique_together = ['template_type']
     
     def __str__(self):
-        return f"{self.name} ({self.get_template_type_display()})"
\ No newline at end of file
+        return f"{self.name} ({self.get_template_type_display()})"
+
+
+class OutboundEmail(models.Model):
+    """Queued outgoing email, delivered by the send_queued_mail command"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list, blank=True)
+    
+    # Delivery
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class ImageVariant(models.Model):
+    """Resized copies of a rich-text media image, generated by the generate_image_variants command"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('generating', 'Generating'),
+        ('done', 'Done'),
+    )
+    
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the original image")
+    widths = models.JSONField(default=list, blank=True, help_text="Widths of the variants that exist")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When a worker took the image; a claim older than the timeout means the worker died
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    generated_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return self.name
@@ -0,0 +1,361 @@
+"""
+Keyset (cursor) pagination for querysets, DRF viewsets and HTML list views.
+
+Offset pagination reads and discards every row before the requested page and
+needs a ``COUNT(*)`` for the page links, so deep pages get slower and slower.
+Keyset pagination orders by a stable, unique composite key such as
+``('-published_date', '-id')`` and asks for the rows after the last one shown,
+which the database answers from an index: page N costs the same as page 1.
+
+The position is passed around as an opaque ``?cursor=`` token.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ValidationError as APIValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_QUERY_PARAM = 'cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _parse_ordering(ordering):
+    """Turn ('-published_date', '-id') into [('published_date', True), ('id', True)]"""
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _order_expressions(model, keys, reverse=False):
+    expressions = []
+    for name, descending in keys:
+        expression = F(name).desc if descending != reverse else F(name).asc
+        if not model._meta.get_field(name).null:
+            expressions.append(expression())
+        elif reverse:
+            expressions.append(expression(nulls_first=True))
+        else:
+            # NULLs always come after the values when walking forward
+            expressions.append(expression(nulls_last=True))
+    return expressions
+
+
+def _comes_after(model, name, descending, value, reverse):
+    """Return (Q for rows strictly after ``value``, Q for rows equal to it)"""
+    descending = descending != reverse
+    nullable = model._meta.get_field(name).null
+    nulls_last = not reverse
+
+    if value is None:
+        equal = Q(**{f'{name}__isnull': True})
+        after = Q(pk__in=[]) if nulls_last else Q(**{f'{name}__isnull': False})
+        return after, equal
+
+    lookup = 'lt' if descending else 'gt'
+    after = Q(**{f'{name}__{lookup}': value})
+    if nullable and nulls_last:
+        after |= Q(**{f'{name}__isnull': True})
+    return after, Q(**{name: value})
+
+
+def keyset_filter(queryset, keys, values, reverse=False):
+    """Rows that come after ``values`` in the (possibly reversed) key order"""
+    model = queryset.model
+    condition = Q(pk__in=[])
+    equal_so_far = Q()
+    for (name, descending), value in zip(keys, values):
+        after, equal = _comes_after(model, name, descending, value, reverse)
+        condition |= equal_so_far & after
+        equal_so_far &= equal
+    return queryset.filter(condition)
+
+
+def encode_cursor(values, reverse=False):
+    payload = {'v': [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, keys):
+    """Return (values, reverse) or raise ``InvalidCursor``"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload['v']
+        if len(values) != len(keys):
+            raise ValueError
+        values = [
+            None if value is None else model._meta.get_field(name).to_python(value)
+            for (name, _), value in zip(keys, values)
+        ]
+    except (TypeError, ValueError, KeyError, ValidationError):
+        raise InvalidCursor(token)
+    return values, bool(payload.get('r'))
+
+
+class KeysetPage:
+    """One page of a keyset paginated queryset"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a unique composite ordering, e.g.
+    ``KeysetPaginator(posts, ('-published_date', '-id'), 10).get_page(cursor)``.
+
+    The last key must be unique (normally the primary key) so that rows
+    sharing a timestamp are neither skipped nor repeated.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.keys = _parse_ordering(ordering)
+        self.per_page = int(per_page)
+
+    def _cursor_for(self, obj, reverse=False):
+        return encode_cursor([getattr(obj, name) for name, _ in self.keys], reverse)
+
+    def page(self, cursor=None):
+        """Return the page at ``cursor``; raise ``InvalidCursor`` for a bad token"""
+        model = self.queryset.model
+        queryset = self.queryset
+        values, reverse = None, False
+        if cursor:
+            values, reverse = decode_cursor(cursor, model, self.keys)
+            queryset = keyset_filter(queryset, self.keys, values, reverse)
+
+        queryset = queryset.order_by(*_order_expressions(model, self.keys, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage([])
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor_for(rows[-1]) if has_next else None,
+            previous_cursor=self._cursor_for(rows[0], reverse=True) if has_previous else None,
+        )
+
+    def get_page(self, cursor=None):
+        """Like ``page()``, but fall back to the first page for a bad token"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+def get_page(request, queryset, ordering, per_page):
+    """
+    Paginate for an HTML view: keyset pages by ``?cursor=``, or an offset
+    ``Paginator`` page when an old ``?page=`` link is followed.
+    """
+    if 'page' in request.GET:
+        paginator = Paginator(queryset.order_by(*ordering), per_page)
+        return paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(queryset, ordering, per_page)
+    return paginator.get_page(request.GET.get(CURSOR_QUERY_PARAM))
+
+
+def cursor_url(request, cursor):
+    """Current URL with ``cursor`` in the query string"""
+    query = request.GET.copy()
+    query.pop('page', None)
+    query[CURSOR_QUERY_PARAM] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+class KeysetPaginationMixin:
+    """
+    ``ListView`` mixin paginating by keyset. Set ``keyset_ordering`` (or
+    override ``get_keyset_ordering()``); when it returns ``None``, or a
+    ``?page=`` link is followed, the regular offset pagination is used.
+    """
+    keyset_ordering = None
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        ordering = self.get_keyset_ordering()
+        if not ordering or self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, ordering, page_size)
+        page = paginator.get_page(self.request.GET.get(CURSOR_QUERY_PARAM))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get('page_obj')
+        if isinstance(page, KeysetPage):
+            context['next_page_url'] = cursor_url(self.request, page.next_cursor) if page.has_next() else None
+            context['previous_page_url'] = cursor_url(self.request, page.previous_cursor) if page.has_previous() else None
+        return context
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF keyset pagination. The ordering comes from the view's
+    ``keyset_ordering`` attribute, falling back to ``ordering`` here.
+    Responses have ``next``/``previous`` links and no ``count``.
+
+    A queryset the filter backends ordered some other way (a different
+    ``?ordering=``, search relevance) is refused with 400 rather than
+    silently re-sorted.
+    """
+    ordering = ('-id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = CURSOR_QUERY_PARAM
+    invalid_cursor_message = 'Invalid cursor'
+    ordering_conflict_message = 'Cursor pagination only supports the ordering {}; use ?page= for other orderings.'
+    page_size = api_settings.PAGE_SIZE
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, view):
+        return getattr(view, 'keyset_ordering', None) or self.ordering
+
+    def ordering_conflicts(self, queryset, view, ordering):
+        """Whether the queryset is ordered by something other than ``ordering``"""
+        current = tuple(queryset.query.order_by)
+        if not current or current == tuple(getattr(view, 'ordering', None) or ()):
+            # Unordered, or the view's default: the keyset order replaces it
+            return False
+        return current != tuple(ordering[:len(current)])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = self.get_ordering(view)
+        if self.ordering_conflicts(queryset, view, ordering):
+            raise APIValidationError({
+                self.cursor_query_param: self.ordering_conflict_message.format(','.join(ordering))
+            })
+        paginator = KeysetPaginator(queryset, ordering, self.get_page_size(request))
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Keyset pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """
+    Page numbers by default, so existing clients keep their ``count``;
+    passing ``?cursor=`` (empty for the first page) switches to keyset mode.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + \
+            self.keyset_class().get_schema_operation_parameters(view)
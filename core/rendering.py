@@ -0,0 +1,316 @@
+"""
+Cached, post-processed HTML for rich-text (CKEditor) fields.
+
+Rich text is rewritten once per object version and cached under a key that
+includes ``updated_at``, so an edit simply produces a new key:
+
+- the HTML is sanitized and headings get anchor ids (core.content)
+- ``<img>`` tags get ``loading="lazy"``, ``decoding="async"`` and a
+  ``srcset`` of their resized variants
+- inline bloat from pasted content is dropped: ``Mso*`` classes,
+  ``data-cke-*`` attributes, style declarations other than layout ones
+  and attribute-less ``<span>`` wrappers
+
+Saving an object only queues its local images (``ImageVariant`` rows); the
+``generate_image_variants`` command resizes them and records which widths
+exist, so rendering reads one table instead of asking the storage about
+every width. HTML rendered while variants are still pending is cached
+briefly and picks up the ``srcset`` once they are done. Images a worker
+claimed but never finished (it crashed) are queued again once the claim
+times out.
+"""
+import os
+import re
+from datetime import timedelta
+from html import escape
+from html.parser import HTMLParser
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from PIL import Image
+
+from .content import process_html
+from .models import ImageVariant
+
+CACHE_KEY = 'richtext:{label}:{pk}:{field}:{version}'
+
+# Style properties kept on rich-text elements; everything else is dropped
+KEPT_STYLE_PROPERTIES = frozenset([
+    'text-align', 'float', 'width', 'height', 'margin', 'margin-left', 'margin-right',
+])
+VOID_TAGS = frozenset([
+    'area', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr',
+])
+VARIANT_SUFFIX_RE = re.compile(r'-\d+w$')
+# Rendered HTML whose image variants are still being generated
+PENDING_CACHE_TIMEOUT = 60
+
+
+def get_image_widths():
+    return tuple(getattr(settings, 'RICH_TEXT_IMAGE_WIDTHS', (480, 960, 1440)))
+
+
+def get_cache_timeout():
+    return getattr(settings, 'RICH_TEXT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def get_claim_timeout():
+    return getattr(settings, 'RICH_TEXT_VARIANT_CLAIM_TIMEOUT', 10 * 60)
+
+
+# Image variants
+
+def media_name(src):
+    """Storage name of a local media URL, or None for external images"""
+    if not src or not src.startswith(settings.MEDIA_URL):
+        return None
+    return src[len(settings.MEDIA_URL):].split('?', 1)[0]
+
+
+def variant_name(name, width):
+    root, ext = os.path.splitext(name)
+    return f"{root}-{width}w{ext}"
+
+
+def generate_image_variants(name):
+    """Save downscaled copies of a media image for each configured width; returns the widths that exist"""
+    if VARIANT_SUFFIX_RE.search(os.path.splitext(name)[0]) or not default_storage.exists(name):
+        return []
+
+    try:
+        with default_storage.open(name) as source:
+            image = Image.open(source)
+            image.load()
+    except (OSError, ValueError):
+        return []
+
+    widths = []
+    for width in get_image_widths():
+        if width >= image.width:
+            continue
+        target = variant_name(name, width)
+        if not default_storage.exists(target):
+            variant = image.copy()
+            variant.thumbnail((width, image.height * width // image.width))
+            buffer = BytesIO()
+            variant.save(buffer, format=image.format or 'PNG')
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+        widths.append(width)
+    return widths
+
+
+class _ImageCollector(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sources = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'img':
+            self.sources.append(dict(attrs).get('src'))
+
+
+def content_images(html):
+    """Storage names of the local images in an HTML fragment"""
+    collector = _ImageCollector()
+    collector.feed(html or '')
+    names = (media_name(src) for src in collector.sources)
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def queue_content_variants(html):
+    """Queue variant generation for the local images of an HTML fragment not seen before"""
+    names = content_images(html)
+    if names:
+        ImageVariant.objects.bulk_create(
+            [ImageVariant(name=name) for name in names], ignore_conflicts=True
+        )
+
+
+def requeue_stale_variants():
+    """Queue again the images whose worker died while generating them; returns how many"""
+    expired = timezone.now() - timedelta(seconds=get_claim_timeout())
+    return ImageVariant.objects.filter(status='generating').filter(
+        Q(claimed_at__lt=expired) | Q(claimed_at__isnull=True)
+    ).update(status='pending', claimed_at=None)
+
+
+def generate_pending_variants(limit=None):
+    """Generate the variants of queued images; returns the number of images processed"""
+    requeue_stale_variants()
+    pending = ImageVariant.objects.filter(status='pending').order_by('created_at', 'id')
+    if limit:
+        pending = pending[:limit]
+    processed = 0
+    for image in pending:
+        # Claim the image so concurrent workers do not resize it twice
+        claimed = ImageVariant.objects.filter(pk=image.pk, status='pending').update(
+            status='generating', claimed_at=timezone.now()
+        )
+        if not claimed:
+            continue
+        try:
+            widths = generate_image_variants(image.name)
+        except Exception as e:
+            print(f"Failed to generate variants of {image.name}: {e}")
+            widths = []
+        ImageVariant.objects.filter(pk=image.pk).update(
+            widths=widths, status='done', generated_at=timezone.now()
+        )
+        processed += 1
+    return processed
+
+
+def load_variants(*fragments):
+    """{name: ImageVariant} for the local images of HTML fragments, in one query"""
+    names = [name for html in fragments for name in content_images(html)]
+    if not names:
+        return {}
+    return {variant.name: variant for variant in ImageVariant.objects.filter(name__in=names)}
+
+
+# HTML rewriting
+
+class _RichTextRewriter(HTMLParser):
+
+    def __init__(self, variants=None):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.variants = variants or {}
+        self.pending = False  # an image's variants are still being generated
+        self._spans = []  # True for each open <span> that was kept
+
+    def _clean_style(self, style):
+        declarations = []
+        for declaration in style.split(';'):
+            prop, _, value = declaration.partition(':')
+            prop = prop.strip().lower()
+            if prop in KEPT_STYLE_PROPERTIES and value.strip():
+                declarations.append(f"{prop}: {value.strip()}")
+        return '; '.join(declarations)
+
+    def _clean_attrs(self, attrs):
+        cleaned = []
+        for name, value in attrs:
+            if name.startswith('data-cke'):
+                continue
+            if name == 'style':
+                value = self._clean_style(value or '')
+                if not value:
+                    continue
+            if name == 'class':
+                value = ' '.join(c for c in (value or '').split() if not c.startswith('Mso'))
+                if not value:
+                    continue
+            cleaned.append((name, value))
+        return cleaned
+
+    def _image_attrs(self, attrs):
+        names = {name for name, _ in attrs}
+        if 'loading' not in names:
+            attrs.append(('loading', 'lazy'))
+        if 'decoding' not in names:
+            attrs.append(('decoding', 'async'))
+        name = media_name(dict(attrs).get('src'))
+        variant = self.variants.get(name)
+        if variant and variant.status != 'done':
+            self.pending = True
+        elif variant and variant.widths and 'srcset' not in names:
+            srcset = ', '.join(f"{default_storage.url(variant_name(name, width))} {width}w" for width in variant.widths)
+            attrs.append(('srcset', srcset))
+            attrs.append(('sizes', '(max-width: 960px) 100vw, 960px'))
+        return attrs
+
+    def _start_tag(self, tag, attrs, closed=False):
+        parts = [tag] + [
+            name if value is None else f'{name}="{escape(value, quote=True)}"'
+            for name, value in attrs
+        ]
+        return f"<{' '.join(parts)}{' /' if closed else ''}>"
+
+    def handle_starttag(self, tag, attrs, closed=False):
+        attrs = self._clean_attrs(attrs)
+        if tag == 'span' and not closed:
+            self._spans.append(bool(attrs))
+            if not attrs:
+                return
+        if tag == 'img':
+            attrs = self._image_attrs(attrs)
+        self.output.append(self._start_tag(tag, attrs, closed))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, closed=True)
+
+    def handle_endtag(self, tag):
+        if tag == 'span' and self._spans and not self._spans.pop():
+            return
+        if tag not in VOID_TAGS:
+            self.output.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        self.output.append(escape(data, quote=False))
+
+    def handle_comment(self, data):
+        pass
+
+
+def _rewrite(html, variants=None):
+    """(rewritten HTML, cache timeout) of an HTML fragment"""
+    if not html:
+        return '', get_cache_timeout()
+    rewriter = _RichTextRewriter(load_variants(html) if variants is None else variants)
+    rewriter.feed(process_html(html).html)
+    rewriter.close()
+    timeout = PENDING_CACHE_TIMEOUT if rewriter.pending else get_cache_timeout()
+    return ''.join(rewriter.output), timeout
+
+
+def rewrite_html(html):
+    """Sanitize an HTML fragment and apply the lazy-loading, srcset and clean-up rewrites"""
+    return _rewrite(html)[0]
+
+
+# Cache
+
+def cache_key(obj, field):
+    version = obj.updated_at.timestamp() if getattr(obj, 'updated_at', None) else 0
+    return CACHE_KEY.format(label=obj._meta.label_lower, pk=obj.pk, field=field, version=version)
+
+
+def render_rich_text(obj, field):
+    """Rewritten HTML of ``obj.<field>``, cached per ``updated_at``"""
+    key = cache_key(obj, field)
+    html = cache.get(key)
+    if html is None:
+        html, timeout = _rewrite(getattr(obj, field))
+        cache.set(key, html, timeout)
+    return mark_safe(html)
+
+
+def render_rich_text_many(objects, field, attr=None):
+    """
+    Render a field for many objects with one cache round trip, storing the
+    result on each object as ``attr`` (``<field>_html`` by default).
+    """
+    objects = list(objects)
+    attr = attr or f"{field}_html"
+    keys = {cache_key(obj, field): obj for obj in objects}
+    cached = cache.get_many(list(keys))
+    uncached = [obj for key, obj in keys.items() if key not in cached]
+    variants = load_variants(*[getattr(obj, field) for obj in uncached]) if uncached else {}
+    missing = {}  # {timeout: {key: html}}
+    for key, obj in keys.items():
+        html = cached.get(key)
+        if html is None:
+            html, timeout = _rewrite(getattr(obj, field), variants)
+            missing.setdefault(timeout, {})[key] = html
+        setattr(obj, attr, mark_safe(html))
+    for timeout, rendered in missing.items():
+        cache.set_many(rendered, timeout)
+    return objects
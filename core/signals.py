@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from blog.models import BlogPost, FAQ
+from services.models import Service
+from .models import PageContent
+from .rendering import queue_content_variants
+
+RICH_TEXT_FIELDS = {
+    BlogPost: ['content'],
+    FAQ: ['answer'],
+    Service: ['detailed_description'],
+    PageContent: ['content'],
+}
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=FAQ)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=PageContent)
+def queue_rich_text_images(sender, instance, **kwargs):
+    """Queue the resized image variants used by the rich-text srcset for the worker"""
+    for field in RICH_TEXT_FIELDS[sender]:
+        queue_content_variants(getattr(instance, field))
@@ -0,0 +1,92 @@
+"""
+Unique slug and username allocation.
+
+Instead of probing ``base``, ``base-1``, ``base-2``... with one ``exists()``
+query each, ``unique_value()`` loads every existing value that starts with
+the base in a single query and picks the first free suffix in memory.
+Two concurrent saves can still pick the same value, so ``save_unique()``
+retries the save with a fresh value when the insert hits the unique
+constraint.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+
+# Digits kept free at the end of a truncated base for the counter
+SUFFIX_DIGITS = 4
+SAVE_ATTEMPTS = 3
+
+
+def _max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+def _stem(base, separator, max_length):
+    """The part of ``base`` that suffixed values start with"""
+    if max_length and len(base) + len(separator) + SUFFIX_DIGITS > max_length:
+        return base[:max_length - len(separator) - SUFFIX_DIGITS]
+    return base
+
+
+def _pick(base, stem, separator, taken):
+    if base not in taken:
+        return base
+    pattern = re.compile(rf'^{re.escape(stem + separator)}(\d+)$')
+    used = {int(match.group(1)) for match in map(pattern.match, taken) if match}
+    counter = 1
+    while counter in used:
+        counter += 1
+    return f"{stem}{separator}{counter}"
+
+
+def _existing(model, field, prefix, exclude_pk=None):
+    queryset = model._default_manager.filter(**{f'{field}__startswith': prefix})
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return set(queryset.values_list(field, flat=True))
+
+
+def unique_value(model, field, base, separator='-', exclude_pk=None):
+    """First free value of ``base``, ``base<separator>1``, ... for a unique field"""
+    max_length = _max_length(model, field)
+    base = base[:max_length] if max_length else base
+    stem = _stem(base, separator, max_length)
+    return _pick(base, stem, separator, _existing(model, field, stem, exclude_pk))
+
+
+def unique_values(model, field, bases, separator='-'):
+    """
+    Free values for a list of bases that are also unique within the list,
+    for bulk inserts. One query finds the bases already in use and one
+    prefix query per such base loads its suffixed values.
+    """
+    max_length = _max_length(model, field)
+    bases = [base[:max_length] if max_length else base for base in bases]
+    taken = set(model._default_manager.filter(**{f'{field}__in': set(bases)}).values_list(field, flat=True))
+    for base in list(taken):
+        taken |= _existing(model, field, _stem(base, separator, max_length))
+
+    values = []
+    for base in bases:
+        value = _pick(base, _stem(base, separator, max_length), separator, taken)
+        taken.add(value)
+        values.append(value)
+    return values
+
+
+def save_unique(instance, field, base, save, separator='-'):
+    """
+    Assign a unique ``field`` value derived from ``base`` and call ``save``,
+    allocating again if a concurrent save took the value first.
+    """
+    model = type(instance)
+    for attempt in range(SAVE_ATTEMPTS):
+        setattr(instance, field, unique_value(model, field, base, separator, exclude_pk=instance.pk))
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            taken = model._default_manager.filter(**{field: getattr(instance, field)})
+            if attempt == SAVE_ATTEMPTS - 1 or not taken.exclude(pk=instance.pk).exists():
+                # Out of attempts, or another constraint failed
+                raise
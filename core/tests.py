@@ -1,3 +1,338 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.db import IntegrityError
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from blog.models import BlogCategory, BlogPost
+from dashboard.templatetags.core_filters import first_paragraph, reading_time
+from PIL import Image
+
+from .content import process_html, sanitize_html
+from .mail import claim_batch, queue_mail, send_queued_mail
+from .models import ImageVariant, OutboundEmail
+from .pagination import InvalidCursor, KeysetPaginator, encode_cursor, get_page
+from .rendering import generate_pending_variants, render_rich_text, variant_name
+from .slugs import save_unique, unique_value, unique_values
+
+
+class KeysetPaginatorTests(TestCase):
+    """Keyset pages cover every row once, in order, in both directions"""
+    ORDERING = ('-published_date', '-id')
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        category = BlogCategory.objects.create(name='Category')
+        now = timezone.now()
+        for i in range(11):
+            BlogPost.objects.create(
+                title=f'Post {i}', author=author, category=category, excerpt='Excerpt',
+                content='<p>Content</p>', status='draft' if i % 4 == 0 else 'published',
+                # Pairs of posts share a timestamp; drafts have none
+                published_date=None if i % 4 == 0 else now - timedelta(days=i // 2),
+            )
+
+    def setUp(self):
+        self.queryset = BlogPost.objects.all()
+        posts = list(self.queryset)
+        # Newest first, ties by id; NULLs come last walking forward on every database
+        dated = sorted((post for post in posts if post.published_date), key=lambda post: (post.published_date, post.pk))
+        undated = sorted(post.pk for post in posts if not post.published_date)
+        self.expected = [post.pk for post in reversed(dated)] + undated[::-1]
+
+    def walk(self, per_page):
+        paginator = KeysetPaginator(self.queryset, self.ORDERING, per_page)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_forward_walk_returns_every_row_once(self):
+        for per_page in (1, 3, 4, 11, 20):
+            _, pages = self.walk(per_page)
+            self.assertEqual([post.pk for page in pages for post in page], self.expected)
+            self.assertFalse(pages[0].has_previous())
+
+    def test_previous_cursor_returns_the_previous_page(self):
+        paginator, pages = self.walk(3)
+        for previous, page in zip(pages, pages[1:]):
+            back = paginator.page(page.previous_cursor)
+            self.assertEqual([post.pk for post in back], [post.pk for post in previous])
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(self.queryset, self.ORDERING, 3)
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+        with self.assertRaises(InvalidCursor):
+            paginator.page(encode_cursor(['2024-01-01T00:00:00']))
+        self.assertEqual([post.pk for post in paginator.get_page('not-a-cursor')], self.expected[:3])
+
+    def test_page_links_fall_back_to_offset_pages(self):
+        request = RequestFactory().get('/', {'page': '2'})
+        page = get_page(request, self.queryset, self.ORDERING, 3)
+        self.assertEqual(page.number, 2)
+
+
+class KeysetAPIPaginationTests(TestCase):
+    """?cursor= on the post API only pages in its keyset order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        category = BlogCategory.objects.create(name='Category')
+        for i in range(5):
+            BlogPost.objects.create(
+                title=f'Post {i}', author=author, category=category, excerpt='Excerpt',
+                content='<p>Content</p>', status='published',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_pages(self):
+        response = self.client.get('/api/v1/posts/', {'cursor': '', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+        seen = [post['id'] for post in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [post['id'] for post in response.data['results']]
+        self.assertEqual(seen, list(
+            BlogPost.objects.order_by('-published_date', '-id').values_list('pk', flat=True)
+        ))
+
+    def test_matching_ordering_is_accepted(self):
+        response = self.client.get('/api/v1/posts/', {'cursor': '', 'ordering': '-published_date'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_ordering_is_refused(self):
+        for params in ({'ordering': 'title'}, {'ordering': '-views_count'}, {'search': 'post'}):
+            response = self.client.get('/api/v1/posts/', {'cursor': '', **params})
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('cursor', response.data)
+
+    def test_page_numbers_keep_other_orderings(self):
+        response = self.client.get('/api/v1/posts/', {'ordering': 'title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+
+
+class ContentSanitizingTests(TestCase):
+    """Rich text is sanitized when rendered; the stored content stays as written"""
+
+    def test_unsafe_markup_is_removed(self):
+        html = sanitize_html(
+            '<a href="java&#x09;script:alert(1)">link</a>'
+            '<iframe srcdoc="&lt;script&gt;alert(1)&lt;/script&gt;">frame</iframe>'
+            '<p onclick="alert(1)" style="text-align: center; position: fixed">text</p>'
+            '<script>alert(1)</script>'
+        )
+        for unsafe in ('script', 'srcdoc', 'iframe', 'onclick', 'position', 'href'):
+            self.assertNotIn(unsafe, html)
+        self.assertIn('<p style="text-align:center">text</p>', html)
+
+    def test_unclosed_tags_keep_the_rest(self):
+        processed = process_html('<h2>Setup</h2><p>Install the <b>agent and <i>configure it</p><p>Then run it</p>')
+        self.assertEqual(processed.text, 'Setup Install the agent and configure it Then run it')
+        self.assertEqual(processed.headings, [{'level': 2, 'id': 'setup', 'title': 'Setup'}])
+
+    def test_post_keeps_its_content(self):
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        content = '<h2>Intro</h2><p onclick="x()">A first paragraph that is long enough</p>'
+        post = BlogPost.objects.create(
+            title='Post', author=author, category=BlogCategory.objects.create(name='Category'),
+            content=content, status='published',
+        )
+        post.refresh_from_db()
+
+        self.assertEqual(post.content, content)
+        self.assertEqual(post.content_text, 'Intro A first paragraph that is long enough')
+        self.assertEqual(post.excerpt, 'A first paragraph that is long enough')
+        self.assertEqual(
+            str(render_rich_text(post, 'content')),
+            '<h2 id="intro">Intro</h2><p>A first paragraph that is long enough</p>'
+        )
+
+        # Saves that leave the content alone do not re-derive it
+        post.content = '<p>Unsaved edit</p>'
+        post.save(update_fields=['title'])
+        post.refresh_from_db()
+        self.assertEqual(post.content_text, 'Intro A first paragraph that is long enough')
+
+    def test_first_paragraph_filter(self):
+        self.assertEqual(
+            first_paragraph('<p>Short</p><p>The first <b>long</b> paragraph here</p>'),
+            'The first long paragraph here'
+        )
+        self.assertEqual(first_paragraph('x' * 250), 'x' * 200 + '...')
+
+    def test_filters_read_what_the_post_stored(self):
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        post = BlogPost.objects.create(
+            title='Post', author=author, category=BlogCategory.objects.create(name='Category'),
+            content='<p>Short</p><p>' + 'word ' * 350 + '</p>', status='published',
+        )
+        post = BlogPost.objects.get(pk=post.pk)
+
+        with mock.patch('dashboard.templatetags.core_filters.process_html') as process:
+            self.assertEqual(first_paragraph(post), post.excerpt[:200] + '...')
+            self.assertEqual(reading_time(post), '2 min read')
+        process.assert_not_called()
+
+    def test_reading_time_rounds_to_the_nearest_minute(self):
+        for words, minutes in ((50, 1), (290, 1), (310, 2), (350, 2), (700, 4)):
+            self.assertEqual(reading_time('<p>' + 'word ' * words + '</p>'), f'{minutes} min read', words)
+
+
+class ImageVariantTests(TestCase):
+    """Saving queues image variants; the worker generates them and records their widths"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, MEDIA_URL='/media/', RICH_TEXT_IMAGE_WIDTHS=(480, 960, 1440),
+            RICH_TEXT_VARIANT_CLAIM_TIMEOUT=10 * 60,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 500)).save(buffer, format='PNG')
+        self.name = default_storage.save('uploads/photo.png', ContentFile(buffer.getvalue()))
+        author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        self.post = BlogPost.objects.create(
+            title='Post', author=author, category=BlogCategory.objects.create(name='Category'),
+            content=f'<p><img src="/media/{self.name}" alt="Photo"></p>', status='published',
+        )
+
+    def test_saving_only_queues_the_images(self):
+        variant = ImageVariant.objects.get()
+        self.assertEqual((variant.name, variant.status), (self.name, 'pending'))
+        self.assertFalse(default_storage.exists(variant_name(self.name, 480)))
+
+        # Saving again does not queue the image twice
+        self.post.save()
+        self.assertEqual(ImageVariant.objects.count(), 1)
+
+    def test_worker_records_the_variants(self):
+        self.assertNotIn('srcset', render_rich_text(self.post, 'content'))
+
+        self.assertEqual(generate_pending_variants(), 1)
+        variant = ImageVariant.objects.get()
+        self.assertEqual((variant.status, variant.widths), ('done', [480, 960]))
+        self.assertTrue(default_storage.exists(variant_name(self.name, 960)))
+        self.assertEqual(generate_pending_variants(), 0)
+
+        # Rendering reads the recorded widths without asking the storage
+        cache.clear()
+        with mock.patch.object(default_storage, 'exists', side_effect=AssertionError):
+            html = render_rich_text(self.post, 'content')
+        self.assertIn('srcset="/media/uploads/photo-480w.png 480w, /media/uploads/photo-960w.png 960w"', html)
+
+
+    def test_stale_claims_are_generated_again(self):
+        ImageVariant.objects.update(status='generating', claimed_at=timezone.now() - timedelta(minutes=11))
+        self.assertEqual(generate_pending_variants(), 1)
+        self.assertEqual(ImageVariant.objects.get().status, 'done')
+
+    def test_live_claims_are_left_alone(self):
+        ImageVariant.objects.update(status='generating', claimed_at=timezone.now() - timedelta(minutes=9))
+        self.assertEqual(generate_pending_variants(), 0)
+        self.assertEqual(ImageVariant.objects.get().status, 'generating')
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            queue_mail(f'Subject {i}', 'Body', [f'user{i}@example.com'])
+
+    def test_claimed_messages_are_skipped_by_other_workers(self):
+        self.assertEqual(len(claim_batch(2)), 2)
+        self.assertEqual(len(claim_batch(2)), 1)
+        self.assertEqual(claim_batch(2), [])
+
+    def test_messages_are_sent_once(self):
+        self.assertEqual(send_queued_mail(batch_size=2), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboundEmail.objects.filter(status='sent').count(), 3)
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    def test_failures_are_retried_later(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(send_queued_mail(), (0, 3))
+
+        email = OutboundEmail.objects.first()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('queued', 1, 'down'))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+
+class SlugAllocationTests(TestCase):
+    """Colliding slugs get the first free numeric suffix"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author@example.com', 'Blog', 'Author', 'password123')
+        cls.category = BlogCategory.objects.create(name='Category')
+
+    def create_post(self, title, **kwargs):
+        return BlogPost.objects.create(title=title, author=self.author, category=self.category, content='<p>Body</p>', **kwargs)
+
+    def test_colliding_titles_are_suffixed(self):
+        slugs = [self.create_post('Zero trust').slug for _ in range(3)]
+        self.assertEqual(slugs, ['zero-trust', 'zero-trust-1', 'zero-trust-2'])
+
+        # A freed suffix is reused; other words sharing the prefix do not count
+        BlogPost.objects.filter(slug='zero-trust-1').delete()
+        self.create_post('Zero trust networks')
+        self.assertEqual(unique_value(BlogPost, 'slug', 'zero-trust'), 'zero-trust-1')
+
+    def test_long_bases_keep_room_for_the_suffix(self):
+        max_length = BlogPost._meta.get_field('slug').max_length
+        base = 'x' * (max_length + 10)
+        self.create_post('Long', slug=base[:max_length])
+
+        value = unique_value(BlogPost, 'slug', base)
+        self.assertEqual(value, 'x' * (max_length - 5) + '-1')
+        self.assertLessEqual(len(value), max_length)
+
+    def test_bulk_values_are_unique_within_the_list(self):
+        self.create_post('Backups')
+        self.assertEqual(
+            unique_values(BlogPost, 'slug', ['backups', 'backups', 'restores', 'restores']),
+            ['backups-1', 'backups-2', 'restores', 'restores-1']
+        )
+
+    def test_save_retries_when_a_concurrent_save_took_the_value(self):
+        self.create_post('Race')
+        post = BlogPost(title='Race', author=self.author, category=self.category, content='<p>Body</p>')
+        # The first allocation ran before the other post was committed
+        allocations = iter(['race'])
+
+        def allocate(*args, **kwargs):
+            return next(allocations, None) or unique_value(*args, **kwargs)
+
+        with mock.patch('core.slugs.unique_value', side_effect=allocate):
+            save_unique(post, 'slug', 'race', post.save_base)
+        self.assertEqual(BlogPost.objects.get(pk=post.pk).slug, 'race-1')
+
+    def test_other_integrity_errors_are_raised(self):
+        post = BlogPost(title='Broken', author=self.author, category=self.category)
+
+        def save():
+            raise IntegrityError('NOT NULL constraint failed')
+
+        with self.assertRaises(IntegrityError):
+            save_unique(post, 'slug', 'broken', save)
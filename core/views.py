@@ -2,7 +2,6 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.views.generic import TemplateView, ListView, DetailView
 from django.http import JsonResponse, HttpResponse
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from django.db.models import Count, Q
@@ -19,6 +18,8 @@ from .models import (
 from services.models import Service, ServiceCategory, CompanyInfo
 from blog.models import BlogPost, BlogCategory, Newsletter, ContactMessage, FAQ, Testimonial
 from accounts.models import User
+from .rendering import render_rich_text, render_rich_text_many
+from .mail import queue_mail
 
 class HomeView(TemplateView):
     template_name = 'core/home.html'
@@ -214,8 +215,8 @@ class ContactView(TemplateView):
         except CompanyInfo.DoesNotExist:
             company_info = None
         
-        # Get FAQs
-        faqs = FAQ.objects.filter(is_active=True)
+        # Get FAQs, with their cached rendered answers as faq.answer_html
+        faqs = render_rich_text_many(FAQ.objects.filter(is_active=True), 'answer')
         
         context.update({
             'contact_content': contact_content,
@@ -252,15 +253,15 @@ class ContactView(TemplateView):
             # Send notification email to admin
             try:
                 admin_email = settings.DEFAULT_FROM_EMAIL
-                send_mail(
+                queue_mail(
                     subject=f'New Contact Message: {subject}',
                     message=f'Name: {name}\nEmail: {email}\nPhone: {phone}\n\nMessage:\n{message}',
-                    from_email=email,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[admin_email],
-                    fail_silently=False,
+                    reply_to=[email],
                 )
             except Exception as e:
-                print(f"Failed to send email: {e}")
+                print(f"Failed to queue email: {e}")
             
             messages.success(request, 'Thank you for your message! We\'ll get back to you soon.')
             return redirect('core:contact')
@@ -290,12 +291,11 @@ def newsletter_signup(request):
         
         # Send welcome email (optional)
         try:
-            send_mail(
+            queue_mail(
                 subject='Welcome to Debsploit Solutions Newsletter!',
                 message=f'Hi {name or "there"},\n\nThank you for subscribing to our newsletter. You\'ll receive updates about our latest courses, services, and tech insights.\n\nBest regards,\nDebsploit Solutions Team',
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[email],
-                fail_silently=True,
             )
         except:
             pass
@@ -322,6 +322,11 @@ class PageDetailView(DetailView):
     
     def get_queryset(self):
         return PageContent.objects.filter(is_published=True)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['content_html'] = render_rich_text(self.object, 'content')
+        return context
 
 def search_view(request):
     """Global search functionality"""
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='dashboard_u_user_id_ad3e3e_idx'),
+        ),
+    ]
@@ -7,6 +7,8 @@ from django.db.models import Avg, Sum, Count
 from datetime import datetime, timedelta
 import json
 
+from core.slugs import save_unique
+
 User = get_user_model()
 
 class DashboardAnalytics(models.Model):
@@ -134,6 +136,8 @@ class UserActivity(models.Model):
             models.Index(fields=['user', 'activity_type']),
             models.Index(fields=['activity_type', 'timestamp']),
             models.Index(fields=['timestamp']),
+            # Keyset pagination of a user's activity feed
+            models.Index(fields=['user', 'timestamp', 'id']),
         ]
     
     def __str__(self):
@@ -379,7 +383,9 @@ class ProjectPortfolio(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             from django.utils.text import slugify
-            self.slug = slugify(f"{self.title}-{self.user.username}")
+            save_unique(self, 'slug', slugify(f"{self.title}-{self.user.username}") or 'project',
+                        lambda: super(ProjectPortfolio, self).save(*args, **kwargs))
+            return
         super().save(*args, **kwargs)
     
     def get_technologies_list(self):
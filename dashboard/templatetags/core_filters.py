@@ -4,6 +4,10 @@ from django.utils.safestring import mark_safe
 from django.utils.html import escape
 from django.template.defaultfilters import floatformat
 import re
+from functools import lru_cache
+
+from core.content import process_html
+from core.rendering import render_rich_text
 
 register = template.Library()
 
@@ -150,39 +154,41 @@ def time_ago(value):
     else:
         return "Just now"
 
+@lru_cache(maxsize=256)
+def _processed(content):
+    return process_html(content)
+
 @register.filter
 def reading_time(content):
-    """Calculate estimated reading time"""
+    """Calculate estimated reading time; pass the post to use its stored value"""
     if not content:
         return "1 min read"
     
-    # Strip HTML tags
-    import re
-    clean_text = re.sub(r'<[^>]+>', '', str(content))
-    word_count = len(clean_text.split())
-    
-    # Average reading speed: 200 words per minute
-    minutes = max(1, round(word_count / 200))
+    # Models processed on save (e.g. BlogPost) already know their reading time
+    minutes = getattr(content, 'reading_time', None)
+    if minutes is None:
+        minutes = _processed(str(content)).reading_time
     return f"{minutes} min read"
 
 @register.filter
 def first_paragraph(content):
-    """Extract first paragraph from content"""
+    """First paragraph, cut at 200 characters; pass the post to use its stored excerpt"""
     if not content:
         return ''
     
-    import re
-    # Split by paragraph tags or double newlines
-    paragraphs = re.split(r'</?p[^>]*>|\n\n', str(content))
-    
-    for paragraph in paragraphs:
-        paragraph = paragraph.strip()
-        if paragraph and len(paragraph) > 20:
-            # Remove any remaining HTML tags
-            clean_paragraph = re.sub(r'<[^>]+>', '', paragraph)
-            return clean_paragraph[:200] + ('...' if len(clean_paragraph) > 200 else '')
-    
-    return str(content)[:200] + ('...' if len(str(content)) > 200 else '')
+    # Models processed on save (e.g. BlogPost) already store it as their excerpt
+    paragraph = getattr(content, 'excerpt', None)
+    if paragraph is None:
+        processed = _processed(str(content))
+        paragraph = processed.first_paragraph or processed.text
+    return paragraph[:200] + ('...' if len(paragraph) > 200 else '')
+
+@register.filter
+def rich_text(obj, field='content'):
+    """Cached, rewritten HTML of a rich-text field: {{ page|rich_text:"content" }}"""
+    if not obj:
+        return ''
+    return render_rich_text(obj, field)
 
 @register.filter
 def highlight_search(text, search_term):
@@ -20,6 +20,7 @@ from services.models import (
     Course, ServiceReview
 )
 from blog.models import BlogPost
+from core.pagination import KeysetPaginationMixin, KeysetPaginator
 from .models import (
     UserProgress, ProjectPortfolio, LearningPath, UserLearningPath,
     DeveloperProfile, DashboardAnalytics, UserActivity
@@ -435,14 +436,15 @@ class PortfolioView(LoginRequiredMixin, ListView):
         
         return context
 
-class NotificationsView(LoginRequiredMixin, ListView):
+class NotificationsView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = UserNotification
     template_name = 'dashboard/notifications.html'
     context_object_name = 'notifications'
     paginate_by = 20
+    keyset_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
-        return UserNotification.objects.filter(user=self.request.user).order_by('-created_at')
+        return UserNotification.objects.filter(user=self.request.user).order_by('-created_at', '-id')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -543,9 +545,9 @@ class AnalyticsView(LoginRequiredMixin, TemplateView):
 @require_http_methods(["GET"])
 def api_notifications(request):
     """API endpoint for loading notifications"""
-    notifications = UserNotification.objects.filter(
-        user=request.user
-    ).order_by('-created_at')[:10]
+    notifications = KeysetPaginator(
+        UserNotification.objects.filter(user=request.user), ('-created_at', '-id'), 10
+    ).get_page(request.GET.get('cursor'))
     
     data = {
         'notifications': [
@@ -558,7 +560,8 @@ def api_notifications(request):
                 'created_at': n.created_at.isoformat(),
             }
             for n in notifications
-        ]
+        ],
+        'next_cursor': notifications.next_cursor,
     }
     
     return JsonResponse(data)
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'allauth.socialaccount.providers.github',  
     'ckeditor',
     'ckeditor_uploader',
+    'mptt',
     'django_extensions',
     'corsheaders',  
     'whitenoise.runserver_nostatic', 
@@ -287,7 +288,9 @@ CKEDITOR_CONFIGS = {
 }
 
 # Email Settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Set EMAIL_BACKEND to the console or filebased backend to keep mail local
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = config('EMAIL_FILE_PATH', default=str(BASE_DIR / 'logs' / 'emails'))
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
@@ -296,6 +299,10 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@debsploitsolutions.com')
 SERVER_EMAIL = DEFAULT_FROM_EMAIL
+NEWSLETTER_EMAIL_BACKEND = config('NEWSLETTER_EMAIL_BACKEND', default=EMAIL_BACKEND)
+NEWSLETTER_BATCH_SIZE = 100  # messages sent per connection round and checkpoint
+NEWSLETTER_MAX_PER_SECOND = 10  # stay under the SMTP provider's sending limit
+NEWSLETTER_CLAIM_TIMEOUT = 10 * 60  # seconds without a heartbeat before another worker resumes a campaign
 
 # Cache Configuration
 CACHES = {
@@ -387,6 +394,31 @@ DASHBOARD_PAGINATION_SIZE = 12
 BLOG_PAGINATION_SIZE = 10
 TASKS_PAGINATION_SIZE = 20
 NOTIFICATIONS_PAGINATION_SIZE = 20
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 60  # seconds between flushes of buffered views (by each web process with a local-memory cache)
+BLOG_SEARCH_MAX_RESULTS = 200  # best matches ranked per blog search
+BLOG_COMMENT_TREE_MAX_DEPTH = 5  # deepest reply level rendered in a thread
+BLOG_COMMENT_TREE_MAX_COMMENTS = 500  # comments loaded per post page
+BLOG_RELATED_POSTS_COUNT = 6  # precomputed related posts stored per post
+BLOG_SIDEBAR_CACHE_TIMEOUT = 600  # seconds; the sidebar is also dropped on every change
+BLOG_SCHEDULED_PUBLISH_BATCH_SIZE = 100  # scheduled posts published per transaction
+BLOG_SCHEDULED_PUBLISH_INTERVAL = 60  # seconds between checks with publish_scheduled_posts --loop
+BLOG_IMPORT_BATCH_SIZE = 500  # posts written per transaction by the blog importer
+BLOG_TRENDING_HALF_LIFE_HOURS = 24  # views lose half their trending weight per half-life
+BLOG_TRENDING_WINDOW_HOURS = 24 * 7  # hourly view buckets kept for the trending score
+BLOG_TRENDING_UPDATE_INTERVAL = 900  # seconds between runs of update_trending_scores --loop
+SERVICE_COUNTS_CACHE_TIMEOUT = 3600  # seconds; the counts are also dropped on every service or category change
+SERVICE_SEARCH_CACHE_TIMEOUT = 300  # seconds; cached searches are also retired on every catalog change
+SERVICE_SEARCH_PAGE_SIZE = 12  # services per page of /api/v1/services/search/
+SERVICE_RATING_RECONCILE_INTERVAL = 24 * 60 * 60  # seconds between reconcile_service_ratings --loop runs
+RICH_TEXT_IMAGE_WIDTHS = (480, 960, 1440)  # widths of the image variants used in srcset
+RICH_TEXT_CACHE_TIMEOUT = 60 * 60 * 24  # rendered rich text is keyed by updated_at
+RICH_TEXT_VARIANT_POLL_INTERVAL = 10  # seconds between checks of generate_image_variants --loop
+RICH_TEXT_VARIANT_CLAIM_TIMEOUT = 10 * 60  # seconds a worker holds a claimed image before it is queued again
+OUTBOX_BATCH_SIZE = 50  # queued emails sent per connection
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 60  # seconds before the first retry, doubled after each failure
+OUTBOX_POLL_INTERVAL = 10  # seconds between checks of send_queued_mail --loop
+OUTBOX_CLAIM_TIMEOUT = 5 * 60  # seconds a worker holds claimed emails before others may retry them
 
 # Analytics and tracking
 GOOGLE_ANALYTICS_ID = config('GOOGLE_ANALYTICS_ID', default='')
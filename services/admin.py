@@ -9,10 +9,13 @@ from .models import (
     TaskSubmission, ServiceReview, CompanyInfo
 )
 from accounts.models import UserSkill
+from .counts import get_category_counts, invalidate_service_counts
+from .ratings import set_reviews_verified
+from .search import invalidate_search_results
 
 @admin.register(ServiceCategory)
 class ServiceCategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'service_count', 'is_active', 'order', 'created_at']
+    list_display = ['name', 'full_path', 'service_count', 'is_active', 'order', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'description']
     list_editable = ['is_active', 'order']
@@ -20,20 +23,24 @@ class ServiceCategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     
     def service_count(self, obj):
-        count = obj.services.count()
+        direct, total = get_category_counts(obj.pk)
         url = reverse('admin:services_service_changelist') + f'?category__id__exact={obj.id}'
-        return format_html('<a href="{}">{} services</a>', url, count)
-    service_count.short_description = 'Services'
+        return format_html('<a href="{}">{} services</a> ({} with subcategories)', url, direct, total)
+    service_count.short_description = 'Active services'
     
     actions = ['activate_categories', 'deactivate_categories']
     
     def activate_categories(self, request, queryset):
         queryset.update(is_active=True)
+        invalidate_service_counts()
+        invalidate_search_results()
         self.message_user(request, f"Successfully activated {queryset.count()} categories.")
     activate_categories.short_description = "Activate selected categories"
     
     def deactivate_categories(self, request, queryset):
         queryset.update(is_active=False)
+        invalidate_service_counts()
+        invalidate_search_results()
         self.message_user(request, f"Successfully deactivated {queryset.count()} categories.")
     deactivate_categories.short_description = "Deactivate selected categories"
 
@@ -52,7 +59,7 @@ class ServiceAdmin(admin.ModelAdmin):
     list_editable = ['is_featured', 'is_active']
     ordering = ['-created_at']
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ['total_enrollments', 'average_rating', 'created_at', 'updated_at']
+    readonly_fields = ['total_enrollments', 'average_rating', 'rating_count', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Basic Information', {
@@ -74,7 +81,7 @@ class ServiceAdmin(admin.ModelAdmin):
             'fields': ('is_active', 'is_featured')
         }),
         ('Statistics', {
-            'fields': ('total_enrollments', 'average_rating', 'created_at', 'updated_at'),
+            'fields': ('total_enrollments', 'average_rating', 'rating_count', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -97,21 +104,27 @@ class ServiceAdmin(admin.ModelAdmin):
     
     def feature_services(self, request, queryset):
         queryset.update(is_featured=True)
+        invalidate_search_results()
         self.message_user(request, f"Successfully featured {queryset.count()} services.")
     feature_services.short_description = "Feature selected services"
     
     def unfeature_services(self, request, queryset):
         queryset.update(is_featured=False)
+        invalidate_search_results()
         self.message_user(request, f"Successfully unfeatured {queryset.count()} services.")
     unfeature_services.short_description = "Unfeature selected services"
     
     def activate_services(self, request, queryset):
         queryset.update(is_active=True)
+        invalidate_service_counts()
+        invalidate_search_results()
         self.message_user(request, f"Successfully activated {queryset.count()} services.")
     activate_services.short_description = "Activate selected services"
     
     def deactivate_services(self, request, queryset):
         queryset.update(is_active=False)
+        invalidate_service_counts()
+        invalidate_search_results()
         self.message_user(request, f"Successfully deactivated {queryset.count()} services.")
     deactivate_services.short_description = "Deactivate selected services"
 
@@ -400,13 +413,13 @@ class ServiceReviewAdmin(admin.ModelAdmin):
     actions = ['verify_reviews', 'unverify_reviews']
     
     def verify_reviews(self, request, queryset):
-        queryset.update(is_verified=True)
-        self.message_user(request, f"Verified {queryset.count()} reviews.")
+        updated = set_reviews_verified(queryset, True)
+        self.message_user(request, f"Verified {updated} reviews.")
     verify_reviews.short_description = "Verify selected reviews"
     
     def unverify_reviews(self, request, queryset):
-        queryset.update(is_verified=False)
-        self.message_user(request, f"Unverified {queryset.count()} reviews.")
+        updated = set_reviews_verified(queryset, False)
+        self.message_user(request, f"Unverified {updated} reviews.")
     unverify_reviews.short_description = "Unverify selected reviews"
 
 @admin.register(CompanyInfo)
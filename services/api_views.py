@@ -5,6 +5,7 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import ServiceCategory, Service, ServiceReview
+from .search import search_services
 
 
 @extend_schema_view(
@@ -69,6 +70,12 @@ class ServiceViewSet(viewsets.ModelViewSet):
         serializer = ServiceListSerializer(featured_services, many=True)
         return Response(serializer.data)
 
+    @extend_schema(description="Search services; returns a page of results plus category, type, difficulty and price facet counts")
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Search services with facet counts"""
+        return Response(search_services(request.query_params, request))
+
 
 @extend_schema_view(
     list=extend_schema(description="List all service reviews"),
@@ -0,0 +1,58 @@
+"""
+Cached per-category service counts.
+
+One grouped query returns every category with its number of active
+services; walking the categories in reverse tree order (children before
+their parents) rolls the direct counts up into subtree totals. The result
+is cached until one of the receivers in ``services.signals`` drops it on a
+``Service`` or ``ServiceCategory`` change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import ServiceCategory
+
+SERVICE_COUNTS_CACHE_KEY = 'services:category-counts'
+
+
+def get_service_counts_timeout():
+    """Upper bound on the cache lifetime"""
+    return getattr(settings, 'SERVICE_COUNTS_CACHE_TIMEOUT', 3600)
+
+
+def build_service_counts():
+    """Return {category_id: (direct active services, subtree active services)}"""
+    categories = ServiceCategory.objects.order_by('tree_id', 'lft').annotate(
+        direct=Count('services', filter=Q(services__is_active=True))
+    ).values_list('pk', 'parent_id', 'direct')
+
+    direct = {}
+    totals = {}
+    for pk, parent_id, count in reversed(list(categories)):
+        direct[pk] = count
+        totals[pk] = totals.get(pk, 0) + count
+        if parent_id is not None:
+            totals[parent_id] = totals.get(parent_id, 0) + totals[pk]
+    return {pk: (direct[pk], totals[pk]) for pk in direct}
+
+
+def get_service_counts():
+    """Return the cached counts, computing them on a cache miss"""
+    counts = cache.get(SERVICE_COUNTS_CACHE_KEY)
+    if counts is None:
+        counts = build_service_counts()
+        cache.set(SERVICE_COUNTS_CACHE_KEY, counts, get_service_counts_timeout())
+    return counts
+
+
+def get_category_counts(category_id, counts=None):
+    """(direct, total) active services of one category"""
+    counts = get_service_counts() if counts is None else counts
+    return counts.get(category_id, (0, 0))
+
+
+def invalidate_service_counts():
+    """Drop the cached counts once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(SERVICE_COUNTS_CACHE_KEY))
@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the running rating totals of every service from its verified reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and reconcile once per interval')
+        parser.add_argument('--interval', type=int, help='Seconds between runs (defaults to SERVICE_RATING_RECONCILE_INTERVAL)')
+
+    def handle(self, *args, **options):
+        interval = options.get('interval') or getattr(settings, 'SERVICE_RATING_RECONCILE_INTERVAL', 24 * 60 * 60)
+
+        while True:
+            corrected = reconcile_ratings()
+            self.stdout.write(self.style.SUCCESS(f'Reconciled service ratings, {corrected} services corrected'))
+
+            if not options.get('loop'):
+                break
+            time.sleep(interval)
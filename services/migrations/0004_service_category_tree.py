@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:54
+
+import django.db.models.deletion
+import mptt.fields
+from django.db import migrations, models
+
+
+def build_tree(apps, schema_editor):
+    """Number the existing categories as nested sets, siblings by (order, name)"""
+    ServiceCategory = apps.get_model('services', 'ServiceCategory')
+    categories = list(ServiceCategory.objects.order_by('order', 'name'))
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+
+    def number(category, tree_id, level, counter):
+        category.tree_id, category.level, category.lft = tree_id, level, counter
+        counter += 1
+        for child in children.get(category.pk, []):
+            counter = number(child, tree_id, level + 1, counter)
+        category.rght = counter
+        return counter + 1
+
+    for tree_id, root in enumerate(children.get(None, []), start=1):
+        number(root, tree_id, 0, 1)
+    ServiceCategory.objects.bulk_update(categories, ['tree_id', 'level', 'lft', 'rght'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_servicecategory_meta_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicecategory',
+            name='level',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='servicecategory',
+            name='lft',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='servicecategory',
+            name='rght',
+            field=models.PositiveIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='servicecategory',
+            name='tree_id',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='servicecategory',
+            name='parent',
+            field=mptt.fields.TreeForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='services.servicecategory'),
+        ),
+        migrations.RunPython(build_tree, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+def fill_full_paths(apps, schema_editor):
+    ServiceCategory = apps.get_model('services', 'ServiceCategory')
+    categories = list(ServiceCategory.objects.order_by('tree_id', 'lft'))
+    paths = {}
+    # Tree order: every parent comes before its children
+    for category in categories:
+        parent_path = paths.get(category.parent_id)
+        category.full_path = f"{parent_path} > {category.name}" if parent_path else category.name
+        paths[category.pk] = category.full_path
+    ServiceCategory.objects.bulk_update(categories, ['full_path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_service_category_tree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicecategory',
+            name='full_path',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_full_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:01
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_totals(apps, schema_editor):
+    Service = apps.get_model('services', 'Service')
+    ServiceReview = apps.get_model('services', 'ServiceReview')
+    totals = ServiceReview.objects.filter(is_verified=True).values('service_id').annotate(
+        rating_sum=Sum('rating'), count=Count('pk')
+    ).order_by()
+    services = []
+    for row in totals:
+        service = Service(pk=row['service_id'], rating_sum=row['rating_sum'], rating_count=row['count'])
+        service.average_rating = round(row['rating_sum'] / row['count'], 2)
+        services.append(service)
+    Service.objects.bulk_update(services, ['rating_sum', 'rating_count', 'average_rating'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_service_category_full_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,29 @@
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from ckeditor_uploader.fields import RichTextUploadingField
 from mptt.models import MPTTModel, TreeForeignKey
 
+from core.slugs import save_unique
+
 User = get_user_model()
 
-class ServiceCategory(models.Model):
+class ServiceCategory(MPTTModel):
+    """
+    A node of the service category tree. django-mptt keeps nested set
+    columns (``tree_id``, ``lft``, ``rght``, ``level``) consistent on save,
+    so ancestors, descendants and subtree filters are single range queries.
+    """
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(unique=True, blank=True)
     description = models.TextField()
     icon = models.CharField(max_length=50, help_text="Font Awesome icon class")
     color = models.CharField(max_length=7, default="#0070f2", help_text="Hex color code")
     
-    # Add parent field first without MPTT
-    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    parent = TreeForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    
+    # "Technology > Web Development > Frontend", kept up to date for the subtree on rename and move
+    full_path = models.TextField(blank=True, editable=False)
     
     # Meta fields
     is_active = models.BooleanField(default=True)
@@ -26,65 +35,90 @@ class ServiceCategory(models.Model):
     meta_title = models.CharField(max_length=200, blank=True, help_text="SEO title (leave blank to use name)")
     meta_description = models.TextField(max_length=300, blank=True, help_text="SEO description")
     
+    class MPTTMeta:
+        order_insertion_by = ['order', 'name']
+    
     class Meta:
         ordering = ['order', 'name']
         verbose_name_plural = "Service Categories"
     
+    PATH_SEPARATOR = ' > '
+    
     def __str__(self):
-        return self.get_full_name()
+        return self.full_path or self.name
     
     def save(self, *args, **kwargs):
+        full_path = self.build_full_path()
+        path_changed = not self._state.adding and full_path != self.full_path
+        self.full_path = full_path
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'full_path'}
+        
         if not self.slug:
             from django.utils.text import slugify
-            base_slug = slugify(self.name)
-            slug = base_slug
-            counter = 1
-            
-            # Ensure slug uniqueness
-            while ServiceCategory.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            
-            self.slug = slug
-            
-        super().save(*args, **kwargs)
+            save_unique(self, 'slug', slugify(self.name) or 'category',
+                        lambda: super(ServiceCategory, self).save(*args, **kwargs))
+        else:
+            super().save(*args, **kwargs)
+        
+        if path_changed:
+            self.update_descendant_paths()
+    
+    def build_full_path(self):
+        if self.parent_id is None:
+            return self.name
+        return f"{self.parent.full_path}{self.PATH_SEPARATOR}{self.name}"
+    
+    def refresh_full_path(self):
+        """Bring ``full_path`` of this node and its subtree in line with its parent row"""
+        parent_path = ServiceCategory.objects.filter(pk=self.parent_id).values_list('full_path', flat=True).first()
+        full_path = f"{parent_path}{self.PATH_SEPARATOR}{self.name}" if parent_path is not None else self.name
+        if full_path == self.full_path:
+            return
+        self.full_path = full_path
+        ServiceCategory.objects.filter(pk=self.pk).update(full_path=full_path)
+        self.update_descendant_paths()
+    
+    def update_descendant_paths(self):
+        """Recompute ``full_path`` of the whole subtree with one query and one bulk update"""
+        paths = {self.pk: self.full_path}
+        descendants = list(self.get_descendants().order_by('lft'))
+        # Tree order: every parent comes before its children
+        for category in descendants:
+            category.full_path = f"{paths[category.parent_id]}{self.PATH_SEPARATOR}{category.name}"
+            paths[category.pk] = category.full_path
+        ServiceCategory.objects.bulk_update(descendants, ['full_path'], batch_size=500)
     
     def get_absolute_url(self):
         return reverse('services:category_detail', kwargs={'slug': self.slug})
     
     def get_full_name(self):
         """Return the full category path like 'Technology > Web Development > Frontend'"""
-        if self.parent:
-            return f"{self.parent.get_full_name()} > {self.name}"
-        return self.name
+        return self.full_path or self.name
     
     def get_breadcrumb_path(self):
         """Return list of categories from root to current for breadcrumbs"""
-        path = []
-        current = self
-        while current:
-            path.insert(0, current)
-            current = current.parent
-        return path
+        if self.is_root_node():
+            return [self]
+        return [*self.get_ancestors(), self]
     
     def get_all_services(self):
         """Get all services in this category and its subcategories"""
-        def get_descendants(category):
-            descendants = [category]
-            for child in category.children.all():
-                descendants.extend(get_descendants(child))
-            return descendants
-        
-        descendant_categories = get_descendants(self)
-        return Service.objects.filter(category__in=descendant_categories, is_active=True)
+        return Service.objects.filter(
+            category__tree_id=self.tree_id,
+            category__lft__range=(self.lft, self.rght),
+            is_active=True
+        )
     
     def get_direct_services_count(self):
         """Get count of services directly in this category (not subcategories)"""
-        return self.services.filter(is_active=True).count()
+        from .counts import get_category_counts
+        return get_category_counts(self.pk)[0]
     
     def get_total_services_count(self):
         """Get total count of services in this category and all subcategories"""
-        return self.get_all_services().count()
+        from .counts import get_category_counts
+        return get_category_counts(self.pk)[1]
     
     def get_subcategories(self):
         """Get direct subcategories only"""
@@ -96,30 +130,25 @@ class ServiceCategory(models.Model):
     
     def is_root_category(self):
         """Check if this is a root category (no parent)"""
-        return self.parent is None
+        return self.parent_id is None
     
     def get_root_category(self):
         """Get the root category of this category"""
-        current = self
-        while current.parent:
-            current = current.parent
-        return current
-    
-    def get_siblings(self):
-        """Get sibling categories (same parent level)"""
-        if self.parent:
-            return self.parent.children.filter(is_active=True).exclude(pk=self.pk)
-        else:
-            return ServiceCategory.objects.filter(parent=None, is_active=True).exclude(pk=self.pk)
+        return self.get_root()
+    
+    def get_siblings(self, include_self=False):
+        """Get active sibling categories (same parent level)"""
+        siblings = ServiceCategory.objects.filter(parent_id=self.parent_id, is_active=True)
+        return siblings if include_self else siblings.exclude(pk=self.pk)
     
     def get_level(self):
         """Get the depth level of this category"""
-        level = 0
-        current = self.parent
-        while current:
-            level += 1
-            current = current.parent
-        return level
+        return self.level
+    
+    @property
+    def depth(self):
+        """Depth in the tree (roots are 0), stored by MPTT as ``level``"""
+        return self.level
 
 class Service(models.Model):
     DIFFICULTY_LEVELS = (
@@ -166,15 +195,34 @@ class Service(models.Model):
     is_featured = models.BooleanField(default=False)
     total_enrollments = models.PositiveIntegerField(default=0)
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
+    # Running totals of verified review ratings, kept by services.ratings
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-is_featured', '-created_at']
     
+    # Written only by services.ratings' UPDATEs
+    RATING_FIELDS = ('rating_sum', 'rating_count', 'average_rating')
+    
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        # Saving a loaded service (e.g. from the admin form) must not put back
+        # the rating totals it was loaded with
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = [name for name in update_fields if name not in self.RATING_FIELDS]
+        elif not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
     def get_absolute_url(self):
         return reverse('services:service_detail', kwargs={'slug': self.slug})
     
@@ -434,6 +482,21 @@ class ServiceReview(models.Model):
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.service.title} ({self.rating}/5)"
+    
+    def save(self, *args, **kwargs):
+        # The post_save receiver adjusts the service totals from the row as
+        # stored, which stays locked until this transaction commits
+        with transaction.atomic():
+            self._rating_state = self.stored_rating_state()
+            super().save(*args, **kwargs)
+    
+    def stored_rating_state(self):
+        """Lock the stored review and return its (service_id, is_verified, rating), or None"""
+        if self._state.adding or self.pk is None:
+            return None
+        return ServiceReview.objects.select_for_update().filter(pk=self.pk).values_list(
+            'service_id', 'is_verified', 'rating'
+        ).first()
 
 class CompanyInfo(models.Model):
     name = models.CharField(max_length=200, default="Debsploit Solutions")
@@ -0,0 +1,127 @@
+"""
+Running service ratings.
+
+Each service keeps the sum and count of its verified review ratings.
+Creating, editing, deleting, verifying or unverifying reviews adjusts
+them with a relative F() UPDATE (one statement for any number of
+services) instead of re-averaging every review, and ``average_rating`` is
+then derived from the new totals by a second UPDATE in the same
+transaction. The ``reconcile_service_ratings`` command rebuilds all
+totals from the reviews with one grouped query.
+"""
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, FloatField, IntegerField, Sum, Value, When
+)
+from django.db.models.functions import Cast, Round
+
+from .models import Service, ServiceReview
+
+
+def contribution(is_verified, rating):
+    """(rating sum, rating count) a review adds to its service"""
+    return (rating, 1) if is_verified else (0, 0)
+
+
+def average_rating_expression():
+    return Case(
+        When(rating_count=0, then=Value(0)),
+        default=ExpressionWrapper(
+            Round(Cast('rating_sum', FloatField()) / F('rating_count'), 2),
+            output_field=DecimalField(max_digits=3, decimal_places=2)
+        ),
+        output_field=DecimalField(max_digits=3, decimal_places=2)
+    )
+
+
+def _by_service(values):
+    return Case(
+        *[When(pk=service_id, then=Value(value)) for service_id, value in values.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def adjust_ratings(deltas):
+    """
+    Apply {service_id: (rating sum delta, rating count delta)} atomically.
+
+    The totals and the average are written by separate UPDATEs so the
+    average is computed from the new totals on every database (MySQL
+    evaluates assignments of one UPDATE left to right).
+    """
+    deltas = {service_id: delta for service_id, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+    services = Service.objects.filter(pk__in=list(deltas))
+    with transaction.atomic():
+        services.update(
+            rating_sum=F('rating_sum') + _by_service({pk: delta[0] for pk, delta in deltas.items()}),
+            rating_count=F('rating_count') + _by_service({pk: delta[1] for pk, delta in deltas.items()}),
+        )
+        services.update(average_rating=average_rating_expression())
+
+
+def review_changed(old_state, new_state):
+    """
+    Adjust the ratings for one saved or deleted review. Both states are the
+    (service_id, is_verified, rating) read from the locked row before and
+    after the change, or None where there was no row.
+    """
+    deltas = {}
+    if old_state:
+        service_id, is_verified, rating = old_state
+        rating_sum, count = contribution(is_verified, rating)
+        deltas[service_id] = (-rating_sum, -count)
+    if new_state:
+        service_id, is_verified, rating = new_state
+        rating_sum, count = contribution(is_verified, rating)
+        previous = deltas.get(service_id, (0, 0))
+        deltas[service_id] = (previous[0] + rating_sum, previous[1] + count)
+    adjust_ratings(deltas)
+
+
+def set_reviews_verified(queryset, verified=True):
+    """Verify or unverify reviews in bulk, adjusting their services' ratings; returns the count changed"""
+    with transaction.atomic():
+        review_ids = list(
+            queryset.filter(is_verified=not verified).select_for_update().values_list('pk', flat=True)
+        )
+        if not review_ids:
+            return 0
+        changing = ServiceReview.objects.filter(pk__in=review_ids)
+        totals = changing.values('service_id').annotate(rating_sum=Sum('rating'), count=Count('pk')).order_by()
+        sign = 1 if verified else -1
+        deltas = {row['service_id']: (sign * row['rating_sum'], sign * row['count']) for row in totals}
+        changed = changing.update(is_verified=verified)
+        adjust_ratings(deltas)
+    return changed
+
+
+def reconcile_ratings(service_ids=None):
+    """
+    Rebuild the rating totals of all services (or of ``service_ids``) from
+    their verified reviews with one grouped query; returns services corrected.
+    """
+    services = Service.objects.all()
+    reviews = ServiceReview.objects.filter(is_verified=True)
+    if service_ids is not None:
+        services = services.filter(pk__in=service_ids)
+        reviews = reviews.filter(service_id__in=service_ids)
+    with transaction.atomic():
+        # Locking the services first holds back concurrent adjustments until
+        # the new totals are written
+        current = list(services.select_for_update().values_list('pk', 'rating_sum', 'rating_count'))
+        totals = {
+            row['service_id']: (row['rating_sum'], row['count'])
+            for row in reviews.values('service_id').annotate(rating_sum=Sum('rating'), count=Count('pk')).order_by()
+        }
+        stale = {}
+        for service_id, rating_sum, count in current:
+            expected = totals.get(service_id, (0, 0))
+            if (rating_sum, count) != expected:
+                stale[service_id] = (expected[0] - rating_sum, expected[1] - count)
+        adjust_ratings(stale)
+        # Also repairs averages that were written by hand or before the totals existed
+        services.update(average_rating=average_rating_expression())
+    return len(stale)
@@ -0,0 +1,251 @@
+"""
+Faceted service catalog search.
+
+``search_services()`` normalizes the query string (search terms, category,
+type, difficulty, price bucket, sort, page) and returns a page of matching
+services together with facet counts. The counts of every facet value come
+from one ``aggregate()`` of conditional ``Count``s, each applying all
+filters except the facet's own, so the UI can show how many services each
+alternative would give. Search terms match title and description; category
+names are matched in memory against the category list, so no join to
+``category__name`` is needed. Services in an inactive category (or under
+an inactive ancestor) are left out like inactive services.
+
+The ids of the page and the counts are cached per normalized query; the
+page itself is loaded and serialized per request, so image URLs are
+absolute for the requesting host. Any ``Service`` or ``ServiceCategory``
+change moves the cache to a new version (see ``services.signals``), which
+retires all cached searches at once.
+"""
+import hashlib
+import math
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, When
+
+from .models import Service, ServiceCategory
+
+SEARCH_CACHE_KEY = 'services:search:ids:{}:{}'
+SEARCH_VERSION_KEY = 'services:search:version'
+MAX_SEARCH_LENGTH = 100
+
+# (value, label, minimum, maximum) of the effective price; maximum is exclusive
+PRICE_BUCKETS = [
+    ('under-5000', 'Under 5,000', None, 5000),
+    ('5000-20000', '5,000 - 20,000', 5000, 20000),
+    ('20000-50000', '20,000 - 50,000', 20000, 50000),
+    ('50000-plus', '50,000 and above', 50000, None),
+]
+SORT_OPTIONS = ['price', '-price', 'title', '-title', 'created_at', '-created_at']
+
+
+def get_search_cache_timeout():
+    return getattr(settings, 'SERVICE_SEARCH_CACHE_TIMEOUT', 300)
+
+
+def get_search_page_size():
+    return getattr(settings, 'SERVICE_SEARCH_PAGE_SIZE', 12)
+
+
+def normalize_query(params):
+    """The recognised parameters with canonical values; unknown values are dropped"""
+    search = ' '.join(params.get('search', '').lower().split())[:MAX_SEARCH_LENGTH]
+    service_type = params.get('type', '')
+    difficulty = params.get('difficulty', '')
+    price = params.get('price', '')
+    sort = params.get('sort', '-created_at')
+    page = params.get('page', '1')
+
+    return {
+        'search': search,
+        'category': params.get('category', '').strip().lower(),
+        'type': service_type if service_type in dict(Service.SERVICE_TYPES) else '',
+        'difficulty': difficulty if difficulty in dict(Service.DIFFICULTY_LEVELS) else '',
+        'price': price if price in {bucket[0] for bucket in PRICE_BUCKETS} else '',
+        'sort': sort if sort in SORT_OPTIONS else '-created_at',
+        'page': max(int(page), 1) if page.isdigit() else 1,
+    }
+
+
+def get_search_version():
+    version = cache.get(SEARCH_VERSION_KEY)
+    if version is None:
+        cache.add(SEARCH_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(SEARCH_VERSION_KEY)
+    return version
+
+
+def invalidate_search_results():
+    """Retire every cached search once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(SEARCH_VERSION_KEY, uuid.uuid4().hex, timeout=None))
+
+
+def search_cache_key(query):
+    digest = hashlib.md5(urlencode(sorted(query.items())).encode()).hexdigest()
+    return SEARCH_CACHE_KEY.format(get_search_version(), digest)
+
+
+def effective_price():
+    """SQL version of ``Service.effective_price``, annotated as ``price_paid``"""
+    return Case(
+        When(discount_price__isnull=False, discount_price__lt=F('price'), then=F('discount_price')),
+        default=F('price'),
+    )
+
+
+def price_filter(value):
+    for bucket, _, minimum, maximum in PRICE_BUCKETS:
+        if bucket == value:
+            condition = Q()
+            if minimum is not None:
+                condition &= Q(price_paid__gte=minimum)
+            if maximum is not None:
+                condition &= Q(price_paid__lt=maximum)
+            return condition
+    return Q()
+
+
+def _count(condition):
+    return Count('pk', filter=condition) if condition else Count('pk')
+
+
+def _subtree_ids(categories, slug):
+    selected = next((category for category in categories if category['slug'] == slug), None)
+    if selected is None:
+        return []
+    return [
+        category['pk'] for category in categories
+        if category['tree_id'] == selected['tree_id']
+        and selected['lft'] <= category['lft'] <= selected['rght']
+    ]
+
+
+def _visible_categories(categories):
+    """Ids of the active categories whose ancestors are all active (tree order lists parents first)"""
+    visible = set()
+    for category in categories:
+        if category['is_active'] and (category['parent_id'] is None or category['parent_id'] in visible):
+            visible.add(category['pk'])
+    return visible
+
+
+def _category_facet(categories, direct, selected_slug):
+    """Roll direct counts up the tree (reverse tree order visits children first)"""
+    totals = {}
+    for category in reversed(categories):
+        pk = category['pk']
+        totals[pk] = totals.get(pk, 0) + direct.get(pk, 0)
+        if category['parent_id'] is not None:
+            totals[category['parent_id']] = totals.get(category['parent_id'], 0) + totals[pk]
+    return [
+        {
+            'slug': category['slug'],
+            'name': category['name'],
+            'full_path': category['full_path'],
+            'depth': category['level'],
+            'count': totals[category['pk']],
+        }
+        for category in categories
+        if totals[category['pk']] or category['slug'] == selected_slug
+    ]
+
+
+def run_search(query):
+    """Uncached search: one categories query, one aggregate and one page query"""
+    categories = list(ServiceCategory.objects.order_by('tree_id', 'lft').values(
+        'pk', 'parent_id', 'name', 'slug', 'full_path', 'level', 'tree_id', 'lft', 'rght', 'is_active'
+    ))
+    visible = _visible_categories(categories)
+    categories = [category for category in categories if category['pk'] in visible]
+
+    services = Service.objects.filter(is_active=True, category_id__in=visible).annotate(price_paid=effective_price())
+    for term in query['search'].split():
+        matching_categories = [category['pk'] for category in categories if term in category['name'].lower()]
+        condition = Q(title__icontains=term) | Q(description__icontains=term)
+        if matching_categories:
+            condition |= Q(category_id__in=matching_categories)
+        services = services.filter(condition)
+
+    filters = {}
+    if query['category']:
+        filters['category'] = Q(category_id__in=_subtree_ids(categories, query['category']))
+    if query['type']:
+        filters['type'] = Q(service_type=query['type'])
+    if query['difficulty']:
+        filters['difficulty'] = Q(difficulty_level=query['difficulty'])
+    if query['price']:
+        filters['price'] = price_filter(query['price'])
+
+    def all_filters_except(facet=None):
+        condition = Q()
+        for name, facet_filter in filters.items():
+            if name != facet:
+                condition &= facet_filter
+        return condition
+
+    aggregates = {'total': _count(all_filters_except())}
+    for category in categories:
+        aggregates[f"category_{category['pk']}"] = _count(
+            Q(category_id=category['pk']) & all_filters_except('category')
+        )
+    for value, _ in Service.SERVICE_TYPES:
+        aggregates[f'type_{value}'] = _count(Q(service_type=value) & all_filters_except('type'))
+    for value, _ in Service.DIFFICULTY_LEVELS:
+        aggregates[f'difficulty_{value}'] = _count(Q(difficulty_level=value) & all_filters_except('difficulty'))
+    for value, *_ in PRICE_BUCKETS:
+        aggregates[f'price_{value}'] = _count(price_filter(value) & all_filters_except('price'))
+    counts = services.aggregate(**aggregates)
+
+    page_size = get_search_page_size()
+    num_pages = max(math.ceil(counts['total'] / page_size), 1)
+    page = min(query['page'], num_pages)
+    start = (page - 1) * page_size
+    results = services.filter(all_filters_except()).order_by(query['sort'], '-pk')
+
+    direct = {category['pk']: counts[f"category_{category['pk']}"] for category in categories}
+    return {
+        'count': counts['total'],
+        'page': page,
+        'num_pages': num_pages,
+        'query': query,
+        'result_ids': list(results.values_list('pk', flat=True)[start:start + page_size]),
+        'facets': {
+            'category': _category_facet(categories, direct, query['category']),
+            'service_type': [
+                {'value': value, 'label': label, 'count': counts[f'type_{value}']}
+                for value, label in Service.SERVICE_TYPES
+            ],
+            'difficulty_level': [
+                {'value': value, 'label': label, 'count': counts[f'difficulty_{value}']}
+                for value, label in Service.DIFFICULTY_LEVELS
+            ],
+            'price': [
+                {'value': value, 'label': label, 'count': counts[f'price_{value}']}
+                for value, label, *_ in PRICE_BUCKETS
+            ],
+        },
+    }
+
+
+def search_services(params, request=None):
+    """Search results and facet counts for a query string, cached per normalized query"""
+    from .serializers import ServiceListSerializer
+
+    query = normalize_query(params)
+    key = search_cache_key(query)
+    result = cache.get(key)
+    if result is None:
+        result = run_search(query)
+        cache.set(key, result, get_search_cache_timeout())
+
+    result = dict(result)
+    ids = result.pop('result_ids')
+    services = Service.objects.select_related('category').in_bulk(ids)
+    result['results'] = ServiceListSerializer(
+        [services[pk] for pk in ids if pk in services], many=True, context={'request': request}
+    ).data
+    return result
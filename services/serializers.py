@@ -1,22 +1,37 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
+from core.rendering import render_rich_text
 from .models import ServiceCategory, Service, ServiceReview
+from .counts import get_category_counts, get_service_counts
 
 
 class ServiceCategorySerializer(serializers.ModelSerializer):
     services_count = serializers.SerializerMethodField()
+    total_services_count = serializers.SerializerMethodField()
+    depth = serializers.IntegerField(source='level', read_only=True)
     
     class Meta:
         model = ServiceCategory
         fields = [
             'id', 'name', 'slug', 'description', 'icon', 'color', 'parent',
-            'is_active', 'order', 'services_count', 'created_at', 'updated_at'
+            'full_path', 'depth', 'is_active', 'order', 'services_count',
+            'total_services_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['slug', 'created_at', 'updated_at']
+        read_only_fields = ['slug', 'full_path', 'created_at', 'updated_at']
+
+    def _counts(self, obj):
+        # Cached counts for all categories, fetched once per response
+        if 'service_counts' not in self.context:
+            self.context['service_counts'] = get_service_counts()
+        return get_category_counts(obj.pk, self.context['service_counts'])
 
     @extend_schema_field(serializers.IntegerField())
     def get_services_count(self, obj) -> int:
-        return obj.services.filter(is_active=True).count()
+        return self._counts(obj)[0]
+
+    @extend_schema_field(serializers.IntegerField())
+    def get_total_services_count(self, obj) -> int:
+        return self._counts(obj)[1]
 
 
 class ServiceListSerializer(serializers.ModelSerializer):
@@ -33,17 +48,22 @@ class ServiceListSerializer(serializers.ModelSerializer):
 
 class ServiceDetailSerializer(serializers.ModelSerializer):
     category = ServiceCategorySerializer(read_only=True)
+    detailed_description_html = serializers.SerializerMethodField()
     
     class Meta:
         model = Service
         fields = [
             'id', 'title', 'slug', 'category', 'description', 'detailed_description',
-            'service_type', 'difficulty_level', 'featured_image', 'video_url',
+            'detailed_description_html', 'service_type', 'difficulty_level', 'featured_image', 'video_url',
             'price', 'discount_price', 'currency', 'duration_weeks', 'max_participants',
             'prerequisites', 'required_tools', 'is_featured', 'is_active',
             'average_rating', 'created_at', 'updated_at'
         ]
 
+    @extend_schema_field(serializers.CharField())
+    def get_detailed_description_html(self, obj) -> str:
+        return render_rich_text(obj, 'detailed_description')
+
 
 class ServiceReviewSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
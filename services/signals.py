@@ -1,10 +1,15 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
+from mptt.signals import node_moved
 
-from .models import Enrollment, Task, TaskApplication, TaskSubmission, ServiceReview
+from core.mail import queue_mail
+
+from .models import Enrollment, Task, TaskApplication, TaskSubmission, Service, ServiceCategory, ServiceReview
+from .counts import invalidate_service_counts
+from .ratings import review_changed
+from .search import invalidate_search_results
 from accounts.models import UserNotification, UserAchievement
 from dashboard.models import UserActivity
 
@@ -214,16 +219,41 @@ def service_review_submitted(sender, instance, created, **kwargs):
             activity_type='review_posted',
             description=f'Reviewed service: {instance.service.title}'
         )
-        
-        # Update service average rating
-        from django.db.models import Avg
-        avg_rating = ServiceReview.objects.filter(
-            service=instance.service,
-            is_verified=True
-        ).aggregate(avg=Avg('rating'))['avg']
-        
-        instance.service.average_rating = avg_rating or 0
-        instance.service.save()
+
+@receiver(post_save, sender=ServiceReview)
+def service_review_saved(sender, instance, created, **kwargs):
+    """Move the review's rating into or out of its service's running totals"""
+    # ServiceReview.save locked the row and kept its previous state; the new
+    # state is read back so fields the save didn't write come from the row
+    old_state = getattr(instance, '_rating_state', None)
+    instance._rating_state = instance.stored_rating_state()
+    review_changed(old_state, instance._rating_state)
+
+@receiver(pre_delete, sender=ServiceReview)
+def service_review_deleting(sender, instance, **kwargs):
+    """Lock the review being deleted and keep what it contributed to the totals"""
+    instance._rating_state = instance.stored_rating_state()
+
+@receiver(post_delete, sender=ServiceReview)
+def service_review_deleted(sender, instance, **kwargs):
+    """Take a deleted review's rating out of its service's running totals"""
+    # Nothing to take out if another delete removed the row first
+    review_changed(getattr(instance, '_rating_state', None), None)
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def service_catalog_changed(sender, **kwargs):
+    """Services and categories feed the cached category counts and searches"""
+    invalidate_service_counts()
+    invalidate_search_results()
+
+@receiver(node_moved, sender=ServiceCategory)
+def service_category_moved(sender, instance, **kwargs):
+    """Tree moves (``move_to``, ``TreeManager.move_node``) rewrite the subtree's full paths"""
+    # A no-op when the move went through ServiceCategory.save
+    instance.refresh_full_path()
 
 def send_enrollment_welcome_email(enrollment):
     """Send welcome email to newly enrolled student"""
@@ -245,15 +275,14 @@ def send_enrollment_welcome_email(enrollment):
         The Debsploit Solutions Team
         '''
         
-        send_mail(
+        queue_mail(
             subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[enrollment.user.email],
-            fail_silently=True,
         )
     except Exception as e:
-        print(f"Failed to send enrollment welcome email: {e}")
+        print(f"Failed to queue enrollment welcome email: {e}")
 
 def send_task_assignment_email(task):
     """Send email notification for task assignment"""
@@ -278,12 +307,11 @@ def send_task_assignment_email(task):
         The Debsploit Solutions Team
         '''
         
-        send_mail(
+        queue_mail(
             subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[task.assigned_to.email],
-            fail_silently=True,
         )
     except Exception as e:
-        print(f"Failed to send task assignment email: {e}")
\ No newline at end of file
+        print(f"Failed to queue task assignment email: {e}")
\ No newline at end of file
@@ -1,3 +1,380 @@
+import importlib
+from decimal import Decimal
+from unittest import mock
+
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from mptt.signals import node_moved
+from rest_framework.test import APIClient
+
+from .admin import ServiceCategoryAdmin
+from .counts import build_service_counts, get_category_counts
+from .models import Service, ServiceCategory, ServiceReview
+from .ratings import reconcile_ratings, set_reviews_verified
+
+SEARCH_URL = '/api/v1/services/search/'
+
+
+class ServiceSearchTests(TestCase):
+    """Facet counts, visibility of inactive categories and cache invalidation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.technology = ServiceCategory.objects.create(name='Technology', description='Tech', icon='fa-laptop')
+        cls.web = ServiceCategory.objects.create(name='Web', description='Web', icon='fa-code', parent=cls.technology)
+        cls.security = ServiceCategory.objects.create(name='Security', description='Security', icon='fa-lock')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.create_service('Python Bootcamp', self.technology, 4000)
+        self.create_service('Django Course', self.web, 15000, difficulty_level='intermediate', featured_image='service_images/django.png')
+        self.create_service('Ethical Hacking', self.security, 60000, service_type='consultation')
+
+    def create_service(self, title, category, price, **kwargs):
+        return Service.objects.create(
+            title=title, slug=title.lower().replace(' ', '-'), category=category, description=title,
+            detailed_description=f'<p>{title}</p>', price=price, duration_weeks=4, **kwargs
+        )
+
+    def search(self, **params):
+        response = self.client.get(SEARCH_URL, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def facet(self, data, name, key='value'):
+        return {item[key]: item['count'] for item in data['facets'][name]}
+
+    def test_facet_counts_ignore_their_own_filter(self):
+        data = self.search(category='technology', difficulty='beginner')
+
+        self.assertEqual([service['title'] for service in data['results']], ['Python Bootcamp'])
+        # Category counts roll up the tree and keep the other filters
+        self.assertEqual(self.facet(data, 'category', 'slug'), {'technology': 1, 'security': 1})
+        self.assertEqual(self.facet(data, 'difficulty_level'), {'beginner': 1, 'intermediate': 1, 'advanced': 0})
+        self.assertEqual(self.facet(data, 'price')['under-5000'], 1)
+
+    def test_category_filter_includes_subcategories(self):
+        data = self.search(category='technology')
+        self.assertEqual({service['title'] for service in data['results']}, {'Python Bootcamp', 'Django Course'})
+
+        data = self.search(category='web')
+        self.assertEqual([service['title'] for service in data['results']], ['Django Course'])
+
+    def test_image_urls_are_absolute_per_host(self):
+        data = self.search(search='django')
+        self.assertEqual(data['results'][0]['featured_image'], 'http://testserver/media/service_images/django.png')
+
+        # The cached entry carries no host
+        response = self.client.get(SEARCH_URL, {'search': 'django'}, HTTP_HOST='example.com')
+        self.assertEqual(response.data['results'][0]['featured_image'], 'http://example.com/media/service_images/django.png')
+
+    def test_inactive_categories_hide_their_subtree(self):
+        self.technology.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.technology.save()
+
+        data = self.search()
+        self.assertEqual([service['title'] for service in data['results']], ['Ethical Hacking'])
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(self.facet(data, 'category', 'slug'), {'security': 1})
+        self.assertEqual(self.facet(data, 'service_type')['training'], 0)
+
+    def test_changes_retire_cached_searches(self):
+        self.assertEqual(self.search()['count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_service('Network Setup', self.security, 8000, service_type='installation')
+        self.assertEqual(self.search()['count'], 4)
+
+        # Bulk admin actions bypass the signals and invalidate explicitly
+        with mock.patch.object(ServiceCategoryAdmin, 'message_user'):
+            with self.captureOnCommitCallbacks(execute=True):
+                ServiceCategoryAdmin(ServiceCategory, admin.site).deactivate_categories(
+                    None, ServiceCategory.objects.filter(pk=self.security.pk)
+                )
+        self.assertEqual(self.search()['count'], 2)
+
+
+class ServiceRatingTests(TestCase):
+    """Running rating totals kept by the review signals and services.ratings"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ServiceCategory.objects.create(name='Technology', description='Tech', icon='fa-laptop')
+        cls.python, cls.django = [
+            Service.objects.create(
+                title=title, slug=title.lower(), category=category, description=title,
+                detailed_description=f'<p>{title}</p>', price=4000, duration_weeks=4
+            )
+            for title in ('Python', 'Django')
+        ]
+        User = get_user_model()
+        cls.jane = User.objects.create_user('jane@example.com', 'Jane', 'Doe', 'password123')
+        cls.john = User.objects.create_user('john@example.com', 'John', 'Doe', 'password123')
+
+    def review(self, user, rating, service=None, **kwargs):
+        return ServiceReview.objects.create(
+            service=service or self.python, user=user, rating=rating, title='Review', comment='Review', **kwargs
+        )
+
+    def assertRating(self, service, rating_sum, count, average):
+        service.refresh_from_db()
+        self.assertEqual((service.rating_sum, service.rating_count), (rating_sum, count))
+        self.assertEqual(service.average_rating, Decimal(average))
+
+    def test_saving_and_deleting_reviews_adjusts_totals(self):
+        review = self.review(self.jane, 5)
+        self.assertRating(self.python, 0, 0, '0')
+
+        review.is_verified = True
+        review.save()
+        self.review(self.john, 4, is_verified=True)
+        self.assertRating(self.python, 9, 2, '4.50')
+
+        review.rating = 2
+        review.service = self.django
+        review.save()
+        self.assertRating(self.python, 4, 1, '4.00')
+        self.assertRating(self.django, 2, 1, '2.00')
+
+        review.delete()
+        ServiceReview.objects.filter(user=self.john).delete()
+        self.assertRating(self.python, 0, 0, '0')
+        self.assertRating(self.django, 0, 0, '0')
+
+    def test_stale_instances_count_a_review_once(self):
+        review = self.review(self.jane, 5)
+        first, second = ServiceReview.objects.get(pk=review.pk), ServiceReview.objects.get(pk=review.pk)
+
+        first.is_verified = True
+        first.save()
+        second.is_verified = True
+        second.save()
+        self.assertRating(self.python, 5, 1, '5.00')
+
+        first.delete()
+        second.delete()
+        self.assertRating(self.python, 0, 0, '0')
+
+    def test_partial_save_uses_the_stored_fields(self):
+        review = self.review(self.jane, 5, is_verified=True)
+        stale = ServiceReview.objects.get(pk=review.pk)
+        set_reviews_verified(ServiceReview.objects.filter(pk=review.pk), False)
+
+        # The stale is_verified isn't written, so it mustn't be counted
+        stale.title = 'Updated'
+        stale.save(update_fields=['title'])
+        self.assertRating(self.python, 0, 0, '0')
+
+        ServiceReview.objects.only('pk').get(pk=review.pk).save()
+        self.assertRating(self.python, 0, 0, '0')
+
+    def test_service_save_keeps_the_totals(self):
+        stale = Service.objects.get(pk=self.python.pk)
+        self.review(self.jane, 4, is_verified=True)
+
+        # As the admin form does with the totals it loaded
+        stale.title = 'Python Basics'
+        stale.save()
+        stale.save(update_fields=['title', 'rating_sum', 'rating_count', 'average_rating'])
+        self.assertRating(self.python, 4, 1, '4.00')
+        self.assertEqual(self.python.title, 'Python Basics')
+
+    def test_set_reviews_verified(self):
+        self.review(self.jane, 5)
+        self.review(self.john, 3)
+        self.review(self.jane, 4, service=self.django)
+
+        self.assertEqual(set_reviews_verified(ServiceReview.objects.all(), True), 3)
+        self.assertRating(self.python, 8, 2, '4.00')
+        self.assertRating(self.django, 4, 1, '4.00')
+        # Already verified reviews aren't counted twice
+        self.assertEqual(set_reviews_verified(ServiceReview.objects.all(), True), 0)
+
+        self.assertEqual(set_reviews_verified(ServiceReview.objects.filter(user=self.jane), False), 2)
+        self.assertRating(self.python, 3, 1, '3.00')
+        self.assertRating(self.django, 0, 0, '0')
+
+    def test_reconcile_ratings_repairs_drift(self):
+        self.review(self.jane, 5, is_verified=True)
+        self.review(self.john, 2, is_verified=True)
+        Service.objects.filter(pk=self.python.pk).update(rating_sum=1, rating_count=5, average_rating=1)
+        Service.objects.filter(pk=self.django.pk).update(average_rating=3)
+
+        self.assertEqual(reconcile_ratings(), 1)
+        self.assertRating(self.python, 7, 2, '3.50')
+        self.assertRating(self.django, 0, 0, '0')
+        self.assertEqual(reconcile_ratings(), 0)
+
+    def test_migration_fills_totals_from_verified_reviews(self):
+        self.review(self.jane, 5, is_verified=True)
+        self.review(self.john, 4, is_verified=True)
+        self.review(self.jane, 1, service=self.django)
+        Service.objects.update(rating_sum=0, rating_count=0, average_rating=0)
+
+        migration = importlib.import_module('services.migrations.0006_service_rating_totals')
+        migration.fill_rating_totals(apps, None)
+        self.assertRating(self.python, 9, 2, '4.50')
+        self.assertRating(self.django, 0, 0, '0')
+
+
+class ServiceCountTests(TestCase):
+    """Direct and subtree counts of active services come from one cached grouped query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.technology = ServiceCategory.objects.create(name='Technology', description='Tech', icon='fa-laptop')
+        cls.web = ServiceCategory.objects.create(name='Web', description='Web', icon='fa-code', parent=cls.technology)
+        cls.frontend = ServiceCategory.objects.create(name='Frontend', description='Frontend', icon='fa-code', parent=cls.web)
+        cls.security = ServiceCategory.objects.create(name='Security', description='Security', icon='fa-lock')
+        cls.empty = ServiceCategory.objects.create(name='Empty', description='Empty', icon='fa-box')
+        for title, category, is_active in [
+            ('Python', cls.technology, True), ('Django', cls.web, True), ('Flask', cls.web, False),
+            ('React', cls.frontend, True), ('Vue', cls.frontend, True), ('Hacking', cls.security, True),
+            ('Forensics', cls.security, False),
+        ]:
+            Service.objects.create(
+                title=title, slug=title.lower(), category=category, description=title,
+                detailed_description=title, price=100, duration_weeks=1, is_active=is_active
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_roll_up_active_services(self):
+        with self.assertNumQueries(1):
+            counts = build_service_counts()
+
+        self.assertEqual(counts, {
+            self.technology.pk: (1, 4), self.web.pk: (1, 3), self.frontend.pk: (2, 2),
+            self.security.pk: (1, 1), self.empty.pk: (0, 0),
+        })
+        self.assertEqual(get_category_counts(0, counts), (0, 0))
+
+    def test_counts_are_cached_until_the_catalog_changes(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.web.get_total_services_count(), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.web.get_direct_services_count(), 1)
+            self.assertEqual(self.technology.get_total_services_count(), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            flask = Service.objects.get(title='Flask')
+            flask.is_active = True
+            flask.save()
+        self.assertEqual(get_category_counts(self.web.pk), (2, 4))
+        self.assertEqual(get_category_counts(self.technology.pk), (1, 5))
+
+    def test_category_list_reads_counts_once(self):
+        client = APIClient()
+        client.get('/api/v1/categories/')
+        cache.clear()
+
+        # Page count, page and the grouped counts
+        with self.assertNumQueries(3):
+            response = client.get('/api/v1/categories/')
+
+        counts = {
+            category['name']: (category['services_count'], category['total_services_count'])
+            for category in response.data['results']
+        }
+        self.assertEqual(counts, {
+            'Technology': (1, 4), 'Web': (1, 3), 'Frontend': (2, 2), 'Security': (1, 1), 'Empty': (0, 0),
+        })
+
+
+class ServiceCategoryTreeTests(TestCase):
+    """Tree helpers read the nested set fields, and full_path follows renames and moves"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.technology = cls.category('Technology')
+        cls.security = cls.category('Security')
+        cls.web = cls.category('Web Development', cls.technology)
+        cls.frontend = cls.category('Frontend', cls.web)
+        cls.react = cls.category('React', cls.frontend)
+
+    @staticmethod
+    def category(name, parent=None):
+        return ServiceCategory.objects.create(name=name, description=name, icon='fas fa-folder', parent=parent)
+
+    def paths(self):
+        return dict(ServiceCategory.objects.values_list('name', 'full_path'))
+
+    def assertSubtreePaths(self, prefix):
+        self.assertEqual(
+            [self.paths()[name] for name in ('Web Development', 'Frontend', 'React')],
+            [f'{prefix}Web Development', f'{prefix}Web Development > Frontend',
+             f'{prefix}Web Development > Frontend > React']
+        )
+
+    def test_all_services_include_descendants(self):
+        def service(title, category, **kwargs):
+            return Service.objects.create(
+                title=title, slug=title.lower(), category=category, description=title,
+                detailed_description=title, price=100, duration_weeks=1, **kwargs
+            )
+        python, django, vue = service('Python', self.technology), service('Django', self.web), service('Vue', self.frontend)
+        service('Retired', self.react, is_active=False)
+        service('Hacking', self.security)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(set(self.technology.get_all_services()), {python, django, vue})
+        self.assertEqual(set(self.web.get_all_services()), {django, vue})
+        self.assertEqual(list(self.react.get_all_services()), [])
+
+    def test_breadcrumbs_from_tree_fields(self):
+        react = ServiceCategory.objects.get(pk=self.react.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(react.get_breadcrumb_path(), [self.technology, self.web, self.frontend, react])
+        with self.assertNumQueries(1):
+            self.assertEqual(react.get_root_category(), self.technology)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(react.get_ancestors()), [self.technology, self.web, self.frontend])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.technology.get_descendants()), [self.web, self.frontend, react])
+        with self.assertNumQueries(0):
+            self.assertEqual(react.get_level(), 3)
+            self.assertFalse(react.is_root_category())
+            self.assertEqual(react.get_full_name(), 'Technology > Web Development > Frontend > React')
+            self.assertEqual(self.technology.get_breadcrumb_path(), [self.technology])
+
+    def test_rename_updates_descendants(self):
+        self.technology.name = 'Tech'
+        self.technology.save()
+
+        self.assertSubtreePaths('Tech > ')
+
+    def test_reparenting_on_save(self):
+        self.web.parent = self.security
+        self.web.save()
+
+        self.assertSubtreePaths('Security > ')
+
+    def test_move_to(self):
+        self.web.move_to(self.security, 'last-child')
+        self.assertSubtreePaths('Security > ')
+
+        ServiceCategory.objects.get(pk=self.web.pk).move_to(None)
+        self.assertSubtreePaths('')
+
+    def test_tree_manager_moves(self):
+        ServiceCategory.objects.move_node(self.web, self.security, 'first-child')
+        self.assertSubtreePaths('Security > ')
+
+        # Next to a root node is a root node
+        ServiceCategory.objects.move_node(ServiceCategory.objects.get(pk=self.web.pk), self.technology, 'right')
+        self.assertSubtreePaths('')
+
+    def test_moves_that_skip_save(self):
+        # What TreeManager.move_node did before it saved the node
+        ServiceCategory.objects._move_node(self.web, self.security, 'last-child')
+        node_moved.send(sender=ServiceCategory, instance=self.web, target=self.security, position='last-child')
 
-# Create your tests here.
+        self.assertSubtreePaths('Security > ')
+        self.assertEqual(self.web.full_path, 'Security > Web Development')